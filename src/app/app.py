@@ -5,15 +5,23 @@ import threading
 import time
 import zipfile
 import io
+import atexit
+import json
+import multiprocessing
+import sqlite3
+import queue
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
-import gradio as gr
+import cv2
 import pandas as pd
 from datetime import datetime
 import shutil
 import subprocess
-from apscheduler.schedulers.background import BackgroundScheduler
+import xxhash
 
 # --- Path Setup ---
 # 始终使用相对于脚本文件的路径，无论是开发环境还是打包环境
@@ -31,26 +39,115 @@ else:
 sys.path.append(str(APP_DIR))
 
 try:
-    from mineru.utils.pdf_image_tools import load_images_from_pdf
+    from mineru.utils.pdf_image_tools import load_images_from_pdf, load_region_image_from_pdf
     from mineru.utils.enum_class import ImageType
+    from mineru.utils.pdf_reader import pdf_region_to_text
 except ImportError as e:
     print(f"Error: Failed to import MinerU modules. Current sys.path: {sys.path}")
     print(f"Details: {e}")
     sys.exit(1)
 
+
+def parse_extract_cascade(value):
+    """解析分级提取配置，返回 [(区域, DPI), ...]，区域为 crop 或 page"""
+    stages = []
+    for item in value.split(","):
+        region, _, dpi = item.strip().partition(":")
+        if region not in ("crop", "page") or not dpi.isdigit():
+            raise ValueError(f"无效的分级提取配置: {item}")
+        stages.append((region, int(dpi)))
+    return stages
+
+
 # --- Path Configurations ---
+# CROP_BOX 为整页按 EXTRACT_DPI 渲染后的像素坐标
 CROP_BOX = (0, 300, 800, 500)
+EXTRACT_DPI = 200
 SHIPPING_ID_PATTERN = re.compile(r"发货单(?:号)?\s*[:：]\s*([A-Za-z0-9]+)")
+# OCR 分级提取: 依次尝试各阶段 (区域, DPI)，找到单号即停止。格式 "crop:120,crop:200,page:200"
+EXTRACT_CASCADE = parse_extract_cascade(os.getenv("OCR_EXTRACT_CASCADE", "crop:120,crop:200,page:200"))
+# 条码快速路径: 在 OCR 前先尝试解码区域内的一维码/二维码，解码内容需完整匹配单号格式
+# 单号格式较宽松，快递单号、商品条码等同样能匹配，因此默认关闭，仅在单据上的条码确为发货单号时开启，
+# 并建议通过 OCR_BARCODE_ID_PATTERN 收紧格式
+BARCODE_ENABLED = os.getenv("OCR_BARCODE_ENABLED", "false").lower() in ("true", "1", "yes")
+BARCODE_ID_PATTERN = re.compile(os.getenv("OCR_BARCODE_ID_PATTERN", r"[A-Za-z0-9]+"))
+# 锚点模式(默认关闭): 只识别 "发货单" 标签所在行及其右侧的文本框，匹配成功即停止识别；
+# 尚未在真实运单上与全量识别对比准确率，需要时通过 OCR_ANCHORED_MODE=true 开启
+SHIPPING_ID_ANCHOR = re.compile(r"发货单")
+OCR_ANCHORED_MODE = os.getenv("OCR_ANCHORED_MODE", "false").lower() in ("true", "1", "yes")
 INPUT_DIR = ROOT_DIR / "input"
 OUTPUT_DIR = ROOT_DIR / "output"
 DOWNLOADS_DIR = ROOT_DIR / "downloads"
 DEBUG_DIR = ROOT_DIR / "debug"
 OCR_IMAGES_DIR = DEBUG_DIR / "ocr_annotated"
+# 提取结果缓存与 debug 目录平级，不受定时清理任务影响，重启后仍然有效
+CACHE_DIR = ROOT_DIR / "cache"
+CACHE_IMAGES_DIR = CACHE_DIR / "ocr_annotated"
+CACHE_DB_PATH = CACHE_DIR / "extract_cache.sqlite3"
 SHUTDOWN_SENTINEL = ROOT_DIR / ".mineru_shutdown"
 OUTPUT_FILE_COLUMNS = ["选择", "原始文件名", "重命名后文件名", "大小(KB)", "修改时间", "完整路径"]
+RESULT_COLUMNS = ["原始文件名", "提取的单号", "提取方式", "提取图像"]
+
+# OCR 模型文件（相对于 local_models 目录）
+OCR_DET_MODEL = "models/OCR/paddleocr_torch/ch_PP-OCRv5_det_infer.pth"
+OCR_REC_MODEL = "models/OCR/paddleocr_torch/ch_PP-OCRv4_rec_server_doc_infer.pth"
+OCR_DICT_FILE = "ppocrv4_doc_dict.txt"
+
+# 提取结果缓存配置: 条目数上限与最长保留天数；提取逻辑变化时递增版本号使旧缓存失效
+EXTRACT_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() in ("true", "1", "yes")
+EXTRACT_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "20000"))
+EXTRACT_CACHE_MAX_AGE_DAYS = int(os.getenv("OCR_CACHE_MAX_AGE_DAYS", "30"))
+EXTRACT_CACHE_VERSION = 2
+EXTRACT_CACHE_LOCK = threading.Lock()
+
+# 流式提取时表格刷新的最小间隔(秒)，以及尚未完成的行显示的占位单号
+STREAM_UPDATE_INTERVAL = 0.5
+PENDING_SHIPPING_ID = "处理中..."
+
+# 单号的提取方式，用于统计各路径的命中率
+SOURCE_TEXT_LAYER = "文本层"
+SOURCE_BARCODE = "条码"
+SOURCE_OCR_CROP = "OCR-区域"
+SOURCE_OCR_FULL_PAGE = "OCR-整页"
+
+# 标注图片延迟生成: 提取时只保存原始图像和识别框，查看或后台空闲时再绘制 PNG
+ANNOTATION_QUEUE_SIZE = int(os.getenv("OCR_ANNOTATION_QUEUE_SIZE", "256"))
+ANNOTATION_QUEUE = queue.Queue(maxsize=ANNOTATION_QUEUE_SIZE)
+ANNOTATION_LOCK = threading.Lock()
+ANNOTATION_THREAD = None
+
+# 各提取阶段的累计统计: {阶段名: {"runs": 运行次数, "hits": 命中次数, "seconds": 累计耗时}}
+EXTRACT_STAGE_STATS = {}
+EXTRACT_STAGE_STATS_LOCK = threading.Lock()
+
+# 并行提取配置: 工作进程数与每个进程的 torch 线程数，0 表示根据 CPU 核数自动计算
+OCR_EXTRACT_WORKERS = int(os.getenv("OCR_EXTRACT_WORKERS", "0"))
+OCR_WORKER_THREADS = int(os.getenv("OCR_WORKER_THREADS", "0"))
+# 文件数少于该值时直接在主进程串行提取，避免进程池的调度开销
+PARALLEL_MIN_FILES = int(os.getenv("OCR_PARALLEL_MIN_FILES", "4"))
+# 工作进程启动方式: spawn(默认，每个进程各自加载模型) 或 fork(仅 Linux，主进程加载模型后 fork，
+# 各进程以写时复制方式共享模型权重，内存不再随进程数成倍增长)
+OCR_WORKER_START_METHOD = os.getenv("OCR_WORKER_START_METHOD", "spawn").lower()
+
+# 启动模式: true(默认)时先启动 Web 服务，OCR 模型和 torch 等重量级模块在后台线程中加载；
+# false 时在启动服务前同步加载模型。fork 方式的进程池必须在启动服务前于主线程中创建，此时总是同步加载
+OCR_LAZY_STARTUP = os.getenv("OCR_LAZY_STARTUP", "true").lower() in ("true", "1", "yes")
 
 # Global OCR model to load only once
 OCR_MODEL = None
+OCR_MODEL_LOCK = threading.Lock()
+# OCR 模型加载成功后置位，供界面判断模型是否就绪
+OCR_MODEL_READY = threading.Event()
+# 后台加载失败时的错误信息
+OCR_MODEL_ERROR = None
+
+# 常驻的提取进程池，首次并行提取时创建，之后复用（每个进程只加载一次模型）
+EXTRACT_POOL = None
+EXTRACT_POOL_LOCK = threading.Lock()
+# 工作进程中的预热屏障，由进程池初始化函数设置；预热任务等待所有进程都领取到任务后才返回
+WORKER_WARM_UP_BARRIER = None
+# 预热等待所有工作进程加载模型的最长时间(秒)
+WORKER_WARM_UP_TIMEOUT = 300
 
 # 全局字典：存储文件名到文件路径的映射
 FILE_PATH_MAP = {}
@@ -122,7 +219,15 @@ def coerce_selection_column(df):
 
 def get_ocr_model_lazy():
     """Initializes and returns the OCR model, loading it only once."""
-    global OCR_MODEL
+    if OCR_MODEL_READY.is_set():
+        return OCR_MODEL
+    # 后台加载与提取请求可能同时调用，加锁保证模型只加载一次，后到者等待加载完成
+    with OCR_MODEL_LOCK:
+        return _load_ocr_model()
+
+
+def _load_ocr_model():
+    global OCR_MODEL, OCR_MODEL_ERROR
     if OCR_MODEL is None:
         print("=" * 60)
         print("正在加载 OCR 模型...")
@@ -133,9 +238,9 @@ def get_ocr_model_lazy():
             # 使用相对路径定位模型文件
             local_models_root = APP_DIR / "local_models"
 
-            det_model = "models/OCR/paddleocr_torch/ch_PP-OCRv5_det_infer.pth"
-            rec_model = "models/OCR/paddleocr_torch/ch_PP-OCRv4_rec_server_doc_infer.pth"
-            dict_path = APP_DIR / "mineru" / "model" / "utils" / "pytorchocr" / "utils" / "resources" / "dict" / "ppocrv4_doc_dict.txt"
+            det_model = OCR_DET_MODEL
+            rec_model = OCR_REC_MODEL
+            dict_path = APP_DIR / "mineru" / "model" / "utils" / "pytorchocr" / "utils" / "resources" / "dict" / OCR_DICT_FILE
             det_model_path = local_models_root / det_model
             rec_model_path = local_models_root / rec_model
 
@@ -173,9 +278,12 @@ def get_ocr_model_lazy():
                 rec_model_path=str(rec_model_path),
                 rec_char_dict_path=str(dict_path)
             )
+            OCR_MODEL_ERROR = None
+            OCR_MODEL_READY.set()
             print("✓ OCR 模型加载完成！")
             print("=" * 60)
         except Exception as e:
+            OCR_MODEL_ERROR = str(e)
             print(f"\n✗ 错误: 无法从本地文件初始化OCR模型。")
             print(f"详细信息: {e}")
 
@@ -200,15 +308,10 @@ def get_ocr_model_lazy():
             OCR_MODEL = None
     return OCR_MODEL
 
-def draw_ocr_boxes(image, ocr_results, highlight_text=None):
-    """
-    在图片上绘制 OCR 识别框，并用红色高亮特定文本
-    """
-    draw_image = image.copy()
-    draw = ImageDraw.Draw(draw_image)
-
+@lru_cache(maxsize=1)
+def get_annotation_font():
+    """加载标注字体，只在首次调用时读取字体文件"""
     # Linux字体加载
-    font = None
     font_candidates = [
         "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
         "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
@@ -219,14 +322,135 @@ def draw_ocr_boxes(image, ocr_results, highlight_text=None):
     # 尝试加载字体
     for font_path in font_candidates:
         try:
-            font = ImageFont.truetype(font_path, 20)
-            break
+            return ImageFont.truetype(font_path, 20)
         except:
             continue
 
     # 如果所有字体都加载失败，使用默认字体
-    if font is None:
-        font = ImageFont.load_default()
+    return ImageFont.load_default()
+
+
+def get_annotation_paths(thumbnail_path):
+    """根据缩略图路径获取同组的标注文件路径"""
+    thumbnail_path = str(thumbnail_path)
+    return {
+        "thumb": Path(thumbnail_path),
+        "image": Path(thumbnail_path.replace("_thumb.png", "_ocr.png")),
+        "spec": Path(thumbnail_path.replace("_thumb.png", "_ocr.json")),
+        "raw": Path(thumbnail_path.replace("_thumb.png", "_raw.png")),
+    }
+
+
+def get_annotation_thumbnail_path(pdf_path, pdf_bytes):
+    """标注文件按文件名和内容哈希命名，同名的不同文件不会共用标注图片"""
+    return OCR_IMAGES_DIR / f"{Path(pdf_path).stem}_{xxhash.xxh3_64_hexdigest(pdf_bytes)}_thumb.png"
+
+
+def save_annotation_spec(thumbnail_path, np_image, ocr_results, highlight_text=None):
+    """
+    保存原始图像和识别框，标注图片留待 ensure_annotation_image 生成
+    同时删除已有的标注图片和缩略图，避免 ensure_annotation_image 返回上一次的结果
+    """
+    paths = get_annotation_paths(thumbnail_path)
+    # 原始图像以低压缩级别的 PNG 保存，比未压缩的数组小一个数量级，编码耗时也很短
+    if np_image.ndim == 3 and np_image.shape[2] == 3:
+        np_image = cv2.cvtColor(np_image, cv2.COLOR_RGB2BGR)
+    results = []
+    if ocr_results and ocr_results[0]:
+        for box, (text, confidence) in ocr_results[0]:
+            results.append([[[float(x), float(y)] for x, y in box], [text, float(confidence)]])
+    spec = {"raw": paths["raw"].name, "results": results, "highlight": highlight_text}
+    with ANNOTATION_LOCK:
+        paths["image"].unlink(missing_ok=True)
+        paths["thumb"].unlink(missing_ok=True)
+        cv2.imwrite(str(paths["raw"]), np_image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        paths["spec"].write_text(json.dumps(spec, ensure_ascii=False), encoding="utf-8")
+
+
+def ensure_annotation_image(thumbnail_path):
+    """
+    确保标注图片和缩略图已生成，返回标注图片路径；标注数据缺失时返回 None
+    生成后删除原始图像和识别框数据
+    """
+    if not thumbnail_path:
+        return None
+    paths = get_annotation_paths(thumbnail_path)
+    with ANNOTATION_LOCK:
+        if paths["image"].exists():
+            return str(paths["image"])
+        if not paths["spec"].exists():
+            return None
+        try:
+            spec = json.loads(paths["spec"].read_text(encoding="utf-8"))
+            with Image.open(paths["spec"].parent / spec["raw"]) as raw_image:
+                image = raw_image.convert("RGB")
+            annotated_image = draw_ocr_boxes(image, [spec["results"]], spec["highlight"])
+            annotated_image.save(paths["image"])
+
+            thumbnail = annotated_image.copy()
+            thumbnail.thumbnail((300, 300))
+            thumbnail.save(paths["thumb"])
+        except Exception as e:
+            print(f"生成标注图片失败: {thumbnail_path} ({e})")
+            return None
+        paths["spec"].unlink(missing_ok=True)
+        paths["raw"].unlink(missing_ok=True)
+        return str(paths["image"])
+
+
+def run_annotation_job(job):
+    """生成一张标注图片，job 为 (thumbnail_path, cache_key, result)；cache_key 不为空时在生成后写入提取缓存"""
+    thumbnail_path, cache_key, result = job
+    ensure_annotation_image(thumbnail_path)
+    if cache_key is not None:
+        store_extract_cache(cache_key, result)
+
+
+def _annotation_worker():
+    """后台线程: 依次生成队列中的标注图片"""
+    while True:
+        job = ANNOTATION_QUEUE.get()
+        try:
+            run_annotation_job(job)
+        except Exception as e:
+            print(f"后台生成标注图片失败: {e}")
+        finally:
+            ANNOTATION_QUEUE.task_done()
+
+
+def _run_annotation_jobs(jobs):
+    """队列已满时溢出的任务在单独的线程中生成，避免原始图像和识别框数据无人清理"""
+    for job in jobs:
+        try:
+            run_annotation_job(job)
+        except Exception as e:
+            print(f"后台生成标注图片失败: {e}")
+
+
+def schedule_annotation_images(jobs):
+    """将标注图片交给后台线程生成，jobs 为 [(thumbnail_path, cache_key, result), ...]"""
+    global ANNOTATION_THREAD
+    if ANNOTATION_THREAD is None:
+        ANNOTATION_THREAD = threading.Thread(target=_annotation_worker, name="annotation-worker", daemon=True)
+        ANNOTATION_THREAD.start()
+    for index, job in enumerate(jobs):
+        try:
+            ANNOTATION_QUEUE.put_nowait(job)
+        except queue.Full:
+            overflow = jobs[index:]
+            print(f"标注队列已满，{len(overflow)} 张标注图片改由单独线程生成")
+            threading.Thread(target=_run_annotation_jobs, args=(overflow,), name="annotation-overflow", daemon=True).start()
+            break
+
+
+def draw_ocr_boxes(image, ocr_results, highlight_text=None):
+    """
+    在图片上绘制 OCR 识别框，并用红色高亮特定文本
+    """
+    draw_image = image.copy()
+    draw = ImageDraw.Draw(draw_image)
+
+    font = get_annotation_font()
 
     if ocr_results and ocr_results[0]:
         for box_info, rec_data in ocr_results[0]:
@@ -247,99 +471,543 @@ def draw_ocr_boxes(image, ocr_results, highlight_text=None):
 
     return draw_image
 
-def extract_shipping_number_from_pdf(pdf_path: str, ocr_model, crop_box: tuple):
+def ocr_find_shipping_id(ocr_model, np_image):
+    """
+    对图像进行 OCR 并查找发货单号
+    返回: (match, ocr_raw_results, ocr_text)，ocr_raw_results 与 ocr_model.ocr() 的返回格式相同
+    """
+    if OCR_ANCHORED_MODE:
+        match, ocr_res = ocr_model.anchored_ocr(np_image, SHIPPING_ID_ANCHOR, SHIPPING_ID_PATTERN)
+        ocr_raw_results = [ocr_res]
+    else:
+        ocr_raw_results = ocr_model.ocr(np_image)
+        match = None
+
+    ocr_text = ""
+    if ocr_raw_results and ocr_raw_results[0]:
+        for _, rec_data in ocr_raw_results[0]:
+            text, _ = rec_data
+            ocr_text += text + " "
+
+    ocr_text = ocr_text.strip()
+    if match is None:
+        match = SHIPPING_ID_PATTERN.search(ocr_text)
+    return match, ocr_raw_results, ocr_text
+
+
+def decode_shipping_id_barcode(np_image):
+    """
+    解码图像中的一维码和二维码，返回第一个符合单号格式的结果
+    返回: (shipping_id, barcode_results)，barcode_results 与 ocr_model.ocr() 的返回格式相同；未找到时返回 (None, None)
+    """
+    candidates = []
+    ok, decoded_info, _, points = cv2.barcode.BarcodeDetector().detectAndDecodeWithType(np_image)
+    if ok:
+        candidates.extend(zip(decoded_info, points))
+    ok, decoded_info, points, _ = cv2.QRCodeDetector().detectAndDecodeMulti(np_image)
+    if ok:
+        candidates.extend(zip(decoded_info, points))
+
+    for value, box in candidates:
+        value = value.strip()
+        # 条码内容可能带有 "发货单号:" 标签，也可能只有单号本身
+        match = SHIPPING_ID_PATTERN.search(value)
+        shipping_id = match.group(1) if match else value
+        if shipping_id and BARCODE_ID_PATTERN.fullmatch(shipping_id):
+            return shipping_id, [[[box.tolist(), (shipping_id, 1.0)]]]
+    return None, None
+
+
+def get_stage_name(region, dpi):
+    """分级提取阶段的显示名称"""
+    return f"{'区域' if region == 'crop' else '整页'}@{dpi}dpi"
+
+
+def extract_shipping_number_from_pdf(pdf_path: str, ocr_model, crop_box: tuple, stage_log=None):
     """
     从PDF提取发货单号，并返回带标注的图片
-    返回: (shipping_id, status_msg, annotated_image_path)
+    优先从 PDF 文本层读取，文本层中没有单号时按 EXTRACT_CASCADE 逐级识别
+    每一级先尝试解码条码，解码失败再进行 OCR
+    stage_log 不为 None 时，依次追加每个已运行阶段的 (阶段名, 耗时秒数, 是否命中)
+    返回: (shipping_id, status_msg, annotated_image_path, source)
     """
-    if ocr_model is None:
-        return "Error", "OCR模型未加载", None
+    if stage_log is None:
+        stage_log = []
+    # 转换为 PDF 坐标，使各阶段可以按不同 DPI 渲染同一区域
+    crop_box_points = tuple(v * 72 / EXTRACT_DPI for v in crop_box)
 
     try:
         with open(pdf_path, 'rb') as f:
             pdf_bytes = f.read()
 
-        images_tuple = load_images_from_pdf(pdf_bytes, dpi=200, start_page_id=0, end_page_id=0, image_type=ImageType.PIL)
-        images_list = images_tuple[0]
-
-        if not images_list:
-            return "Not Found", "无法从PDF中读取图像", None
-
-        first_page_image = images_list[0]['img_pil']
-        cropped_image = first_page_image.crop(crop_box)
-
-        # OCR识别
-        cropped_np_image = np.array(cropped_image)
-        ocr_raw_results = ocr_model.ocr(cropped_np_image)
+        # 文本层快速路径: ERP 导出的 PDF 自带文本，无需 OCR
+        stage_start = time.perf_counter()
+        region_text = pdf_region_to_text(pdf_bytes, crop_box_points, page_id=0, clip_in_points=True)
+        match = SHIPPING_ID_PATTERN.search(region_text)
+        stage_log.append((SOURCE_TEXT_LAYER, time.perf_counter() - stage_start, match is not None))
+        if match:
+            shipping_id = match.group(1)
+            return shipping_id, f"成功: {shipping_id}", None, SOURCE_TEXT_LAYER
+    except Exception as e:
+        print(f"读取文本层失败，改用 OCR: {e}")
 
+    try:
+        # 从低 DPI 的区域识别开始逐级升级，整页识别放在最后
+        match = None
+        barcode_id = None
         full_text = ""
-        if ocr_raw_results and ocr_raw_results[0]:
-            for _, rec_data in ocr_raw_results[0]:
-                text, _ = rec_data
-                full_text += text + " "
-
-        full_text = full_text.strip()
-
-        # 查找发货单号
-        match = SHIPPING_ID_PATTERN.search(full_text)
-
-        # Fallback to full page OCR if not found in crop box
-        use_full_page = False
-        if not match:
-            print(f"在 CROP_BOX 区域未找到单号，正在尝试全局页面识别...")
-            full_page_np_image = np.array(first_page_image)
-            ocr_full_page_results = ocr_model.ocr(full_page_np_image)
-            use_full_page = True
-
-            full_page_text = ""
-            if ocr_full_page_results and ocr_full_page_results[0]:
-                for _, rec_data in ocr_full_page_results[0]:
-                    text, _ = rec_data
-                    full_page_text += text + " "
-
-            full_page_text = full_page_text.strip()
-            match = SHIPPING_ID_PATTERN.search(full_page_text)
-            ocr_raw_results = ocr_full_page_results
+        for stage_index, (region, dpi) in enumerate(EXTRACT_CASCADE):
+            stage_name = get_stage_name(region, dpi)
+            stage_start = time.perf_counter()
+            if region == "crop":
+                region_dict = load_region_image_from_pdf(
+                    pdf_bytes, crop_box_points, dpi=dpi, page_id=0, image_type=ImageType.PIL, clip_in_points=True
+                )
+                if region_dict is None:
+                    return "Not Found", "无法从PDF中读取图像", None, None
+                stage_image = region_dict['img_pil']
+            else:
+                images_tuple = load_images_from_pdf(pdf_bytes, dpi=dpi, start_page_id=0, end_page_id=0, image_type=ImageType.PIL)
+                images_list = images_tuple[0]
+                if not images_list:
+                    return "Not Found", "无法从PDF中读取图像", None, None
+                stage_image = images_list[0]['img_pil']
+            stage_np_image = np.array(stage_image)
+
+            # 条码解码远快于 OCR，且结果更准确
+            if BARCODE_ENABLED:
+                barcode_start = time.perf_counter()
+                barcode_id, ocr_raw_results = decode_shipping_id_barcode(stage_np_image)
+                stage_log.append((f"{SOURCE_BARCODE}-{stage_name}", time.perf_counter() - barcode_start, barcode_id is not None))
+                if barcode_id:
+                    break
+
+            if ocr_model is None:
+                return "Error", "OCR模型未加载", None, None
+
+            # OCR识别并查找发货单号
+            match, ocr_raw_results, stage_text = ocr_find_shipping_id(ocr_model, stage_np_image)
+            stage_log.append((stage_name, time.perf_counter() - stage_start, match is not None))
+            if region == "crop":
+                full_text = stage_text
+            if match:
+                break
+            if stage_index < len(EXTRACT_CASCADE) - 1:
+                print(f"{stage_name} 未找到单号，升级到 {get_stage_name(*EXTRACT_CASCADE[stage_index + 1])}...")
 
         shipping_id = "Not Found"
-        if match:
+        source = None
+        if barcode_id:
+            shipping_id = barcode_id
+            source = SOURCE_BARCODE
+        elif match:
             shipping_id = match.group(1)
+            source = SOURCE_OCR_CROP if region == "crop" else SOURCE_OCR_FULL_PAGE
 
-        # 绘制标注图片
+        # 保存最后一个阶段的图片和识别结果，标注图片在查看时或后台生成
         OCR_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+        thumbnail_path = get_annotation_thumbnail_path(pdf_path, pdf_bytes)
+        save_annotation_spec(thumbnail_path, stage_np_image, ocr_raw_results, shipping_id if shipping_id != "Not Found" else None)
 
-        # 选择合适的图片进行标注
-        if use_full_page:
-            annotated_image = draw_ocr_boxes(first_page_image, ocr_raw_results, shipping_id if shipping_id != "Not Found" else None)
-        else:
-            annotated_image = draw_ocr_boxes(cropped_image, ocr_raw_results, shipping_id if shipping_id != "Not Found" else None)
+        status = f"成功: {shipping_id}" if shipping_id != "Not Found" else f"未找到单号。OCR内容: '{full_text[:50]}...'"
 
-        # 保存标注图片
-        image_filename = f"{Path(pdf_path).stem}_ocr.png"
-        image_path = OCR_IMAGES_DIR / image_filename
-        annotated_image.save(image_path)
+        return shipping_id, status, str(thumbnail_path), source
 
-        # 创建缩略图
-        thumbnail = annotated_image.copy()
-        thumbnail.thumbnail((300, 300))
-        thumbnail_path = OCR_IMAGES_DIR / f"{Path(pdf_path).stem}_thumb.png"
-        thumbnail.save(thumbnail_path)
+    except Exception as e:
+        return "Error", f"处理文件时发生意外错误: {e}", None, None
+
+
+def record_stage_log(stage_stats, stage_log):
+    """将单个文件的阶段记录累加到本批次统计和全局累计统计中"""
+    with EXTRACT_STAGE_STATS_LOCK:
+        for stats in (stage_stats, EXTRACT_STAGE_STATS):
+            for stage_name, seconds, hit in stage_log:
+                stage = stats.setdefault(stage_name, {"runs": 0, "hits": 0, "seconds": 0.0})
+                stage["runs"] += 1
+                stage["hits"] += int(hit)
+                stage["seconds"] += seconds
+
+
+def format_stage_summary(stage_stats):
+    """格式化各阶段的运行次数、命中次数和平均耗时"""
+    parts = []
+    for stage_name, stage in stage_stats.items():
+        avg_ms = stage["seconds"] / stage["runs"] * 1000 if stage["runs"] else 0
+        parts.append(f"{stage_name} 运行 {stage['runs']} 命中 {stage['hits']} 平均 {avg_ms:.0f}ms")
+    return "阶段统计: " + "; ".join(parts) if parts else ""
+
+def _open_extract_cache_db():
+    """打开缓存数据库，不存在时建表"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(CACHE_DB_PATH), timeout=30)
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS extract_cache (
+            cache_key TEXT PRIMARY KEY,
+            shipping_id TEXT NOT NULL,
+            status TEXT NOT NULL,
+            source TEXT,
+            image_path TEXT,
+            thumbnail_path TEXT,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        )"""
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_extract_cache_last_used ON extract_cache (last_used_at)")
+    return conn
 
-        status = f"成功: {shipping_id}" if shipping_id != "Not Found" else f"未找到单号。OCR内容: '{full_text[:50]}...'"
 
-        return shipping_id, status, str(thumbnail_path)
+def get_extract_cache_key(pdf_path):
+    """
+    根据 PDF 内容和提取配置计算缓存键
+    配置包括裁剪区域、DPI、模型文件名和单号正则，任一变化都会使缓存失效
+    """
+    hasher = xxhash.xxh3_128()
+    with open(pdf_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(chunk)
+    config = {
+        "version": EXTRACT_CACHE_VERSION,
+        "crop_box": list(CROP_BOX),
+        "dpi": EXTRACT_DPI,
+        "cascade": EXTRACT_CASCADE,
+        "det_model": Path(OCR_DET_MODEL).name,
+        "rec_model": Path(OCR_REC_MODEL).name,
+        "dict": OCR_DICT_FILE,
+        "pattern": SHIPPING_ID_PATTERN.pattern,
+        "anchored": OCR_ANCHORED_MODE,
+        "barcode": BARCODE_ENABLED and BARCODE_ID_PATTERN.pattern,
+    }
+    hasher.update(json.dumps(config, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def lookup_extract_cache(cache_key):
+    """查询缓存，命中时返回 (shipping_id, status, thumbnail_path, source)，否则返回 None"""
+    if not EXTRACT_CACHE_ENABLED:
+        return None
+    try:
+        with EXTRACT_CACHE_LOCK:
+            conn = _open_extract_cache_db()
+            try:
+                row = conn.execute(
+                    "SELECT shipping_id, status, source, thumbnail_path FROM extract_cache WHERE cache_key = ?",
+                    (cache_key,),
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute("UPDATE extract_cache SET last_used_at = ? WHERE cache_key = ?", (time.time(), cache_key))
+                conn.commit()
+            finally:
+                conn.close()
+    except sqlite3.Error as e:
+        print(f"读取提取缓存失败: {e}")
+        return None
+
+    shipping_id, status, source, thumbnail_path = row
+    if thumbnail_path and not get_annotation_paths(thumbnail_path)["image"].exists():
+        thumbnail_path = None
+    return shipping_id, status, thumbnail_path, source
+
+
+def store_extract_cache(cache_key, result):
+    """
+    写入缓存，标注图片复制到缓存目录以免被 debug 目录清理删除；出错的结果不缓存
+    只复制已生成的标注图片和缩略图，有标注图片的结果应在 ensure_annotation_image 之后再写入
+    """
+    if not EXTRACT_CACHE_ENABLED:
+        return
+    shipping_id, status, thumbnail_path, source = result
+    if shipping_id == "Error":
+        return
+
+    cached_image_path = None
+    cached_thumbnail_path = None
+    try:
+        source_paths = get_annotation_paths(thumbnail_path) if thumbnail_path else None
+        if source_paths and source_paths["image"].exists():
+            CACHE_IMAGES_DIR.mkdir(parents=True, exist_ok=True)
+            cached_thumbnail_path = CACHE_IMAGES_DIR / f"{cache_key}_thumb.png"
+            cached_paths = get_annotation_paths(cached_thumbnail_path)
+            with ANNOTATION_LOCK:
+                for name in ("image", "thumb"):
+                    shutil.copyfile(source_paths[name], cached_paths[name])
+            cached_image_path = cached_paths["image"]
+
+        now = time.time()
+        with EXTRACT_CACHE_LOCK:
+            conn = _open_extract_cache_db()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO extract_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (cache_key, shipping_id, status, source,
+                     str(cached_image_path) if cached_image_path else None,
+                     str(cached_thumbnail_path) if cached_thumbnail_path else None,
+                     now, now),
+                )
+                conn.commit()
+            finally:
+                conn.close()
+    except (sqlite3.Error, OSError) as e:
+        print(f"写入提取缓存失败: {e}")
+
+
+def evict_extract_cache():
+    """淘汰超过保留天数的缓存，以及超出条目数上限时最久未使用的缓存"""
+    if not EXTRACT_CACHE_ENABLED or not CACHE_DB_PATH.exists():
+        return
+    try:
+        with EXTRACT_CACHE_LOCK:
+            conn = _open_extract_cache_db()
+            try:
+                expire_before = time.time() - EXTRACT_CACHE_MAX_AGE_DAYS * 86400
+                evicted = conn.execute(
+                    "SELECT cache_key, image_path, thumbnail_path FROM extract_cache WHERE last_used_at < ?",
+                    (expire_before,),
+                ).fetchall()
+                total = conn.execute("SELECT COUNT(*) FROM extract_cache").fetchone()[0]
+                overflow = total - len(evicted) - EXTRACT_CACHE_MAX_ENTRIES
+                if overflow > 0:
+                    evicted += conn.execute(
+                        "SELECT cache_key, image_path, thumbnail_path FROM extract_cache "
+                        "WHERE last_used_at >= ? ORDER BY last_used_at LIMIT ?",
+                        (expire_before, overflow),
+                    ).fetchall()
+                conn.executemany("DELETE FROM extract_cache WHERE cache_key = ?", [(row[0],) for row in evicted])
+                conn.commit()
+            finally:
+                conn.close()
+    except sqlite3.Error as e:
+        print(f"清理提取缓存失败: {e}")
+        return
+
+    for _, image_path, thumbnail_path in evicted:
+        if image_path:
+            Path(image_path).unlink(missing_ok=True)
+        if thumbnail_path:
+            for path in get_annotation_paths(thumbnail_path).values():
+                path.unlink(missing_ok=True)
+    if evicted:
+        print(f"[定时任务] 提取缓存淘汰 {len(evicted)} 条")
+
+
+def get_extract_worker_config():
+    """返回 (工作进程数, 每个进程的 torch 线程数)"""
+    cpu_count = os.cpu_count() or 1
+    workers = OCR_EXTRACT_WORKERS if OCR_EXTRACT_WORKERS > 0 else max(1, min(cpu_count // 2, 8))
+    threads = OCR_WORKER_THREADS if OCR_WORKER_THREADS > 0 else max(1, cpu_count // workers)
+    return workers, threads
+
+
+def _init_extract_worker(torch_threads, warm_up_barrier):
+    """工作进程初始化: 限制 torch 线程数并加载该进程独立的 OCR 模型(fork 方式下直接使用继承的模型)"""
+    global WORKER_WARM_UP_BARRIER
+    WORKER_WARM_UP_BARRIER = warm_up_barrier
+    for env_name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[env_name] = str(torch_threads)
+
+    import torch
+    torch.set_num_threads(torch_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+    get_ocr_model_lazy()
+
+
+def _warm_up_worker():
+    """
+    预热任务: 每个进程同一时间只执行一个任务，屏障要求所有预热任务同时在不同进程中等待，
+    因此返回时每个工作进程都已启动并完成模型加载
+    """
+    try:
+        WORKER_WARM_UP_BARRIER.wait(WORKER_WARM_UP_TIMEOUT)
+    except threading.BrokenBarrierError:
+        pass
+    return os.getpid()
+
+
+def _extract_in_worker(pdf_path):
+    """在工作进程中提取单个文件的单号，返回 (提取结果, 阶段记录)"""
+    stage_log = []
+    result = extract_shipping_number_from_pdf(pdf_path, get_ocr_model_lazy(), CROP_BOX, stage_log)
+    return result, stage_log
+
+
+def get_extract_pool():
+    """获取常驻提取进程池，不存在时创建"""
+    global EXTRACT_POOL
+    with EXTRACT_POOL_LOCK:
+        if EXTRACT_POOL is None:
+            workers, threads = get_extract_worker_config()
+            start_method = OCR_WORKER_START_METHOD
+            if start_method == "fork" and "fork" not in multiprocessing.get_all_start_methods():
+                print("当前平台不支持 fork，提取进程池改用 spawn")
+                start_method = "spawn"
+            elif start_method == "fork" and threading.current_thread() is not threading.main_thread():
+                # Web 服务已在运行时其他线程可能持有锁，fork 出的进程会继承这些锁的状态
+                print("提取进程池不在主线程中创建，fork 可能继承其他线程持有的锁，改用 spawn")
+                start_method = "spawn"
+            print(f"正在启动提取进程池: {workers} 个进程, 每个进程 {threads} 个线程, 启动方式 {start_method}")
+            if start_method == "fork":
+                # 主进程先加载并融合模型，工作进程继承后无需再加载，权重页共享
+                from mineru.utils.model_utils import prepare_models_for_fork
+                prepare_models_for_fork(get_ocr_model_lazy)
+            # 默认使用 spawn，避免 fork 继承主进程中已初始化的 torch 线程池和其他线程持有的锁
+            mp_context = multiprocessing.get_context(start_method)
+            EXTRACT_POOL = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=mp_context,
+                initializer=_init_extract_worker,
+                initargs=(threads, mp_context.Barrier(workers)),
+            )
+        return EXTRACT_POOL
+
+
+def shutdown_extract_pool():
+    """关闭提取进程池"""
+    global EXTRACT_POOL
+    with EXTRACT_POOL_LOCK:
+        if EXTRACT_POOL is not None:
+            EXTRACT_POOL.shutdown(wait=False, cancel_futures=True)
+            EXTRACT_POOL = None
+
+
+atexit.register(shutdown_extract_pool)
+
+
+def warm_up_extract_pool():
+    """
+    提前启动进程池的所有工作进程并等待各进程加载模型，缩短首个批次的等待时间
+    spawn 方式下进程池按需逐个启动进程，需要提交与进程数相同的预热任务并让它们互相等待
+    """
+    workers = get_extract_worker_config()[0]
+    if workers <= 1:
+        return
+    start_time = time.perf_counter()
+    futures = [get_extract_pool().submit(_warm_up_worker) for _ in range(workers)]
+    try:
+        pids = {future.result() for future in futures}
+    except BrokenProcessPool as e:
+        print(f"提取进程池预热失败: {e}")
+        shutdown_extract_pool()
+        return
+    print(f"✓ 提取进程池预热完成: {len(pids)} 个进程, 耗时 {time.perf_counter() - start_time:.1f}s")
+
+
+def get_model_status():
+    """返回 OCR 模型的加载状态说明"""
+    if OCR_MODEL_READY.is_set():
+        return "✓ OCR 模型已就绪"
+    if OCR_MODEL_ERROR:
+        return f"✗ OCR 模型加载失败: {OCR_MODEL_ERROR}"
+    return "OCR 模型加载中..."
+
+
+def preload_models():
+    """加载 OCR 模型并预热提取进程池"""
+    model = get_ocr_model_lazy()
+    if model is None:
+        print("\n⚠ 警告: OCR 模型加载失败，请检查上述错误信息")
+        print("可以继续启动应用，但 OCR 功能将不可用")
+        print("=" * 60)
+
+    # 预热并行提取进程池（各进程在后台加载模型）
+    warm_up_extract_pool()
+
+
+def start_background_model_loading():
+    """在后台线程中加载模型，Web 服务无需等待 torch 等模块导入即可开始响应"""
+    thread = threading.Thread(target=preload_models, name="ocr-model-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+# 启动阶段在主线程中导入的模块，以及后台加载模型时导入的模块，用于导入耗时分析
+STARTUP_IMPORTS = [
+    "numpy", "cv2", "PIL.Image", "pandas", "gradio", "xxhash",
+    "mineru.utils.pdf_image_tools", "mineru.utils.pdf_reader",
+]
+BACKGROUND_IMPORTS = ["mineru.model.ocr.pytorch_paddle"]
+
+
+def print_import_profile():
+    """分别统计启动阶段和后台模型加载的导入耗时，按子系统汇总"""
+    from mineru.utils.import_profile import profile_imports
+
+    print("[启动阶段]")
+    print(profile_imports(STARTUP_IMPORTS, cwd=str(APP_DIR)))
+    print("\n[后台加载]")
+    print(profile_imports(BACKGROUND_IMPORTS, cwd=str(APP_DIR), baseline=STARTUP_IMPORTS))
+
+
+def iter_extract_results(pdf_paths, ocr_model):
+    """
+    逐个产出 (索引, 提取结果, 阶段记录)，并行模式下按完成顺序产出
+    进程池异常时，尚未完成的文件回退到主进程串行提取
+    """
+    done_indices = set()
+    if get_extract_worker_config()[0] > 1 and len(pdf_paths) >= PARALLEL_MIN_FILES:
+        print(f"并行提取 {len(pdf_paths)} 个文件...")
+        try:
+            pool = get_extract_pool()
+            futures = {pool.submit(_extract_in_worker, pdf_path): index for index, pdf_path in enumerate(pdf_paths)}
+            for future in as_completed(futures):
+                index = futures[future]
+                result, stage_log = future.result()
+                done_indices.add(index)
+                yield index, result, stage_log
+        except BrokenProcessPool as e:
+            print(f"提取进程池异常，回退到串行提取: {e}")
+            shutdown_extract_pool()
+
+    for index, pdf_path in enumerate(pdf_paths):
+        if index in done_indices:
+            continue
+        print(f"正在处理文件: {Path(pdf_path).name}")
+        stage_log = []
+        result = extract_shipping_number_from_pdf(pdf_path, ocr_model, CROP_BOX, stage_log)
+        yield index, result, stage_log
+
+
+def format_source_summary(source_counts, total):
+    """格式化各提取方式的命中统计"""
+    if total == 0:
+        return ""
+    parts = [f"{source} {source_counts.get(source, 0)}/{total}"
+             for source in (SOURCE_TEXT_LAYER, SOURCE_BARCODE, SOURCE_OCR_CROP, SOURCE_OCR_FULL_PAGE)]
+    return "命中统计: " + ", ".join(parts)
+
+
+def build_results_df(processed_files, extraction_results):
+    """根据已完成的提取结果构建表格，未完成的行显示占位单号"""
+    rows = []
+    for pdf_path, result in zip(processed_files, extraction_results):
+        if result is None:
+            rows.append([Path(pdf_path).name, PENDING_SHIPPING_ID, "", ""])
+            continue
+        shipping_id, _, thumbnail_path, source = result
+        rows.append([
+            Path(pdf_path).name,
+            shipping_id,
+            source or "",
+            thumbnail_path if thumbnail_path else ""
+        ])
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
 
-    except Exception as e:
-        return "Error", f"处理文件时发生意外错误: {e}", None
 
 def process_uploads_and_extract(files):
-    """处理上传的文件并提取单号"""
+    """
+    处理上传的文件并提取单号
+    以生成器方式流式返回: 每完成一个文件就刷新表格和进度，无需等待整个批次完成
+    """
     global FILE_PATH_MAP
     clean_hidden_files(INPUT_DIR)
     clean_hidden_files(OUTPUT_DIR)
 
     if not files:
-        return pd.DataFrame(columns=["原始文件名", "提取的单号", "提取图像"]), "", "请先上传文件。"
+        yield pd.DataFrame(columns=RESULT_COLUMNS), "", "请先上传文件。"
+        return
 
     timestamp_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     input_batch_dir = INPUT_DIR / timestamp_str
@@ -356,39 +1024,79 @@ def process_uploads_and_extract(files):
         processed_files.append(str(dest_path))
         FILE_PATH_MAP[original_filename] = str(dest_path)  # 存储映射
 
-    # 获取 OCR 模型（已在启动时预加载）
+    # 获取 OCR 模型（启动时已在后台预加载，未完成时等待加载结束）
+    if not OCR_MODEL_READY.is_set():
+        yield pd.DataFrame(columns=RESULT_COLUMNS), get_model_status(), "OCR 模型加载中，加载完成后自动开始提取..."
     ocr_model = get_ocr_model_lazy()
     if ocr_model is None:
-        return pd.DataFrame(columns=["原始文件名", "提取的单号", "提取图像"]), "", "错误：OCR 模型未加载，请重启应用。"
-
-    results = []
-    for pdf_path in processed_files:
-        print(f"正在处理文件: {Path(pdf_path).name}")
-        shipping_id, status, thumbnail_path = extract_shipping_number_from_pdf(pdf_path, ocr_model, CROP_BOX)
-
-        results.append([
-            Path(pdf_path).name,
-            shipping_id,
-            thumbnail_path if thumbnail_path else ""
-        ])
-
-    df = pd.DataFrame(results, columns=["原始文件名", "提取的单号", "提取图像"])
-    return df, "", f"文件已存入 {input_batch_dir} 并完成提取。"
-
-def view_ocr_image(df, evt: gr.SelectData):
+        # 文本层和条码路径不依赖 OCR 模型，仍然继续提取，需要 OCR 的文件在 OCR 阶段返回错误
+        print("⚠ OCR 模型未加载，仅使用文本层和条码提取")
+
+    total = len(processed_files)
+    extraction_results = [None] * total
+    yield build_results_df(processed_files, extraction_results), f"进度: 0/{total}", "正在提取..."
+
+    # 先查询缓存，只对未命中的文件调用 OCR
+    cache_keys = [None] * total
+    pending_indices = []
+    for index, pdf_path in enumerate(processed_files):
+        if EXTRACT_CACHE_ENABLED:
+            cache_keys[index] = get_extract_cache_key(pdf_path)
+            extraction_results[index] = lookup_extract_cache(cache_keys[index])
+        if extraction_results[index] is None:
+            pending_indices.append(index)
+    cache_hits = total - len(pending_indices)
+    completed = cache_hits
+    if cache_hits:
+        yield build_results_df(processed_files, extraction_results), f"进度: {completed}/{total}", "正在提取..."
+
+    pending_files = [processed_files[index] for index in pending_indices]
+    pending_set = set(pending_indices)
+    last_update = time.time()
+    stage_stats = {}
+    for pending_index, result, stage_log in iter_extract_results(pending_files, ocr_model):
+        index = pending_indices[pending_index]
+        extraction_results[index] = result
+        record_stage_log(stage_stats, stage_log)
+        completed += 1
+        print(f"{Path(processed_files[index]).name}: {result[1]} [{result[3] or '-'}]")
+        if cache_keys[index] is not None and not result[2]:
+            # 有标注图片的结果在后台生成图片后再写入缓存
+            store_extract_cache(cache_keys[index], result)
+
+        if time.time() - last_update >= STREAM_UPDATE_INTERVAL or completed == total:
+            last_update = time.time()
+            yield build_results_df(processed_files, extraction_results), f"进度: {completed}/{total}", "正在提取..."
+
+    source_counts = {}
+    for _, _, _, source in extraction_results:
+        if source:
+            source_counts[source] = source_counts.get(source, 0) + 1
+
+    summary = format_source_summary(source_counts, total)
+    if EXTRACT_CACHE_ENABLED:
+        summary += f", 缓存命中 {cache_hits}/{total}"
+    if ocr_model is None:
+        summary += "\n⚠ OCR 模型未加载，文本层和条码均未命中的文件无法提取"
+    if stage_stats:
+        summary += f"\n{format_stage_summary(stage_stats)}"
+        print(f"[累计] {format_stage_summary(EXTRACT_STAGE_STATS)}")
+    # 提取完成后在后台生成标注图片并写入缓存，不占用提取的关键路径
+    schedule_annotation_images([
+        (result[2], cache_keys[index] if index in pending_set else None, result)
+        for index, result in enumerate(extraction_results) if result[2]
+    ])
+    yield build_results_df(processed_files, extraction_results), f"进度: {total}/{total}", f"文件已存入 {input_batch_dir} 并完成提取。{summary}"
+
+def view_ocr_image(df, row_index):
     """查看选中行的OCR标注图片"""
     if df is None or df.empty:
         return None
 
-    row_index = evt.index[0]
     thumbnail_path = df.iloc[row_index]["提取图像"]
 
-    # 从缩略图路径获取完整图像路径
-    full_image_path = thumbnail_path.replace("_thumb.png", "_ocr.png") if thumbnail_path else None
-
-    if full_image_path and Path(full_image_path).exists():
-        return full_image_path
-    return None
+    # 标注图片尚未在后台生成时，在此处生成
+    return ensure_annotation_image(thumbnail_path)
 
 def rename_files_and_organize(df):
     """重命名文件并整理到输出目录"""
@@ -429,7 +1137,7 @@ def rename_files_and_organize(df):
         dest_original_path = file_output_dir / original_filename
         shutil.copy(source_path, dest_original_path)
 
-        if new_shipping_id in ["Not Found", "Error", "", None]:
+        if new_shipping_id in ["Not Found", "Error", PENDING_SHIPPING_ID, "", None]:
             log_msg = f"文件 '{original_filename}' 的单号无效, 仅复制源文件。"
             print(log_msg)
             rename_log.append(log_msg)
@@ -672,195 +1380,213 @@ def get_next_cleanup_time():
 
 
 # --- Gradio UI ---
-with gr.Blocks(theme=gr.themes.Soft(primary_hue="slate").set(
-    body_background_fill="*neutral_950",
-    body_background_fill_dark="*neutral_950",
-    background_fill_primary="*neutral_900",
-    background_fill_primary_dark="*neutral_900",
-    background_fill_secondary="*neutral_800",
-    background_fill_secondary_dark="*neutral_800",
-    border_color_primary="*neutral_700",
-    border_color_primary_dark="*neutral_700",
-), css="""
-    .thumbnail-cell img { max-width: 150px; max-height: 150px; object-fit: contain; }
-    #pdf-upload button[aria-label="Upload"],
-    #pdf-upload button[aria-label="Upload file"] {
-        min-width: 150px;
-        border-radius: 6px;
-        font-weight: 600;
-        font-size: 14px;
-        padding: 0.4rem 1rem;
-        background: var(--button-primary-background-fill, var(--primary-500));
-        border: 1px solid var(--button-primary-border-color, var(--primary-500));
-        color: var(--button-primary-text-color, #fff);
-        box-shadow: 0 2px 6px rgba(0, 0, 0, 0.1);
-    }
-    #pdf-upload button[aria-label="Upload"]:hover,
-    #pdf-upload button[aria-label="Upload file"]:hover {
-        filter: brightness(1.05);
-    }
-    #pdf-upload button[aria-label="Upload"]::after,
-    #pdf-upload button[aria-label="Upload file"]::after {
-        content: " 上传文件";
-        margin-left: 6px;
-    }
-    /* 隐藏DataFrame的添加行按钮 */
-    button[title="Add row"], button[aria-label="Add row"] {
-        display: none !important;
-    }
-    /* 提示用户只有单号列可编辑 */
-    .dataframe tbody tr td:first-child,
-    .dataframe tbody tr td:last-child {
-        background-color: rgba(128, 128, 128, 0.1) !important;
-        cursor: not-allowed;
-    }
-    /* 紫色主题样式 */
-    #loading_status textarea,
-    #status_extract textarea,
-    #status_rename textarea,
-    #file_op_status textarea {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%) !important;
-        color: white !important;
-        border: none !important;
-        font-weight: 500 !important;
-    }
-    #ocr_viewer {
-        border: 2px solid #667eea !important;
-        border-radius: 8px !important;
-    }
-""") as demo:
-    gr.Markdown("## OCR - 服务器版")
-    gr.Markdown(
-        """
-        **使用说明:**
-        1. 上传PDF文件并点击 **"开始提取"**
-        2. 查看提取结果，点击表格行即可在右侧预览大图
-        3. 如需修改单号，在表格中直接编辑后点击 **"确认并重命名"**
-        4. 在文件管理器中勾选需要的文件，点击 **"📥 批量下载"**
-        5. ⚠️ **重要**: 输出文件每天00:00自动清理，下载链接10分钟后失效，请及时下载
-        """
-    )
+def build_ui():
+    """
+    构建 Gradio 界面。
+    spawn 方式启动的提取进程会以 __mp_main__ 重新导入本模块，gradio 只在主进程中导入，界面只在主进程中构建
+    """
+    import gradio as gr
+
+    with gr.Blocks(theme=gr.themes.Soft(primary_hue="slate").set(
+        body_background_fill="*neutral_950",
+        body_background_fill_dark="*neutral_950",
+        background_fill_primary="*neutral_900",
+        background_fill_primary_dark="*neutral_900",
+        background_fill_secondary="*neutral_800",
+        background_fill_secondary_dark="*neutral_800",
+        border_color_primary="*neutral_700",
+        border_color_primary_dark="*neutral_700",
+    ), css="""
+        .thumbnail-cell img { max-width: 150px; max-height: 150px; object-fit: contain; }
+        #pdf-upload button[aria-label="Upload"],
+        #pdf-upload button[aria-label="Upload file"] {
+            min-width: 150px;
+            border-radius: 6px;
+            font-weight: 600;
+            font-size: 14px;
+            padding: 0.4rem 1rem;
+            background: var(--button-primary-background-fill, var(--primary-500));
+            border: 1px solid var(--button-primary-border-color, var(--primary-500));
+            color: var(--button-primary-text-color, #fff);
+            box-shadow: 0 2px 6px rgba(0, 0, 0, 0.1);
+        }
+        #pdf-upload button[aria-label="Upload"]:hover,
+        #pdf-upload button[aria-label="Upload file"]:hover {
+            filter: brightness(1.05);
+        }
+        #pdf-upload button[aria-label="Upload"]::after,
+        #pdf-upload button[aria-label="Upload file"]::after {
+            content: " 上传文件";
+            margin-left: 6px;
+        }
+        /* 隐藏DataFrame的添加行按钮 */
+        button[title="Add row"], button[aria-label="Add row"] {
+            display: none !important;
+        }
+        /* 提示用户只有单号列可编辑 */
+        .dataframe tbody tr td:first-child,
+        .dataframe tbody tr td:last-child {
+            background-color: rgba(128, 128, 128, 0.1) !important;
+            cursor: not-allowed;
+        }
+        /* 紫色主题样式 */
+        #loading_status textarea,
+        #status_extract textarea,
+        #status_rename textarea,
+        #file_op_status textarea {
+            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%) !important;
+            color: white !important;
+            border: none !important;
+            font-weight: 500 !important;
+        }
+        #ocr_viewer {
+            border: 2px solid #667eea !important;
+            border-radius: 8px !important;
+        }
+    """) as demo:
+        gr.Markdown("## OCR - 服务器版")
+        gr.Markdown(
+            """
+            **使用说明:**
+            1. 上传PDF文件并点击 **"开始提取"**
+            2. 查看提取结果，点击表格行即可在右侧预览大图
+            3. 如需修改单号，在表格中直接编辑后点击 **"确认并重命名"**
+            4. 在文件管理器中勾选需要的文件，点击 **"📥 批量下载"**
+            5. ⚠️ **重要**: 输出文件每天00:00自动清理，下载链接10分钟后失效，请及时下载
+            """
+        )
+
+        # 显示清理时间信息
+        cleanup_info = gr.Markdown(value="📋 **文件自动清理**: 每天 00:00 清理 (下次: " + get_next_cleanup_time() + ")")
 
-    # 显示清理时间信息
-    cleanup_info = gr.Markdown(value="📋 **文件自动清理**: 每天 00:00 清理 (下次: " + get_next_cleanup_time() + ")")
+        # 上传和提取部分
+        with gr.Row():
+            upload_button = gr.File(
+                label="上传PDF文件",
+                file_count="multiple",
+                file_types=[".pdf"],
+                elem_id="pdf-upload"
+            )
 
-    # 上传和提取部分
-    with gr.Row():
-        upload_button = gr.File(
-            label="上传PDF文件",
-            file_count="multiple",
-            file_types=[".pdf"],
-            elem_id="pdf-upload"
+        extract_button = gr.Button("开始提取", variant="primary")
+        loading_status = gr.Textbox(label="加载状态", value="", interactive=False, visible=True)
+        status_textbox_extract = gr.Textbox(label="提取状态", interactive=False)
+
+        # 结果表格
+        results_df = gr.DataFrame(
+            headers=["原始文件名", "提取的单号（点击下方重命名）", "提取方式", "提取图像"],
+            datatype=["str", "str", "str", "str"],
+            interactive=True,
+            visible=True,
+            wrap=True
         )
 
-    extract_button = gr.Button("开始提取", variant="primary")
-    loading_status = gr.Textbox(label="加载状态", value="", interactive=False, visible=True)
-    status_textbox_extract = gr.Textbox(label="提取状态", interactive=False)
-
-    # 结果表格
-    results_df = gr.DataFrame(
-        headers=["原始文件名", "提取的单号（点击下方重命名）", "提取图像"],
-        datatype=["str", "str", "str"],
-        interactive=True,
-        visible=True,
-        wrap=True
-    )
+        # 图片查看器
+        with gr.Row():
+            with gr.Column(scale=2):
+                ocr_image_viewer = gr.Image(label="OCR识别结果（点击表格行查看大图）", type="filepath")
+            with gr.Column(scale=1):
+                gr.Markdown("""
+                **图片说明:**
+                - 🟢 绿色框：普通识别文本
+                - 🔴 红色框：发货单号
+                - 点击表格任意行查看对应图片
+                """)
+
+        # 重命名部分
+        rename_button = gr.Button("确认并重命名", variant="stop")
+        status_textbox_rename = gr.Textbox(label="重命名状态", lines=5, interactive=False)
+
+        gr.Markdown("---")
+        gr.Markdown("### 文件管理器")
+
+        # 文件浏览器
+        with gr.Row():
+            refresh_output_btn = gr.Button("刷新", size="sm")
+            download_output_btn = gr.Button("📥 批量下载", size="sm", variant="primary")
+            delete_output_btn = gr.Button("删除选中", variant="stop", size="sm")
+
+        output_files_df = gr.DataFrame(
+            headers=["", "原始文件名", "重命名后文件名", "大小(KB)", "修改时间"],
+            label="已处理文件列表",
+            datatype=["bool", "str", "str", "str", "str"],
+            interactive=True,
+            column_widths=["8%", "30%", "30%", "12%", "20%"],
+            value=list_output_files()
+        )
 
-    # 图片查看器
-    with gr.Row():
-        with gr.Column(scale=2):
-            ocr_image_viewer = gr.Image(label="OCR识别结果（点击表格行查看大图）", type="filepath")
-        with gr.Column(scale=1):
-            gr.Markdown("""
-            **图片说明:**
-            - 🟢 绿色框：普通识别文本
-            - 🔴 红色框：发货单号
-            - 点击表格任意行查看对应图片
-            """)
-
-    # 重命名部分
-    rename_button = gr.Button("确认并重命名", variant="stop")
-    status_textbox_rename = gr.Textbox(label="重命名状态", lines=5, interactive=False)
-
-    gr.Markdown("---")
-    gr.Markdown("### 文件管理器")
-
-    # 文件浏览器
-    with gr.Row():
-        refresh_output_btn = gr.Button("刷新", size="sm")
-        download_output_btn = gr.Button("📥 批量下载", size="sm", variant="primary")
-        delete_output_btn = gr.Button("删除选中", variant="stop", size="sm")
-
-    output_files_df = gr.DataFrame(
-        headers=["", "原始文件名", "重命名后文件名", "大小(KB)", "修改时间"],
-        label="已处理文件列表",
-        datatype=["bool", "str", "str", "str", "str"],
-        interactive=True,
-        column_widths=["8%", "30%", "30%", "12%", "20%"],
-        value=list_output_files()
-    )
+        file_op_status = gr.Textbox(label="操作状态", interactive=False)
 
-    file_op_status = gr.Textbox(label="操作状态", interactive=False)
+        # 下载文件组件
+        download_file = gr.File(label="下载文件", interactive=False)
 
-    # 下载文件组件
-    download_file = gr.File(label="下载文件", interactive=False)
+        # 事件绑定
+        extract_button.click(
+            fn=process_uploads_and_extract,
+            inputs=upload_button,
+            outputs=[results_df, loading_status, status_textbox_extract]
+        )
 
-    # 事件绑定
-    extract_button.click(
-        fn=process_uploads_and_extract,
-        inputs=upload_button,
-        outputs=[results_df, loading_status, status_textbox_extract]
-    )
+        def handle_select(df, evt: gr.SelectData):
+            return view_ocr_image(df, evt.index[0])
 
-    results_df.select(
-        fn=view_ocr_image,
-        inputs=results_df,
-        outputs=ocr_image_viewer
-    )
+        results_df.select(
+            fn=handle_select,
+            inputs=results_df,
+            outputs=ocr_image_viewer
+        )
 
-    rename_button.click(
-        fn=rename_files_and_organize,
-        inputs=results_df,
-        outputs=status_textbox_rename
-    )
+        rename_button.click(
+            fn=rename_files_and_organize,
+            inputs=results_df,
+            outputs=status_textbox_rename
+        )
 
-    # Output文件浏览器事件
-    refresh_output_btn.click(
-        fn=list_output_files,
-        outputs=output_files_df
-    )
+        # Output文件浏览器事件
+        refresh_output_btn.click(
+            fn=list_output_files,
+            outputs=output_files_df
+        )
 
-    # 删除文件 - Output目录
-    def handle_delete(df):
-        msg = delete_selected_files(df)
-        return msg, list_output_files()
+        # 删除文件 - Output目录
+        def handle_delete(df):
+            msg = delete_selected_files(df)
+            return msg, list_output_files()
 
-    delete_output_btn.click(
-        fn=handle_delete,
-        inputs=output_files_df,
-        outputs=[file_op_status, output_files_df]
-    )
+        delete_output_btn.click(
+            fn=handle_delete,
+            inputs=output_files_df,
+            outputs=[file_op_status, output_files_df]
+        )
 
-    # 下载output目录选中的文件
-    def handle_download(df):
-        zip_path = download_selected_files_as_zip(df, OUTPUT_DIR)
-        if zip_path is None:
-            return None, "❌ 请先勾选要下载的文件"
-        return zip_path, f"✓ 已打包 {Path(zip_path).name}，点击下方下载"
-
-    download_output_btn.click(
-        fn=handle_download,
-        inputs=output_files_df,
-        outputs=[download_file, file_op_status]
-    )
+        # 下载output目录选中的文件
+        def handle_download(df):
+            zip_path = download_selected_files_as_zip(df, OUTPUT_DIR)
+            if zip_path is None:
+                return None, "❌ 请先勾选要下载的文件"
+            return zip_path, f"✓ 已打包 {Path(zip_path).name}，点击下方下载"
+
+        download_output_btn.click(
+            fn=handle_download,
+            inputs=output_files_df,
+            outputs=[download_file, file_op_status]
+        )
+
+        # 页面加载时初始化文件列表和清理信息
+        demo.load(
+            fn=lambda: (list_output_files(), "📋 **文件自动清理**: 每天 00:00 清理 (下次: " + get_next_cleanup_time() + ")", get_model_status()),
+            outputs=[output_files_df, cleanup_info, loading_status]
+        )
+
+    return demo
 
-    # 页面加载时初始化文件列表和清理信息
-    demo.load(
-        fn=lambda: (list_output_files(), "📋 **文件自动清理**: 每天 00:00 清理 (下次: " + get_next_cleanup_time() + ")"),
-        outputs=[output_files_df, cleanup_info]
-    )
 
 if __name__ == "__main__":
+    # python app.py --profile-imports: 输出启动导入耗时分析后退出
+    if "--profile-imports" in sys.argv:
+        print_import_profile()
+        sys.exit(0)
+
     print("\n" + "=" * 60)
     print("OCR - 服务器版启动中...")
     print("=" * 60)
@@ -874,15 +1600,19 @@ if __name__ == "__main__":
     print("✓ 目录初始化完成")
 
     # 预加载 OCR 模型（在启动时就加载，避免首次使用时等待）
-    print("\n正在预加载 OCR 模型...")
-    model = get_ocr_model_lazy()
-    if model is None:
-        print("\n⚠ 警告: OCR 模型加载失败，请检查上述错误信息")
-        print("可以继续启动应用，但 OCR 功能将不可用")
-        print("=" * 60)
+    if OCR_LAZY_STARTUP and OCR_WORKER_START_METHOD != "fork":
+        print("\n正在后台加载 OCR 模型，Web 服务将先行启动...")
+        start_background_model_loading()
+    else:
+        if OCR_LAZY_STARTUP:
+            print("\nfork 方式需要在启动 Web 服务前于主线程中加载模型并创建进程池，不使用后台加载")
+        print("\n正在预加载 OCR 模型...")
+        # 在定时任务和 Web 服务的线程启动前创建进程池，fork 出的工作进程不会继承其他线程的锁
+        preload_models()
 
     # 启动定时清理任务
     print("\n正在启动定时清理任务...")
+    from apscheduler.schedulers.background import BackgroundScheduler
     scheduler = BackgroundScheduler()
 
     # Input目录: 每5分钟清理一次
@@ -894,14 +1624,19 @@ if __name__ == "__main__":
     # Downloads目录: 每5分钟清理超过10分钟的文件
     scheduler.add_job(cleanup_downloads_directory, 'interval', minutes=5, id='cleanup_downloads')
 
+    # 提取缓存: 每小时淘汰过期和超量的条目
+    scheduler.add_job(evict_extract_cache, 'interval', hours=1, id='evict_extract_cache')
+
     scheduler.start()
     print("✓ 定时清理任务已启动")
     print("  - Input目录: 每5分钟清理一次")
     print("  - Output目录: 每天00:00清理")
     print("  - Downloads目录: 每5分钟清理超过10分钟的文件")
+    print("  - 提取缓存: 每小时淘汰过期条目")
 
     # 启动 Gradio 应用
     print("\n正在启动 Web 服务...")
+    demo = build_ui()
     print("=" * 60)
 
     # 根据操作系统自动适配
@@ -931,3 +1666,4 @@ if __name__ == "__main__":
         print("\n正在关闭...")
         scheduler.shutdown()
         print("定时任务已停止")
+        shutdown_extract_pool()
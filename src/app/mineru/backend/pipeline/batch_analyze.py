@@ -12,7 +12,9 @@ from ...utils.config_reader import get_formula_enable, get_table_enable
 from ...utils.model_utils import crop_img, get_res_list_from_layout_res, clean_vram
 from ...utils.ocr_utils import merge_det_boxes, update_det_boxes, sorted_boxes
 from ...utils.ocr_utils import get_adjusted_mfdetrec_res, get_ocr_result_list, OcrConfidence, get_rotate_crop_image
+from ...utils.os_env_config import is_stage_pipeline_enabled, get_stage_pipeline_chunk_size, get_stage_pipeline_queue_size
 from ...utils.pdf_image_tools import get_crop_np_img
+from ...utils.stage_pipeline import StagePipeline
 
 YOLO_LAYOUT_BASE_BATCH_SIZE = 1
 MFD_BASE_BATCH_SIZE = 1
@@ -34,23 +36,50 @@ class BatchAnalyze:
         if len(images_with_extra_info) == 0:
             return []
 
-        images_layout_res = []
-
         self.model = self.model_manager.get_model(
             lang=None,
             formula_enable=self.formula_enable,
             table_enable=self.table_enable,
         )
-        atom_model_manager = AtomModelSingleton()
 
-        pil_images = [image for image, _, _ in images_with_extra_info]
+        chunk_size = get_stage_pipeline_chunk_size()
+        if not is_stage_pipeline_enabled() or len(images_with_extra_info) <= chunk_size:
+            state = self._layout_stage(images_with_extra_info)
+            state = self._table_stage(state)
+            state = self._ocr_det_stage(state)
+            state = self._ocr_rec_stage(state)
+            return state['images_layout_res']
+
+        # 流水线模式: 按块切分页面，布局、表格、OCR-det、OCR-rec 各阶段在不同线程中重叠执行
+        chunks = [
+            images_with_extra_info[i:i + chunk_size]
+            for i in range(0, len(images_with_extra_info), chunk_size)
+        ]
+        pipeline = StagePipeline([
+            ("layout", self._layout_stage),
+            ("table", self._table_stage),
+            ("ocr-det", self._ocr_det_stage),
+            ("ocr-rec", self._ocr_rec_stage),
+        ], queue_size=get_stage_pipeline_queue_size())
+        images_layout_res = []
+        for state in pipeline.run(chunks):
+            images_layout_res.extend(state['images_layout_res'])
+        pipeline.log_stats(f"BatchAnalyze pipeline ({len(chunks)} chunks)")
+        return images_layout_res
 
-        np_images = [np.asarray(image) for image, _, _ in images_with_extra_info]
+    def _layout_stage(self, images_with_extra_info: list) -> dict:
+        """布局检测、公式检测与识别，并收集需要 OCR 和表格识别的区域"""
+        images_layout_res = []
 
-        # doclayout_yolo
+        np_images = [np.asarray(image) for image, _, _ in images_with_extra_info]
 
+        # doclayout_yolo 将 ndarray 输入视为 BGR，RGB 页面转为 BGR 后传入，与传入 PIL 图像时模型看到的输入一致
+        layout_images = [
+            np.ascontiguousarray(image[..., ::-1]) if isinstance(image, np.ndarray) else image
+            for image, _, _ in images_with_extra_info
+        ]
         images_layout_res += self.model.layout_model.batch_predict(
-            pil_images, YOLO_LAYOUT_BASE_BATCH_SIZE
+            layout_images, YOLO_LAYOUT_BASE_BATCH_SIZE
         )
 
         if self.formula_enable:
@@ -108,6 +137,16 @@ class BatchAnalyze:
                                                 'wired_table_img':wired_table_img,
                                               })
 
+        return {
+            'images_layout_res': images_layout_res,
+            'ocr_res_list_all_page': ocr_res_list_all_page,
+            'table_res_list_all_page': table_res_list_all_page,
+        }
+
+    def _table_stage(self, state: dict) -> dict:
+        table_res_list_all_page = state['table_res_list_all_page']
+        atom_model_manager = AtomModelSingleton()
+
         # 表格识别 table recognition
         if self.table_enable:
 
@@ -152,6 +191,7 @@ class BatchAnalyze:
             for index, table_res_dict in enumerate(
                     tqdm(table_res_list_all_page, desc="Table-ocr det")
             ):
+                _lang = table_res_dict["lang"]
                 bgr_image = cv2.cvtColor(table_res_dict["table_img"], cv2.COLOR_RGB2BGR)
                 ocr_result = det_ocr_engine.ocr(bgr_image, rec=False)[0]
                 # 构造需要 OCR 识别的图片字典，包括cropped_img, dt_box, table_id，并按照语言进行分组
@@ -235,6 +275,12 @@ class BatchAnalyze:
                     end_index = html_code.rfind("</table>") + len("</table>")
                     table_res_dict["table_res"]["html"] = html_code[start_index:end_index]
 
+        return state
+
+    def _ocr_det_stage(self, state: dict) -> dict:
+        ocr_res_list_all_page = state['ocr_res_list_all_page']
+        atom_model_manager = AtomModelSingleton()
+
         # OCR det
         if self.enable_ocr_det_batch:
             # 批处理模式 - 按语言和分辨率分组
@@ -363,6 +409,12 @@ class BatchAnalyze:
 
                         ocr_res_list_dict['layout_res'].extend(ocr_result_list)
 
+        return state
+
+    def _ocr_rec_stage(self, state: dict) -> dict:
+        images_layout_res = state['images_layout_res']
+        atom_model_manager = AtomModelSingleton()
+
         # OCR rec
         # Create dictionaries to store items by language
         need_ocr_lists_by_lang = {}  # Dict of lists for each language
@@ -425,4 +477,4 @@ class BatchAnalyze:
 
                     total_processed += len(img_crop_list)
 
-        return images_layout_res
+        return state
@@ -1,4 +1,5 @@
 import os
+import threading
 
 import torch
 from loguru import logger
@@ -120,6 +121,9 @@ def ocr_model_init(det_db_box_thresh=0.3,
 class AtomModelSingleton:
     _instance = None
     _models = {}
+    # 流水线各阶段在不同线程中获取模型，同一个 key 的模型只允许一个线程初始化，不同模型可并行初始化
+    _lock = threading.Lock()
+    _key_locks = {}
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -136,6 +140,7 @@ class AtomModelSingleton:
                 lang
             )
         elif atom_model_name in [AtomicModel.OCR]:
+            # 不同阈值组合各自一个轻量实例，检测/识别网络按权重路径与设备在实例间共享
             key = (
                 atom_model_name,
                 kwargs.get('det_db_box_thresh', 0.3),
@@ -147,7 +152,11 @@ class AtomModelSingleton:
             key = atom_model_name
 
         if key not in self._models:
-            self._models[key] = atom_model_init(model_name=atom_model_name, **kwargs)
+            with self._lock:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                if key not in self._models:
+                    self._models[key] = atom_model_init(model_name=atom_model_name, **kwargs)
         return self._models[key]
 
 def atom_model_init(model_name: str, **kwargs):
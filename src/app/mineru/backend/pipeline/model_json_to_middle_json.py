@@ -23,11 +23,12 @@ from mineru.utils.span_pre_proc import remove_outside_spans, remove_overlaps_low
     remove_overlaps_min_spans, txt_spans_extract
 from mineru.version import __version__
 from mineru.utils.hash_utils import bytes_md5
+from mineru.utils.pdf_image_tools import get_page_pil_img
 
 
 def page_model_info_to_page_info(page_model_info, image_dict, page, image_writer, page_index, ocr_enable=False, formula_enabled=True):
     scale = image_dict["scale"]
-    page_pil_img = image_dict["img_pil"]
+    page_pil_img = get_page_pil_img(image_dict)
     # page_img_md5 = str_md5(image_dict["img_base64"])
     page_img_md5 = bytes_md5(page_pil_img.tobytes())
     page_w, page_h = map(int, page.get_size())
@@ -174,19 +175,34 @@ def page_model_info_to_page_info(page_model_info, image_dict, page, image_writer
 
 
 def result_to_middle_json(model_list, images_list, pdf_doc, image_writer, lang=None, ocr_enable=False, formula_enabled=True):
-    middle_json = {"pdf_info": [], "_backend":"pipeline", "_version_name": __version__}
-    formula_enabled = get_formula_enable(formula_enabled)
+    middle_json = init_middle_json()
     for page_index, page_model_info in tqdm(enumerate(model_list), total=len(model_list), desc="Processing pages"):
-        page = pdf_doc[page_index]
-        image_dict = images_list[page_index]
-        page_info = page_model_info_to_page_info(
-            page_model_info, image_dict, page, image_writer, page_index, ocr_enable=ocr_enable, formula_enabled=formula_enabled
+        append_page_to_middle_json(
+            middle_json, page_model_info, images_list[page_index], pdf_doc, image_writer, page_index,
+            ocr_enable=ocr_enable, formula_enabled=formula_enabled
         )
-        if page_info is None:
-            page_w, page_h = map(int, page.get_size())
-            page_info = make_page_info_dict([], page_index, page_w, page_h, [])
-        middle_json["pdf_info"].append(page_info)
+    return finalize_middle_json(middle_json, pdf_doc, lang=lang)
+
+
+def init_middle_json():
+    return {"pdf_info": [], "_backend":"pipeline", "_version_name": __version__}
+
+
+def append_page_to_middle_json(middle_json, page_model_info, image_dict, pdf_doc, image_writer, page_index, ocr_enable=False, formula_enabled=True):
+    """处理单页并追加到 middle_json，完成后该页图像不再被使用，可以立即释放"""
+    formula_enabled = get_formula_enable(formula_enabled)
+    page = pdf_doc[page_index]
+    page_info = page_model_info_to_page_info(
+        page_model_info, image_dict, page, image_writer, page_index, ocr_enable=ocr_enable, formula_enabled=formula_enabled
+    )
+    if page_info is None:
+        page_w, page_h = map(int, page.get_size())
+        page_info = make_page_info_dict([], page_index, page_w, page_h, [])
+    middle_json["pdf_info"].append(page_info)
+
 
+def finalize_middle_json(middle_json, pdf_doc, lang=None):
+    """所有页追加完成后的后置处理，不再需要页面图像"""
     """后置ocr处理"""
     need_ocr_list = []
     img_crop_list = []
@@ -247,7 +263,7 @@ def result_to_middle_json(model_list, images_list, pdf_doc, image_writer, lang=N
 
     """清理内存"""
     pdf_doc.close()
-    if os.getenv('MINERU_DONOT_CLEAN_MEM') is None and len(model_list) >= 10:
+    if os.getenv('MINERU_DONOT_CLEAN_MEM') is None and len(middle_json["pdf_info"]) >= 10:
         clean_memory(get_device())
 
     return middle_json
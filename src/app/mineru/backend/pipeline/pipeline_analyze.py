@@ -1,6 +1,9 @@
 import os
+import threading
 import time
-from typing import List, Tuple
+import numpy as np
+import pypdfium2 as pdfium
+from typing import List, Tuple, Union
 from PIL import Image
 from loguru import logger
 
@@ -8,13 +11,18 @@ from .model_init import MineruPipelineModel
 from mineru.utils.config_reader import get_device
 from ...utils.enum_class import ImageType
 from ...utils.pdf_classify import classify
-from ...utils.pdf_image_tools import load_images_from_pdf
+from ...utils.pdf_image_tools import get_page_size, load_images_from_pdf, release_images
 from ...utils.model_utils import get_vram, clean_memory
+from ...utils.os_env_config import is_stage_pipeline_enabled
+from ...utils.stage_pipeline import StagePipeline
 
 
 os.environ['PYTORCH_ENABLE_MPS_FALLBACK'] = '1'  # 让mps可以fallback
 os.environ['NO_ALBUMENTATIONS_UPDATE'] = '1'  # 禁止albumentations检查更新
 
+# 流式推理时同时驻留内存的窗口数上限: 使用方正在处理的窗口和预先渲染的下一个窗口
+STREAMING_MAX_RESIDENT_WINDOWS = 2
+
 class ModelSingleton:
     _instance = None
     _models = {}
@@ -77,6 +85,8 @@ def doc_analyze(
     """
     适当调大MIN_BATCH_INFERENCE_SIZE可以提高性能，更大的 MIN_BATCH_INFERENCE_SIZE会消耗更多内存，
     可通过环境变量MINERU_MIN_BATCH_INFERENCE_SIZE设置，默认值为384。
+    页面以 ImageType.NUMPY 渲染，多页文档经由共享内存从渲染进程零拷贝传回；
+    返回的 all_image_lists 使用完毕后需对每个文档调用 release_images 释放。
     """
     min_batch_inference_size = int(os.environ.get('MINERU_MIN_BATCH_INFERENCE_SIZE', 384))
 
@@ -100,7 +110,7 @@ def doc_analyze(
 
         # 收集每个数据集中的页面
         # load_images_start = time.time()
-        images_list, pdf_doc = load_images_from_pdf(pdf_bytes, image_type=ImageType.PIL)
+        images_list, pdf_doc = load_images_from_pdf(pdf_bytes, image_type=ImageType.NUMPY)
         # load_images_time = round(time.time() - load_images_start, 2)
         # logger.debug(f"load images cost: {load_images_time}, speed: {round(len(images_list) / load_images_time, 3)} images/s")
         all_image_lists.append(images_list)
@@ -109,7 +119,7 @@ def doc_analyze(
             img_dict = images_list[page_idx]
             all_pages_info.append((
                 pdf_idx, page_idx,
-                img_dict['img_pil'], _ocr_enable, _lang,
+                img_dict['img_np'], _ocr_enable, _lang,
             ))
 
     # 准备批处理
@@ -139,10 +149,10 @@ def doc_analyze(
         infer_results.append([])
 
     for i, page_info in enumerate(all_pages_info):
-        pdf_idx, page_idx, pil_img, _, _ = page_info
+        pdf_idx, page_idx, np_img, _, _ = page_info
         result = results[i]
 
-        page_info_dict = {'page_no': page_idx, 'width': pil_img.width, 'height': pil_img.height}
+        page_info_dict = {'page_no': page_idx, 'width': np_img.shape[1], 'height': np_img.shape[0]}
         page_dict = {'layout_dets': result, 'page_info': page_info_dict}
 
         infer_results[pdf_idx].append(page_dict)
@@ -150,8 +160,125 @@ def doc_analyze(
     return infer_results, all_image_lists, all_pdf_docs, lang_list, ocr_enabled_list
 
 
+def doc_analyze_streaming(
+        pdf_bytes_list,
+        lang_list,
+        parse_method: str = 'auto',
+        formula_enable=True,
+        table_enable=True,
+):
+    """
+    doc_analyze 的流式版本: 按 MINERU_MIN_BATCH_INFERENCE_SIZE 分窗口渲染页面并推理，
+    峰值内存由窗口大小决定，与总页数无关。
+    未启用阶段流水线时同时只有一个窗口的图像驻留内存；启用时推理当前窗口的同时预先渲染下一个窗口，
+    最多两个窗口驻留(不含使用方自行保留的图像)。
+    返回 (page_iter, page_count_list, lang_list, ocr_enabled_list)，
+    page_iter 按文档和页码顺序产出 (pdf_idx, page_idx, image_dict, page_dict)，
+    产出后生成器不再持有该页图像，使用方处理完后调用 release_images([image_dict]) 释放其共享内存。
+    """
+    min_batch_inference_size = int(os.environ.get('MINERU_MIN_BATCH_INFERENCE_SIZE', 384))
+
+    page_count_list = []
+    ocr_enabled_list = []
+    for pdf_bytes in pdf_bytes_list:
+        _ocr_enable = False
+        if parse_method == 'auto':
+            if classify(pdf_bytes) == 'ocr':
+                _ocr_enable = True
+        elif parse_method == 'ocr':
+            _ocr_enable = True
+        ocr_enabled_list.append(_ocr_enable)
+
+        pdf_doc = pdfium.PdfDocument(pdf_bytes)
+        page_count_list.append(len(pdf_doc))
+        pdf_doc.close()
+
+    # 按窗口划分页面: 每个窗口是若干 (pdf_idx, start_page_id, end_page_id)
+    windows = []
+    window = []
+    window_size = 0
+    for pdf_idx, page_count in enumerate(page_count_list):
+        start_page_id = 0
+        while start_page_id < page_count:
+            end_page_id = min(page_count, start_page_id + min_batch_inference_size - window_size) - 1
+            window.append((pdf_idx, start_page_id, end_page_id))
+            window_size += end_page_id - start_page_id + 1
+            start_page_id = end_page_id + 1
+            if window_size >= min_batch_inference_size:
+                windows.append(window)
+                window = []
+                window_size = 0
+    if window:
+        windows.append(window)
+
+    # 流水线模式下渲染前需取得名额，使用方处理完一个窗口的全部页面后归还，限制驻留内存的窗口数
+    window_slots = threading.Semaphore(STREAMING_MAX_RESIDENT_WINDOWS)
+
+    def render_window(window):
+        window_slots.acquire()
+        window_pages = []
+        for pdf_idx, start_page_id, end_page_id in window:
+            images_list, pdf_doc = load_images_from_pdf(
+                pdf_bytes_list[pdf_idx], start_page_id=start_page_id, end_page_id=end_page_id,
+                image_type=ImageType.NUMPY
+            )
+            pdf_doc.close()
+            for offset, img_dict in enumerate(images_list):
+                window_pages.append((pdf_idx, start_page_id + offset, img_dict))
+        return window_pages
+
+    total_pages = sum(page_count_list)
+    processed_images_count = 0
+
+    def analyze_window(window_pages):
+        nonlocal processed_images_count
+        processed_images_count += len(window_pages)
+        logger.info(f'Batch: {processed_images_count} pages/{total_pages} pages')
+        batch_results = batch_image_analyze(
+            [(img_dict['img_np'], ocr_enabled_list[pdf_idx], lang_list[pdf_idx])
+             for pdf_idx, _, img_dict in window_pages],
+            formula_enable, table_enable
+        )
+        return window_pages, batch_results
+
+    def page_iter():
+        if is_stage_pipeline_enabled():
+            # 推理当前窗口的同时渲染下一个窗口，队列长度为 1 以限制同时驻留内存的窗口数
+            pipeline = StagePipeline([("render", render_window), ("analyze", analyze_window)], queue_size=1)
+            analyzed_windows = pipeline.run(windows)
+        else:
+            pipeline = None
+            analyzed_windows = (analyze_window(render_window(window)) for window in windows)
+
+        window_pages = []
+        try:
+            for window_pages, batch_results in analyzed_windows:
+                for i, result in enumerate(batch_results):
+                    pdf_idx, page_idx, img_dict = window_pages[i]
+                    # 产出后立即丢弃引用，图像由使用方决定何时释放
+                    window_pages[i] = None
+                    width, height = get_page_size(img_dict)
+                    page_info_dict = {'page_no': page_idx, 'width': width, 'height': height}
+                    page_dict = {'layout_dets': result, 'page_info': page_info_dict}
+                    yield pdf_idx, page_idx, img_dict, page_dict
+                window_pages = []
+                del batch_results
+                window_slots.release()
+        finally:
+            # 使用方提前停止迭代时释放当前窗口中尚未产出的页面
+            release_images([page[2] for page in window_pages if page is not None])
+            # 使用方提前停止迭代时归还所有名额，避免渲染线程一直等待
+            for _ in range(len(windows)):
+                window_slots.release()
+
+        if pipeline is not None:
+            pipeline.log_stats(f"doc_analyze pipeline ({len(windows)} windows)")
+
+    return page_iter(), page_count_list, lang_list, ocr_enabled_list
+
+
 def batch_image_analyze(
-        images_with_extra_info: List[Tuple[Image.Image, bool, str]],
+        images_with_extra_info: List[Tuple[Union[np.ndarray, Image.Image], bool, str]],
         formula_enable=True,
         table_enable=True):
 
@@ -12,7 +12,7 @@ from mineru.data.data_reader_writer import FileBasedDataWriter
 from mineru.utils.draw_bbox import draw_layout_bbox, draw_span_bbox, draw_line_sort_bbox
 from mineru.utils.enum_class import MakeMode
 from mineru.utils.guess_suffix_or_lang import guess_suffix_by_bytes
-from mineru.utils.pdf_image_tools import images_bytes_to_pdf_bytes
+from mineru.utils.pdf_image_tools import images_bytes_to_pdf_bytes, release_images
 from mineru.backend.vlm.vlm_middle_json_mkcontent import union_make as vlm_union_make
 from mineru.backend.vlm.vlm_analyze import doc_analyze as vlm_doc_analyze
 from mineru.backend.vlm.vlm_analyze import aio_doc_analyze as aio_vlm_doc_analyze
@@ -172,6 +172,16 @@ def _process_pipeline(
     from mineru.backend.pipeline.model_json_to_middle_json import result_to_middle_json as pipeline_result_to_middle_json
     from mineru.backend.pipeline.pipeline_analyze import doc_analyze as pipeline_doc_analyze
 
+    # 流式模式按窗口渲染和推理，峰值内存不随总页数增长
+    if os.getenv('MINERU_PIPELINE_STREAMING', 'false').lower() in ['true', '1', 'yes']:
+        _process_pipeline_streaming(
+            output_dir, pdf_file_names, pdf_bytes_list, p_lang_list,
+            parse_method, p_formula_enable, p_table_enable,
+            f_draw_layout_bbox, f_draw_span_bbox, f_dump_md, f_dump_middle_json,
+            f_dump_model_output, f_dump_orig_pdf, f_dump_content_list, f_make_md_mode
+        )
+        return
+
     infer_results, all_image_lists, all_pdf_docs, lang_list, ocr_enabled_list = (
         pipeline_doc_analyze(
             pdf_bytes_list, p_lang_list, parse_method=parse_method,
@@ -194,6 +204,8 @@ def _process_pipeline(
             model_list, images_list, pdf_doc, image_writer,
             _lang, _ocr_enable, p_formula_enable
         )
+        # 页面图像只在生成 middle_json 时使用，之后立即释放其共享内存
+        release_images(images_list)
 
         pdf_info = middle_json["pdf_info"]
         pdf_bytes = pdf_bytes_list[idx]
@@ -206,6 +218,78 @@ def _process_pipeline(
         )
 
 
+def _process_pipeline_streaming(
+        output_dir,
+        pdf_file_names,
+        pdf_bytes_list,
+        p_lang_list,
+        parse_method,
+        p_formula_enable,
+        p_table_enable,
+        f_draw_layout_bbox,
+        f_draw_span_bbox,
+        f_dump_md,
+        f_dump_middle_json,
+        f_dump_model_output,
+        f_dump_orig_pdf,
+        f_dump_content_list,
+        f_make_md_mode,
+):
+    """流式处理pipeline后端逻辑，每页推理完成后立即写入 middle_json 并释放页面图像"""
+    from mineru.backend.pipeline.model_json_to_middle_json import (
+        init_middle_json, append_page_to_middle_json, finalize_middle_json
+    )
+    from mineru.backend.pipeline.pipeline_analyze import doc_analyze_streaming as pipeline_doc_analyze_streaming
+
+    page_iter, page_count_list, lang_list, ocr_enabled_list = pipeline_doc_analyze_streaming(
+        pdf_bytes_list, p_lang_list, parse_method=parse_method,
+        formula_enable=p_formula_enable, table_enable=p_table_enable
+    )
+
+    def finish_document(idx, doc_state):
+        middle_json = finalize_middle_json(doc_state["middle_json"], doc_state["pdf_doc"], lang_list[idx])
+        _process_output(
+            middle_json["pdf_info"], pdf_bytes_list[idx], pdf_file_names[idx], doc_state["local_md_dir"],
+            doc_state["local_image_dir"], doc_state["md_writer"], f_draw_layout_bbox, f_draw_span_bbox,
+            f_dump_orig_pdf, f_dump_md, f_dump_content_list, f_dump_middle_json, f_dump_model_output,
+            f_make_md_mode, middle_json, doc_state["model_json"], is_pipeline=True
+        )
+
+    def start_document(idx):
+        local_image_dir, local_md_dir = prepare_env(output_dir, pdf_file_names[idx], parse_method)
+        return {
+            "local_image_dir": local_image_dir,
+            "local_md_dir": local_md_dir,
+            "image_writer": FileBasedDataWriter(local_image_dir),
+            "md_writer": FileBasedDataWriter(local_md_dir),
+            "pdf_doc": pdfium.PdfDocument(pdf_bytes_list[idx]),
+            "middle_json": init_middle_json(),
+            "model_json": [],
+        }
+
+    doc_states = {}
+    for pdf_idx, page_idx, image_dict, page_dict in page_iter:
+        if pdf_idx not in doc_states:
+            doc_states[pdf_idx] = start_document(pdf_idx)
+        doc_state = doc_states[pdf_idx]
+
+        doc_state["model_json"].append(copy.deepcopy(page_dict))
+        append_page_to_middle_json(
+            doc_state["middle_json"], page_dict, image_dict, doc_state["pdf_doc"], doc_state["image_writer"],
+            page_idx, ocr_enable=ocr_enabled_list[pdf_idx], formula_enabled=p_formula_enable
+        )
+        release_images([image_dict])
+        del image_dict
+
+        if page_idx == page_count_list[pdf_idx] - 1:
+            finish_document(pdf_idx, doc_states.pop(pdf_idx))
+
+    # 没有页面的文档
+    for idx, page_count in enumerate(page_count_list):
+        if page_count == 0:
+            finish_document(idx, start_document(idx))
+
+
 async def _async_process_vlm(
         output_dir,
         pdf_file_names,
@@ -6,7 +6,7 @@ import requests
 from loguru import logger
 
 from mineru.utils.enum_class import ModelPath
-from mineru.utils.models_download_utils import auto_download_and_get_model_root_path
+from mineru.utils.models_download_utils import auto_download_and_get_model_root_path, invalidate_model_manifest
 
 
 def download_json(url):
@@ -133,6 +133,8 @@ def download_models(model_source, model_type):
         )
 
     logger.info(f"Downloading {model_type} model from {os.getenv('MINERU_MODEL_SOURCE', None)}...")
+    # 显式下载时清空清单，确保重新经过 snapshot_download 同步模型文件
+    invalidate_model_manifest()
 
     try:
         if model_type == 'pipeline':
@@ -1,8 +1,16 @@
+import importlib
+
 from .base import DataReader, DataWriter
 from .dummy import DummyDataWriter
 from .filebase import FileBasedDataReader, FileBasedDataWriter
-from .multi_bucket_s3 import MultiBucketS3DataReader, MultiBucketS3DataWriter
-from .s3 import S3DataReader, S3DataWriter
+
+# S3 相关类依赖 boto3，导入耗时较长，首次访问时再加载
+_LAZY_ATTRS = {
+    "S3DataReader": ".s3",
+    "S3DataWriter": ".s3",
+    "MultiBucketS3DataReader": ".multi_bucket_s3",
+    "MultiBucketS3DataWriter": ".multi_bucket_s3",
+}
 
 __all__ = [
     "DataReader",
@@ -15,3 +23,15 @@ __all__ = [
     "MultiBucketS3DataWriter",
     "DummyDataWriter",
 ]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRS:
+        value = getattr(importlib.import_module(_LAZY_ATTRS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
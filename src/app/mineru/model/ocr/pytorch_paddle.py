@@ -1,6 +1,7 @@
 # Copyright (c) Opendatalab. All rights reserved.
 import copy
 import os
+import re
 import warnings
 from pathlib import Path
 
@@ -11,8 +12,12 @@ from loguru import logger
 
 from mineru.utils.config_reader import get_device
 from mineru.utils.enum_class import ModelPath
+from mineru.utils.model_utils import get_vram
 from mineru.utils.models_download_utils import auto_download_and_get_model_root_path
-from mineru.utils.ocr_utils import check_img, preprocess_image, sorted_boxes, merge_det_boxes, update_det_boxes, get_rotate_crop_image
+from mineru.utils.os_env_config import get_ocr_backend, get_op_num_threads, is_rec_quantize_enabled, \
+    get_rec_quantize_sample_dir, get_rec_batch_pixels
+from mineru.utils.ocr_utils import check_img, preprocess_image, sorted_boxes, merge_det_boxes, update_det_boxes, get_rotate_crop_image, \
+    group_boxes_into_lines
 from mineru.model.utils.tools.infer.predict_system import TextSystem
 from mineru.model.utils.tools.infer import pytorchocr_utility as utility
 import argparse
@@ -136,6 +141,34 @@ def get_model_params(lang, config):
 
 root_dir = os.path.join(Path(__file__).resolve().parent.parent, 'utils')
 
+# 多图 OCR 时，检测输入按此步长向上取整并填充到统一尺寸后分组批处理
+DET_RESOLUTION_GROUP_STRIDE = 64
+DET_BATCH_SIZE = 16
+
+
+def is_det_batch_supported(device) -> bool:
+    import torch
+    from packaging import version
+    # 与 pipeline 后端保持一致: torch>=2.8 及 mps 上批量检测结果异常，改为逐张检测
+    return version.parse(torch.__version__) < version.parse("2.8.0") and not str(device).startswith('mps')
+
+
+# 识别批次的基础像素预算，与原先固定 6 条最长(1280px)文本行的峰值相同
+REC_BASE_BATCH_PIXELS = 48 * 1280 * 6
+
+
+def get_default_rec_batch_pixels(device) -> int:
+    batch_pixels = get_rec_batch_pixels()
+    if batch_pixels > 0:
+        return batch_pixels
+    # gpu 上按显存放大预算，每 2GB 一倍，最多 16 倍
+    batch_ratio = 1
+    if str(device).startswith('cuda') or str(device).startswith('npu'):
+        vram = get_vram(device)
+        if vram is not None:
+            batch_ratio = max(1, min(16, int(vram) // 2))
+    return REC_BASE_BATCH_PIXELS * batch_ratio
+
 
 class PytorchPaddleOCR(TextSystem):
     def __init__(self, *args, **kwargs):
@@ -146,6 +179,9 @@ class PytorchPaddleOCR(TextSystem):
         self.enable_merge_det_boxes = kwargs.get("enable_merge_det_boxes", True)
 
         device = get_device()
+        self.enable_det_batch = kwargs.pop("enable_det_batch", None)
+        if self.enable_det_batch is None:
+            self.enable_det_batch = is_det_batch_supported(device)
         if device == 'cpu' and self.lang in ['ch', 'ch_server', 'japan', 'chinese_cht']:
             # logger.warning("The current device in use is CPU. To ensure the speed of parsing, the language is automatically switched to ch_lite.")
             self.lang = 'ch_lite'
@@ -193,9 +229,20 @@ class PytorchPaddleOCR(TextSystem):
         kwargs['rec_model_path'] = rec_model_path
         kwargs['rec_char_dict_path'] = rec_char_dict_path
         kwargs['rec_batch_num'] = 6
+        kwargs.setdefault('rec_batch_pixels', get_default_rec_batch_pixels(device))
 
         kwargs['device'] = device
 
+        # 推理后端: torch(默认) 或 onnx，onnx 仅在 cpu 上生效
+        kwargs.setdefault('ocr_backend', get_ocr_backend())
+        if kwargs['ocr_backend'] not in ['torch', 'onnx']:
+            raise ValueError(f"Unsupported ocr_backend: {kwargs['ocr_backend']}")
+        kwargs.setdefault('ort_intra_op_num_threads', get_op_num_threads("MINERU_INTRA_OP_NUM_THREADS"))
+        kwargs.setdefault('ort_inter_op_num_threads', get_op_num_threads("MINERU_INTER_OP_NUM_THREADS"))
+        # 识别模型 INT8 量化，仅对 torch 后端的 cpu 推理生效
+        kwargs.setdefault('rec_quantize', is_rec_quantize_enabled())
+        kwargs.setdefault('rec_quantize_sample_dir', get_rec_quantize_sample_dir())
+
         default_args = vars(args)
         default_args.update(kwargs)
         args = argparse.Namespace(**default_args)
@@ -211,9 +258,11 @@ class PytorchPaddleOCR(TextSystem):
             tqdm_desc="OCR-rec Predict",
             ):
         assert isinstance(img, (np.ndarray, list, str, bytes))
-        if isinstance(img, list) and det == True:
-            logger.error('When input a list of images, det must be false')
-            exit(0)
+        if isinstance(img, list) and det:
+            # 多图输入: 按分辨率分组批量检测，所有文本框合并为一次识别
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                return self._batch_ocr(img, rec=rec, mfd_res=mfd_res, tqdm_enable=tqdm_enable, tqdm_desc=tqdm_desc)
         img = check_img(img)
         imgs = [img]
         with warnings.catch_warnings():
@@ -258,22 +307,153 @@ class PytorchPaddleOCR(TextSystem):
                     ocr_res.append(rec_res)
                 return ocr_res
 
-    def __call__(self, img, mfd_res=None):
-
-        if img is None:
-            logger.debug("no valid image provided")
-            return None, None
-
-        ori_im = img.copy()
+    def anchored_ocr(self, img, anchor_pattern, value_pattern, mfd_res=None):
+        """
+        锚点模式的键值提取: 检测全部文本框，但按文本行依次识别；找到匹配 anchor_pattern 的标签框后，
+        只再识别与其处于同一行且位于其右侧的文本框，value_pattern 匹配成功后立即停止，剩余文本框不再识别。
+
+        Args:
+            img: 单张图像
+            anchor_pattern: 标签文本的正则(str 或已编译的正则)，例如 "发货单"
+            value_pattern: 作用于 "标签框及其右侧文本框" 拼接文本的正则(str 或已编译的正则)
+            mfd_res: 公式检测结果，与 ocr() 相同
+
+        Returns:
+            (match, ocr_res): match 为 value_pattern 的匹配结果，未找到时为 None；
+            ocr_res 为已识别文本框的结果，格式与 ocr() 返回的单张图片结果相同
+        """
+        if isinstance(anchor_pattern, str):
+            anchor_pattern = re.compile(anchor_pattern)
+        if isinstance(value_pattern, str):
+            value_pattern = re.compile(value_pattern)
+
+        img = preprocess_image(check_img(img))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            ori_im = img.copy()
+            dt_boxes = self._detect_sorted_boxes(img, mfd_res=mfd_res)
+            if not dt_boxes:
+                return None, []
+
+            bboxes = [(np.min(box[:, 0]), np.min(box[:, 1]), np.max(box[:, 0]), np.max(box[:, 1])) for box in dt_boxes]
+            rec_results = {}
+
+            def recognize(indices):
+                indices = [i for i in indices if i not in rec_results]
+                if indices:
+                    img_crop_list = [get_rotate_crop_image(ori_im, copy.deepcopy(dt_boxes[i]), copy_crop=False) for i in indices]
+                    rec_res, _ = self.text_recognizer(img_crop_list)
+                    rec_results.update(zip(indices, rec_res))
+
+            match = None
+            for line in group_boxes_into_lines(dt_boxes):
+                recognize(line)
+                for anchor_index in line:
+                    anchor_text, anchor_score = rec_results[anchor_index]
+                    if anchor_score < self.drop_score or not anchor_pattern.search(anchor_text):
+                        continue
+                    # 右侧文本框: 左边界不在标签左侧，且竖直中心落在标签框高度范围内
+                    x0, y0, _, y1 = bboxes[anchor_index]
+                    right_indices = sorted(
+                        [i for i, (bx0, by0, _, by1) in enumerate(bboxes)
+                         if i != anchor_index and bx0 >= x0 and y0 <= (by0 + by1) / 2 <= y1],
+                        key=lambda i: bboxes[i][0],
+                    )
+                    recognize(right_indices)
+                    value_text = " ".join(
+                        [anchor_text] + [rec_results[i][0] for i in right_indices if rec_results[i][1] >= self.drop_score]
+                    )
+                    match = value_pattern.search(value_text)
+                    if match:
+                        break
+                if match:
+                    break
+
+        # logger.debug("anchored ocr recognized {}/{} boxes".format(len(rec_results), len(dt_boxes)))
+        ocr_res = [[dt_boxes[i].tolist(), rec_results[i]] for i in sorted(rec_results) if rec_results[i][1] >= self.drop_score]
+        return match, ocr_res
+
+    def _batch_ocr(self, imgs, rec=True, mfd_res=None, tqdm_enable=False, tqdm_desc="OCR-rec Predict"):
+        """
+        多图检测+识别，返回格式与单图 ocr() 相同，每张图对应一个元素
+        mfd_res 为 None 或与 imgs 等长的列表
+        """
+        imgs = [preprocess_image(check_img(img)) for img in imgs]
+        if mfd_res is None:
+            mfd_res = [None] * len(imgs)
+
+        # 检测: 按填充后的分辨率分组，每组一次前向
+        det_results = [None] * len(imgs)
+        if self.enable_det_batch:
+            resolution_groups = {}
+            for index, img in enumerate(imgs):
+                h, w = img.shape[:2]
+                target_h = -(-h // DET_RESOLUTION_GROUP_STRIDE) * DET_RESOLUTION_GROUP_STRIDE
+                target_w = -(-w // DET_RESOLUTION_GROUP_STRIDE) * DET_RESOLUTION_GROUP_STRIDE
+                resolution_groups.setdefault((target_h, target_w), []).append(index)
+
+            for (target_h, target_w), indices in resolution_groups.items():
+                batch_images = []
+                for index in indices:
+                    h, w = imgs[index].shape[:2]
+                    padded_img = np.full((target_h, target_w, 3), 255, dtype=np.uint8)
+                    padded_img[:h, :w] = imgs[index]
+                    batch_images.append(padded_img)
+                batch_results = self.text_detector.batch_predict(batch_images, DET_BATCH_SIZE)
+                for index, (dt_boxes, _) in zip(indices, batch_results):
+                    det_results[index] = dt_boxes
+        else:
+            for index, img in enumerate(imgs):
+                det_results[index], _ = self.text_detector(img)
+
+        all_dt_boxes = []
+        for img, dt_boxes, img_mfd_res in zip(imgs, det_results, mfd_res):
+            if dt_boxes is None or len(dt_boxes) == 0:
+                all_dt_boxes.append(None)
+                continue
+            # 填充区域之外的坐标裁剪回原图范围
+            h, w = img.shape[:2]
+            dt_boxes = np.asarray(dt_boxes, dtype=np.float32)
+            dt_boxes[:, :, 0] = np.clip(dt_boxes[:, :, 0], 0, w - 1)
+            dt_boxes[:, :, 1] = np.clip(dt_boxes[:, :, 1], 0, h - 1)
+            dt_boxes = sorted_boxes(dt_boxes)
+            if self.enable_merge_det_boxes:
+                dt_boxes = merge_det_boxes(dt_boxes)
+            if img_mfd_res:
+                dt_boxes = update_det_boxes(dt_boxes, img_mfd_res)
+            all_dt_boxes.append(dt_boxes)
+
+        if not rec:
+            return [[box.tolist() for box in dt_boxes] if dt_boxes is not None else None for dt_boxes in all_dt_boxes]
+
+        # 识别: 所有图片的文本框合并为一次识别
+        img_crop_list = []
+        for img, dt_boxes in zip(imgs, all_dt_boxes):
+            for box in dt_boxes or []:
+                img_crop_list.append(get_rotate_crop_image(img, copy.deepcopy(box), copy_crop=False))
+        rec_res = []
+        if img_crop_list:
+            rec_res, _ = self.text_recognizer(img_crop_list, tqdm_enable=tqdm_enable, tqdm_desc=tqdm_desc)
+
+        ocr_res = []
+        offset = 0
+        for dt_boxes in all_dt_boxes:
+            dt_boxes = dt_boxes or []
+            img_rec_res = rec_res[offset:offset + len(dt_boxes)]
+            offset += len(dt_boxes)
+            tmp_res = [[box.tolist(), res] for box, res in zip(dt_boxes, img_rec_res) if res[1] >= self.drop_score]
+            ocr_res.append(tmp_res if tmp_res else None)
+        return ocr_res
+
+    def _detect_sorted_boxes(self, img, mfd_res=None):
         dt_boxes, elapse = self.text_detector(img)
 
         if dt_boxes is None:
             logger.debug("no dt_boxes found, elapsed : {}".format(elapse))
-            return None, None
+            return None
         else:
             pass
             # logger.debug("dt_boxes num : {}, elapsed : {}".format(len(dt_boxes), elapse))
-        img_crop_list = []
 
         dt_boxes = sorted_boxes(dt_boxes)
 
@@ -284,9 +464,24 @@ class PytorchPaddleOCR(TextSystem):
         if mfd_res:
             dt_boxes = update_det_boxes(dt_boxes, mfd_res)
 
+        return dt_boxes
+
+    def __call__(self, img, mfd_res=None):
+
+        if img is None:
+            logger.debug("no valid image provided")
+            return None, None
+
+        ori_im = img.copy()
+        dt_boxes = self._detect_sorted_boxes(img, mfd_res=mfd_res)
+
+        if dt_boxes is None:
+            return None, None
+        img_crop_list = []
+
         for bno in range(len(dt_boxes)):
             tmp_box = copy.deepcopy(dt_boxes[bno])
-            img_crop = get_rotate_crop_image(ori_im, tmp_box)
+            img_crop = get_rotate_crop_image(ori_im, tmp_box, copy_crop=False)
             img_crop_list.append(img_crop)
 
         rec_res, elapse = self.text_recognizer(img_crop_list)
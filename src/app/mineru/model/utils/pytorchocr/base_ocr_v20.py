@@ -1,7 +1,98 @@
+import hashlib
+import json
 import os
+import threading
+
 import torch
+from loguru import logger
+
+from mineru.utils.hash_utils import file_sha256
+from mineru.utils.os_env_config import is_model_mmap_enabled, is_model_snapshot_enabled
 from .modeling.architectures.base_model import BaseModel
 
+# 快照格式版本，modeling 下的网络代码或 rep/fuse 逻辑变更导致已保存的参数不再适用时递增
+MODEL_SNAPSHOT_VERSION = 2
+
+_shared_models = {}
+_shared_models_lock = threading.Lock()
+_inference_locks = {}
+
+
+def get_shared_model(key, loader):
+    """
+    按 key(权重路径、设备、推理后端等决定网络本身的参数)共享已加载的网络。
+    只有后处理阈值不同的检测/识别实例复用同一份权重，不再各自加载。
+    """
+    with _shared_models_lock:
+        if key not in _shared_models:
+            _shared_models[key] = loader()
+        return _shared_models[key]
+
+
+def get_inference_lock(key):
+    """
+    返回 key 对应网络的推理锁。共享同一网络的实例(如表格 OCR 与正文 OCR 的检测模型)可能在
+    阶段流水线的不同线程中同时推理，推理时需持有该锁。
+    """
+    with _shared_models_lock:
+        return _inference_locks.setdefault(key, threading.Lock())
+
+
+def load_weights_file(weights_path):
+    """
+    读取 state dict。.safetensors 文件用 safetensors 读取；开启 MINERU_MODEL_MMAP(默认开启)时
+    torch 权重以 mmap 方式加载，权重页经由页缓存在进程间共享，不再为每个进程各读一份到私有内存。
+    """
+    if weights_path.endswith('.safetensors'):
+        from safetensors.torch import load_file
+        return load_file(weights_path)
+    if is_model_mmap_enabled():
+        try:
+            return torch.load(weights_path, map_location='cpu', mmap=True, weights_only=True)
+        except RuntimeError as e:
+            # 旧格式(非 zip)的权重文件不支持 mmap
+            logger.debug(f"mmap load failed for {weights_path}, falling back to a regular load: {e}")
+    return torch.load(weights_path, map_location='cpu', weights_only=True)
+
+
+def get_snapshot_path(weights_path, network_config, **kwargs):
+    """
+    快照按权重文件内容、网络结构配置、MODEL_SNAPSHOT_VERSION 和 torch 版本区分，任一变化都会重新构建。
+    权重哈希按文件大小和修改时间缓存，不会每次启动都重新读取整个权重文件。
+    """
+    weights_digest = file_sha256(weights_path)[:16]
+    config = json.dumps({'config': network_config, 'kwargs': kwargs}, sort_keys=True, default=str)
+    config_digest = hashlib.sha256(config.encode('utf-8')).hexdigest()[:8]
+    torch_version = torch.__version__.replace('+', '_')
+    return (f"{os.path.splitext(weights_path)[0]}.{weights_digest}.{config_digest}"
+            f".v{MODEL_SNAPSHOT_VERSION}.torch{torch_version}.snapshot.pt")
+
+
+def load_model_snapshot(snapshot_path):
+    """
+    快照只包含张量与整数，以 weights_only=True 读取，不会执行文件中的代码。
+    """
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        return torch.load(snapshot_path, map_location='cpu', mmap=is_model_mmap_enabled(), weights_only=True)
+    except Exception as e:
+        logger.warning(f"Failed to load model snapshot {snapshot_path}, rebuilding: {e}")
+        return None
+
+
+def save_model_snapshot(snapshot_path, snapshot):
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    try:
+        torch.save(snapshot, tmp_path)
+        os.replace(tmp_path, snapshot_path)
+    except Exception as e:
+        logger.warning(f"Failed to save model snapshot {snapshot_path}: {e}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 class BaseOCRV20:
     def __init__(self, config, **kwargs):
         self.config = config
@@ -12,10 +103,37 @@ class BaseOCRV20:
     def build_net(self, **kwargs):
         self.net = BaseModel(self.config, **kwargs)
 
+    def load_fused_snapshot(self, weights_path, network_config, build_fn, fuse_fn, **kwargs):
+        """
+        构建已完成 rep/fuse 的 cpu 网络，返回构建网络时额外使用的参数(如识别模型的 out_channels)。
+        快照保存融合后的 state_dict 与这些参数：加载时按 arch 配置重建网络，执行同样的 fuse_fn，
+        再直接使用快照中的张量，跳过读取原始权重与计算融合参数的过程。
+        快照不存在或失效时调用 build_fn() 从原始权重构建网络(返回额外参数)，再调用 fuse_fn() 并写入快照。
+        """
+        snapshot_path = None
+        if is_model_snapshot_enabled():
+            snapshot_path = get_snapshot_path(weights_path, network_config, **kwargs)
+        snapshot = load_model_snapshot(snapshot_path) if snapshot_path else None
+        if snapshot is not None:
+            try:
+                net_kwargs = snapshot['net_kwargs']
+                BaseOCRV20.__init__(self, network_config, **dict(kwargs, **net_kwargs))
+                fuse_fn()
+                self.net.load_state_dict(snapshot['state_dict'], assign=True)
+                return net_kwargs
+            except Exception as e:
+                logger.warning(f"Model snapshot {snapshot_path} does not match the network, rebuilding: {e}")
+
+        net_kwargs = build_fn()
+        fuse_fn()
+        if snapshot_path:
+            save_model_snapshot(snapshot_path, {'state_dict': self.net.state_dict(), 'net_kwargs': net_kwargs})
+        return net_kwargs
+
     def read_pytorch_weights(self, weights_path):
         if not os.path.exists(weights_path):
             raise FileNotFoundError('{} is not existed.'.format(weights_path))
-        weights = torch.load(weights_path)
+        weights = load_weights_file(weights_path)
         return weights
 
     def get_out_channels(self, weights):
@@ -26,11 +144,12 @@ class BaseOCRV20:
         return out_channels
 
     def load_state_dict(self, weights):
-        self.net.load_state_dict(weights)
+        # assign=True 让参数直接使用读入的(可能是 mmap 的)张量，而不是再拷贝一份
+        self.net.load_state_dict(weights, assign=is_model_mmap_enabled())
         # print('weights is loaded.')
 
     def load_pytorch_weights(self, weights_path):
-        self.net.load_state_dict(torch.load(weights_path, weights_only=True))
+        self.load_state_dict(load_weights_file(weights_path))
         # print('model is loaded: {}'.format(weights_path))
 
     def inference(self, inputs):
@@ -6,6 +6,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import math
+
 import numpy as np
 import cv2
 import torch
@@ -25,6 +27,7 @@ class DBPostProcess(object):
                  unclip_ratio=2.0,
                  use_dilation=False,
                  score_mode="fast",
+                 fast_postprocess=True,
                  **kwargs):
         self.thresh = thresh
         self.box_thresh = box_thresh
@@ -32,6 +35,7 @@ class DBPostProcess(object):
         self.unclip_ratio = unclip_ratio
         self.min_size = 3
         self.score_mode = score_mode
+        self.fast_postprocess = fast_postprocess
         assert score_mode in [
             "slow", "fast"
         ], "Score mode must be in [slow, fast] but got: {}".format(score_mode)
@@ -45,6 +49,9 @@ class DBPostProcess(object):
                 whose values are binarized as {0, 1}
         '''
 
+        if self.fast_postprocess and self.score_mode == "fast":
+            return self.boxes_from_bitmap_fast(pred, _bitmap, dest_width, dest_height)
+
         bitmap = _bitmap
         height, width = bitmap.shape
 
@@ -86,6 +93,154 @@ class DBPostProcess(object):
             scores.append(score)
         return np.array(boxes, dtype=np.int16), scores
 
+    def boxes_from_bitmap_fast(self, pred, _bitmap, dest_width, dest_height):
+        '''
+        Same output as boxes_from_bitmap with score_mode "fast", with cheaper per-contour work:
+        axis-aligned boxes are scored in O(1) from an integral image of the whole map and unclipped
+        in closed form (see _unclip_rect) instead of through pyclipper and a second minAreaRect.
+        Rotated boxes are scored on a filled mask as in box_score_fast and unclipped with pyclipper.
+        '''
+        bitmap = _bitmap
+        height, width = bitmap.shape
+
+        outs = cv2.findContours((bitmap * 255).astype(np.uint8), cv2.RETR_LIST,
+                                cv2.CHAIN_APPROX_SIMPLE)
+        if len(outs) == 3:
+            img, contours, _ = outs[0], outs[1], outs[2]
+        elif len(outs) == 2:
+            contours, _ = outs[0], outs[1]
+
+        num_contours = min(len(contours), self.max_candidates)
+        # one pass over the map: the mean of any pixel rectangle is then four lookups
+        integral = cv2.integral(pred, sdepth=cv2.CV_64F)
+
+        boxes = []
+        scores = []
+        for index in range(num_contours):
+            contour = contours[index]
+            # most contours on a dense map are specks, reject them before ordering the box points
+            bounding_box = cv2.minAreaRect(contour)
+            if min(bounding_box[1]) < self.min_size:
+                continue
+            points = np.array(self._order_box_points(bounding_box))
+
+            rect = self._score_rect(points, height, width)
+            if rect is not None:
+                x0, y0, x1, y1 = rect
+                total = integral[y1 + 1, x1 + 1] - integral[y0, x1 + 1] - integral[y1 + 1, x0] + integral[y0, x0]
+                score = total / ((x1 - x0 + 1) * (y1 - y0 + 1))
+            else:
+                score = self._score_polygon(pred, points)
+            if self.box_thresh > score:
+                continue
+
+            distance = self._unclip_distance(points)
+            unclipped = self._unclip_rect(points, distance, width / dest_width, height / dest_height)
+            if unclipped is None:
+                box = self._offset_polygon(points, distance).reshape(-1, 1, 2)
+                box, sside = self.get_mini_boxes(box)
+            else:
+                box, sside = unclipped
+            if sside < self.min_size + 2:
+                continue
+            box = np.array(box)
+
+            box[:, 0] = np.clip(
+                np.round(box[:, 0] / width * dest_width), 0, dest_width)
+            box[:, 1] = np.clip(
+                np.round(box[:, 1] / height * dest_height), 0, dest_height)
+            boxes.append(box.astype(np.int16))
+            scores.append(score)
+        return np.array(boxes, dtype=np.int16), scores
+
+    @staticmethod
+    def _score_rect(box, h, w):
+        '''
+        The pixel rectangle (x0, y0, x1, y1) that box_score_fast fills for this box,
+        or None when the filled polygon is not an axis-aligned rectangle.
+        '''
+        box_x, box_y = box[:, 0].tolist(), box[:, 1].tolist()
+        xmin, ymin, xmax, ymax = DBPostProcess._score_bounds(box_x, box_y, h, w)
+        local_x = [int(x - xmin) for x in box_x]
+        local_y = [int(y - ymin) for y in box_y]
+        xs, ys = sorted(set(local_x)), sorted(set(local_y))
+        if len(xs) > 2 or len(ys) > 2 or len(set(zip(local_x, local_y))) != len(xs) * len(ys):
+            return None
+        # fillPoly is clipped to the mask of size (ymax - ymin + 1, xmax - xmin + 1)
+        x0, x1 = max(xs[0], 0), min(xs[-1], int(xmax - xmin))
+        y0, y1 = max(ys[0], 0), min(ys[-1], int(ymax - ymin))
+        if x0 > x1 or y0 > y1:
+            return None
+        return int(xmin) + x0, int(ymin) + y0, int(xmin) + x1, int(ymin) + y1
+
+    @staticmethod
+    def _score_bounds(box_x, box_y, h, w):
+        # the clipped bounding box of box_score_fast, in plain Python arithmetic:
+        # np.clip on scalars costs more than scoring a small box
+        xmin = min(max(math.floor(min(box_x)), 0), w - 1)
+        xmax = min(max(math.ceil(max(box_x)), 0), w - 1)
+        ymin = min(max(math.floor(min(box_y)), 0), h - 1)
+        ymax = min(max(math.ceil(max(box_y)), 0), h - 1)
+        return xmin, ymin, xmax, ymax
+
+    def _score_polygon(self, bitmap, box):
+        '''
+        box_score_fast for a rotated box, without the numpy scalar overhead.
+        '''
+        h, w = bitmap.shape[:2]
+        xmin, ymin, xmax, ymax = self._score_bounds(box[:, 0].tolist(), box[:, 1].tolist(), h, w)
+        mask = np.zeros((ymax - ymin + 1, xmax - xmin + 1), dtype=np.uint8)
+        local_box = (box - np.array([xmin, ymin], dtype=box.dtype)).astype(np.int32)
+        cv2.fillPoly(mask, local_box.reshape(1, -1, 2), 1)
+        return cv2.mean(bitmap[ymin:ymax + 1, xmin:xmax + 1], mask)[0]
+
+    def _unclip_rect(self, box, distance, x_scale, y_scale):
+        '''
+        Closed form of get_mini_boxes(_offset_polygon(box, distance)) when pyclipper sees an
+        axis-aligned rectangle: the round joins stay inside the offset edges, so the result is
+        the rectangle grown by distance. Returns None when the polygon is rotated, or when the
+        float32 noise of minAreaRect in the pyclipper path could change the rounded output.
+        '''
+        # pyclipper truncates the coordinates to integers before offsetting
+        box_x, box_y = [int(x) for x in box[:, 0].tolist()], [int(y) for y in box[:, 1].tolist()]
+        xs, ys = sorted(set(box_x)), sorted(set(box_y))
+        if len(xs) != 2 or len(ys) != 2 or len(set(zip(box_x, box_y))) != 4:
+            return None
+        # edge points are offset then rounded half away from zero, as in ClipperLib's Round
+        x0, x1 = self._round_half_away(xs[0] - distance), self._round_half_away(xs[1] + distance)
+        y0, y1 = self._round_half_away(ys[0] - distance), self._round_half_away(ys[1] + distance)
+        sside = min(x1 - x0, y1 - y0)
+        if abs(sside - (self.min_size + 2)) < 1e-2:
+            return None
+        for value, scale in ((x0, x_scale), (x1, x_scale), (y0, y_scale), (y1, y_scale)):
+            scaled = value / scale
+            if abs(scaled - math.floor(scaled) - 0.5) < 1e-2:
+                return None
+        box = np.array([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], dtype=np.float32)
+        return box, sside
+
+    @staticmethod
+    def _round_half_away(value):
+        return math.floor(value + 0.5) if value >= 0 else math.ceil(value - 0.5)
+
+    def _unclip_distance(self, box):
+        # Polygon(box).area * unclip_ratio / Polygon(box).length, using the same formulas as GEOS;
+        # a 4-point ring is cheaper in plain Python than in numpy
+        ring_x, ring_y = box[:, 0].tolist(), box[:, 1].tolist()
+        ring_x.append(ring_x[0])
+        ring_y.append(ring_y[0])
+        x = [value - ring_x[0] for value in ring_x]
+        area = abs(sum(x[i] * (ring_y[i - 1] - ring_y[i + 1]) for i in range(1, len(x) - 1))) / 2.0
+        length = sum(math.sqrt((ring_x[i + 1] - ring_x[i]) ** 2 + (ring_y[i + 1] - ring_y[i]) ** 2)
+                     for i in range(len(x) - 1))
+        return area * self.unclip_ratio / length
+
+    @staticmethod
+    def _offset_polygon(box, distance):
+        offset = pyclipper.PyclipperOffset()
+        offset.AddPath(box, pyclipper.JT_ROUND, pyclipper.ET_CLOSEDPOLYGON)
+        return np.array(offset.Execute(distance))
+
     def unclip(self, box):
         unclip_ratio = self.unclip_ratio
         poly = Polygon(box)
@@ -97,6 +252,10 @@ class DBPostProcess(object):
 
     def get_mini_boxes(self, contour):
         bounding_box = cv2.minAreaRect(contour)
+        return self._order_box_points(bounding_box), min(bounding_box[1])
+
+    @staticmethod
+    def _order_box_points(bounding_box):
         points = sorted(list(cv2.boxPoints(bounding_box)), key=lambda x: x[0])
 
         index_1, index_2, index_3, index_4 = 0, 1, 2, 3
@@ -116,7 +275,7 @@ class DBPostProcess(object):
         box = [
             points[index_1], points[index_2], points[index_3], points[index_4]
         ]
-        return box, min(bounding_box[1])
+        return box
 
     def box_score_fast(self, bitmap, _box):
         '''
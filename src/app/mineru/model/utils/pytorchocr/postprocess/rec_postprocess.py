@@ -142,28 +142,44 @@ class BaseRecLabelDecode(object):
             return_word_box=False,
     ):
         """ convert text-index into text-label. """
-        result_list = []
+        # 整批一次计算 blank/重复掩码和平均置信度，逐行只做字符拼接
+        text_index = np.asarray(text_index)
         batch_size = text_index.shape[0]
         blank_word = self.get_ignored_tokens()[0]
-        for batch_idx in range(batch_size):
-            probs = None if text_prob is None else np.array(text_prob[batch_idx])
-            sequence = text_index[batch_idx]
 
-            final_mask = sequence != blank_word
-            if is_remove_duplicate:
-                duplicate_mask = np.insert(sequence[1:] != sequence[:-1], 0, True)
-                final_mask &= duplicate_mask
+        final_mask = text_index != blank_word
+        if is_remove_duplicate:
+            final_mask[:, 1:] &= text_index[:, 1:] != text_index[:, :-1]
+
+        char_counts = final_mask.sum(axis=1)
+        row_ends = np.cumsum(char_counts).tolist()
+        chars = self.character[text_index[final_mask]].tolist()
+
+        if text_prob is not None:
+            text_prob = np.asarray(text_prob)
+            prob_sums = np.where(final_mask, text_prob, 0).sum(axis=1, dtype=np.float64)
+            mean_confs = (prob_sums / np.maximum(char_counts, 1)).astype(text_prob.dtype)
 
-            sequence = sequence[final_mask]
-            probs = None if probs is None else probs[final_mask]
-            text = "".join(self.character[sequence])
+        result_list = []
+        row_start = 0
+        for batch_idx in range(batch_size):
+            row_end = row_ends[batch_idx]
+            text = "".join(chars[row_start:row_end])
 
-            if text_prob is not None and probs is not None and len(probs) > 0:
-                mean_conf = np.mean(probs)
+            if text_prob is not None and row_end > row_start:
+                mean_conf = mean_confs[batch_idx]
             else:
                 # 如果没有提供概率或最终结果为空，则默认置信度为1.0
                 mean_conf = 1.0
-            result_list.append((text, mean_conf))
+            row_start = row_end
+
+            if return_word_box:
+                word_list, word_col_list, state_list = self.get_word_info(text, final_mask[batch_idx])
+                result_list.append((text, mean_conf, [
+                    text_index.shape[1], word_list, word_col_list, state_list
+                ]))
+            else:
+                result_list.append((text, mean_conf))
         return result_list
 
     def get_ignored_tokens(self):
@@ -182,9 +198,11 @@ class CTCLabelDecode(BaseRecLabelDecode):
 
     def __call__(self, preds, label=None, return_word_box=False, *args, **kwargs):
         preds_prob, preds_idx = preds.max(axis=2)
+        # 下标与概率合并为一次拷贝到 cpu，字典大小远小于 2**24，float32 可精确表示下标
+        preds_idx_prob = torch.stack([preds_idx.float(), preds_prob.float()]).cpu().numpy()
         text = self.decode(
-            preds_idx.cpu().numpy(),
-            preds_prob.float().cpu().numpy(),
+            preds_idx_prob[0].astype(np.int64),
+            preds_idx_prob[1],
             is_remove_duplicate=True,
             return_word_box=return_word_box,
         )
@@ -0,0 +1,67 @@
+import os
+
+import torch
+from loguru import logger
+
+ONNX_OPSET_VERSION = 17
+
+
+class DetMapsOutput(torch.nn.Module):
+    """检测网络输出为 dict，导出 ONNX 时只保留概率图"""
+
+    def __init__(self, net):
+        super().__init__()
+        self.net = net
+
+    def forward(self, x):
+        return self.net(x)['maps']
+
+
+def get_onnx_path(weights_path):
+    # 导出的 ONNX 文件缓存在权重文件旁边，与权重一一对应
+    return os.path.splitext(weights_path)[0] + '.onnx'
+
+
+def export_onnx(net, dummy_input, onnx_path, dynamic_axes):
+    # 先导出到临时文件再原子替换，避免多进程同时导出时读到不完整的文件
+    tmp_path = f"{onnx_path}.{os.getpid()}.tmp"
+    try:
+        with torch.no_grad():
+            torch.onnx.export(
+                net,
+                dummy_input,
+                tmp_path,
+                input_names=['x'],
+                output_names=['y'],
+                dynamic_axes=dynamic_axes,
+                opset_version=ONNX_OPSET_VERSION,
+                dynamo=False,
+            )
+        os.replace(tmp_path, onnx_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_ort_session(net, weights_path, dummy_input, dynamic_axes, intra_op_num_threads=-1, inter_op_num_threads=-1):
+    """
+    加载与 weights_path 对应的 ONNX 模型，缓存不存在或比权重旧时先从 net 导出。
+    net 需已完成 rep/fuse 等推理前的结构融合并位于 CPU 上。
+    导出或加载失败时返回 None，调用方继续使用 torch 推理。
+    """
+    from mineru.model.table.rec.unet_table.utils import OrtInferSession
+
+    onnx_path = get_onnx_path(weights_path)
+    try:
+        if not os.path.exists(onnx_path) or os.path.getmtime(onnx_path) < os.path.getmtime(weights_path):
+            logger.info(f"Exporting ONNX model to {onnx_path}")
+            export_onnx(net, dummy_input, onnx_path, dynamic_axes)
+        config = {
+            "model_path": onnx_path,
+            "intra_op_num_threads": intra_op_num_threads,
+            "inter_op_num_threads": inter_op_num_threads,
+        }
+        return OrtInferSession(config)
+    except Exception as e:
+        logger.warning(f"Failed to prepare ONNX model {onnx_path}, falling back to torch: {e}")
+        return None
@@ -3,8 +3,10 @@ import sys
 import numpy as np
 import time
 import torch
-from ...pytorchocr.base_ocr_v20 import BaseOCRV20
+from loguru import logger
+from ...pytorchocr.base_ocr_v20 import BaseOCRV20, get_inference_lock, get_shared_model
 from . import pytorchocr_utility as utility
+from .onnx_backend import DetMapsOutput, load_ort_session
 from ...pytorchocr.data import create_operators, transform
 from ...pytorchocr.postprocess import build_post_process
 
@@ -112,14 +114,78 @@ class TextDetector(BaseOCRV20):
         self.weights_path = args.det_model_path
         self.yaml_path = args.det_yaml_path
         network_config = utility.get_arch_config(self.weights_path)
-        super(TextDetector, self).__init__(network_config, **kwargs)
+        # 网络按权重路径与设备共享，本实例只持有自己的预处理与后处理配置
+        self.config = network_config
+        model_key = ('det', self.weights_path, str(self.device), args.ocr_backend)
+        self._inference_lock = get_inference_lock(model_key)
+        self.net, self.ort_session = get_shared_model(
+            model_key, lambda: self._load_net(args, network_config, **kwargs),
+        )
+
+    def _load_net(self, args, network_config, **kwargs):
+        self.load_fused_snapshot(
+            self.weights_path, network_config, lambda: self._build_net(network_config, **kwargs),
+            self._fuse_net, **kwargs)
+        self.net.to(self.device)
+
+        ort_session = None
+        if args.ocr_backend == 'onnx':
+            ort_session = self._init_ort_session(args)
+        return self.net, ort_session
+
+    def _build_net(self, network_config, **kwargs):
+        BaseOCRV20.__init__(self, network_config, **kwargs)
         self.load_pytorch_weights(self.weights_path)
         self.net.eval()
-        self.net.to(self.device)
+        return {}
+
+    def _fuse_net(self):
         for module in self.net.modules():
             if hasattr(module, 'rep'):
                 module.rep()
 
+    def _init_ort_session(self, args):
+        if self.det_algorithm not in ['DB', 'DB++'] or str(self.device) != 'cpu':
+            logger.warning(f"ONNX backend is only supported for DB detectors on cpu, using torch for {self.det_algorithm} on {self.device}")
+            return None
+        dynamic_axes = {
+            'x': {0: 'batch', 2: 'height', 3: 'width'},
+            'y': {0: 'batch', 2: 'height', 3: 'width'},
+        }
+        return load_ort_session(
+            DetMapsOutput(self.net), self.weights_path, torch.zeros(1, 3, 640, 640), dynamic_axes,
+            args.ort_intra_op_num_threads, args.ort_inter_op_num_threads,
+        )
+
+    def _run_net(self, batch):
+        """对预处理后的 numpy 批数据推理，返回 numpy 格式的 preds；网络在实例间共享，推理时持有共享的推理锁"""
+        with self._inference_lock:
+            if self.ort_session is not None:
+                return {'maps': self.ort_session([batch])[0]}
+
+            with torch.no_grad():
+                inp = torch.from_numpy(batch)
+                inp = inp.to(self.device)
+                outputs = self.net(inp)
+
+        preds = {}
+        if self.det_algorithm == "EAST":
+            preds['f_geo'] = outputs['f_geo'].cpu().numpy()
+            preds['f_score'] = outputs['f_score'].cpu().numpy()
+        elif self.det_algorithm == 'SAST':
+            preds['f_border'] = outputs['f_border'].cpu().numpy()
+            preds['f_score'] = outputs['f_score'].cpu().numpy()
+            preds['f_tco'] = outputs['f_tco'].cpu().numpy()
+            preds['f_tvo'] = outputs['f_tvo'].cpu().numpy()
+        elif self.det_algorithm in ['DB', 'PSE', 'DB++']:
+            preds['maps'] = outputs['maps'].cpu().numpy()
+        elif self.det_algorithm == 'FCE':
+            for i, (k, output) in enumerate(outputs.items()):
+                preds['level_{}'.format(i)] = output.cpu().numpy()
+        else:
+            raise NotImplementedError
+        return preds
+
     def _batch_process_same_size(self, img_list):
         """
             对相同尺寸的图像进行批处理
@@ -165,28 +231,7 @@ class TextDetector(BaseOCRV20):
             return batch_results, time.time() - starttime
 
         # 批处理推理
-        with torch.no_grad():
-            inp = torch.from_numpy(batch_tensor)
-            inp = inp.to(self.device)
-            outputs = self.net(inp)
-
-        # 处理输出
-        preds = {}
-        if self.det_algorithm == "EAST":
-            preds['f_geo'] = outputs['f_geo'].cpu().numpy()
-            preds['f_score'] = outputs['f_score'].cpu().numpy()
-        elif self.det_algorithm == 'SAST':
-            preds['f_border'] = outputs['f_border'].cpu().numpy()
-            preds['f_score'] = outputs['f_score'].cpu().numpy()
-            preds['f_tco'] = outputs['f_tco'].cpu().numpy()
-            preds['f_tvo'] = outputs['f_tvo'].cpu().numpy()
-        elif self.det_algorithm in ['DB', 'PSE', 'DB++']:
-            preds['maps'] = outputs['maps'].cpu().numpy()
-        elif self.det_algorithm == 'FCE':
-            for i, (k, output) in enumerate(outputs.items()):
-                preds['level_{}'.format(i)] = output.cpu().numpy()
-        else:
-            raise NotImplementedError
+        preds = self._run_net(batch_tensor)
 
         # 后处理每个图像的结果
         batch_results = []
@@ -307,27 +352,7 @@ class TextDetector(BaseOCRV20):
         img = img.copy()
         starttime = time.time()
 
-        with torch.no_grad():
-            inp = torch.from_numpy(img)
-            inp = inp.to(self.device)
-            outputs = self.net(inp)
-
-        preds = {}
-        if self.det_algorithm == "EAST":
-            preds['f_geo'] = outputs['f_geo'].cpu().numpy()
-            preds['f_score'] = outputs['f_score'].cpu().numpy()
-        elif self.det_algorithm == 'SAST':
-            preds['f_border'] = outputs['f_border'].cpu().numpy()
-            preds['f_score'] = outputs['f_score'].cpu().numpy()
-            preds['f_tco'] = outputs['f_tco'].cpu().numpy()
-            preds['f_tvo'] = outputs['f_tvo'].cpu().numpy()
-        elif self.det_algorithm in ['DB', 'PSE', 'DB++']:
-            preds['maps'] = outputs['maps'].cpu().numpy()
-        elif self.det_algorithm == 'FCE':
-            for i, (k, output) in enumerate(outputs.items()):
-                preds['level_{}'.format(i)] = output
-        else:
-            raise NotImplementedError
+        preds = self._run_net(img)
 
         post_result = self.postprocess_op(preds, shape_list)
         dt_boxes = post_result[0]['points']
@@ -2,16 +2,24 @@ from PIL import Image
 import cv2
 import numpy as np
 import math
+import threading
 import time
 import torch
+from loguru import logger
 from tqdm import tqdm
 
-from ...pytorchocr.base_ocr_v20 import BaseOCRV20
+from ...pytorchocr.base_ocr_v20 import BaseOCRV20, get_inference_lock, get_shared_model
 from . import pytorchocr_utility as utility
+from .onnx_backend import load_ort_session
+from .rec_quantization import quantize_recognizer
 from ...pytorchocr.postprocess import build_post_process
 from ...pytorchocr.modeling.backbones.rec_hgnet import ConvBNAct
 
 
+# 识别输入的填充宽度按此步长向上取整分桶
+REC_BUCKET_WIDTH_STRIDE = 64
+
+
 class TextRecognizer(BaseOCRV20):
     def __init__(self, args, **kwargs):
         self.device = args.device
@@ -72,14 +80,44 @@ class TextRecognizer(BaseOCRV20):
                 "use_space_char": args.use_space_char
             }
         self.postprocess_op = build_post_process(postprocess_params)
+        self.postprocess_name = postprocess_params['name']
 
         self.limited_max_width = args.limited_max_width
         self.limited_min_width = args.limited_min_width
+        self.rec_batch_pixels = args.rec_batch_pixels
+        self.rec_max_batch_size = args.rec_max_batch_size
+        self._rec_input_buffers = threading.local()
 
         self.weights_path = args.rec_model_path
         self.yaml_path = args.rec_yaml_path
 
         network_config = utility.get_arch_config(self.weights_path)
+        # 网络按权重路径、设备与推理方式共享，本实例只持有自己的预处理与后处理配置
+        self.config = network_config
+        model_key = ('rec', self.weights_path, str(self.device), args.ocr_backend, args.rec_quantize)
+        self._inference_lock = get_inference_lock(model_key)
+        self.net, self.ort_session, self.out_channels = get_shared_model(
+            model_key, lambda: self._load_net(args, network_config, **kwargs),
+        )
+
+    def _load_net(self, args, network_config, **kwargs):
+        net_kwargs = self.load_fused_snapshot(
+            self.weights_path, network_config, lambda: self._build_net(network_config, **kwargs),
+            self._fuse_net, **kwargs)
+        self.out_channels = net_kwargs['out_channels']
+        self.net.to(self.device)
+
+        self.ort_session = None
+        if args.ocr_backend == 'onnx':
+            self.ort_session = self._init_ort_session(args)
+        elif args.rec_quantize:
+            if str(self.device) != 'cpu':
+                logger.warning(f"INT8 recognizer is only supported on cpu, using fp32 on {self.device}")
+            else:
+                quantize_recognizer(self, args.rec_quantize_sample_dir)
+        return self.net, self.ort_session, self.out_channels
+
+    def _build_net(self, network_config, **kwargs):
         weights = self.read_pytorch_weights(self.weights_path)
 
         self.out_channels = self.get_out_channels(weights)
@@ -89,11 +127,13 @@ class TextRecognizer(BaseOCRV20):
             self.out_channels = list(weights.values())[-3].numpy().shape[0]
 
         kwargs['out_channels'] = self.out_channels
-        super(TextRecognizer, self).__init__(network_config, **kwargs)
+        BaseOCRV20.__init__(self, network_config, **kwargs)
 
         self.load_state_dict(weights)
         self.net.eval()
-        self.net.to(self.device)
+        return {'out_channels': self.out_channels}
+
+    def _fuse_net(self):
         for module in self.net.modules():
             if isinstance(module, ConvBNAct):
                 if module.use_act:
@@ -101,6 +141,55 @@ class TextRecognizer(BaseOCRV20):
                 else:
                     torch.quantization.fuse_modules(module, ['conv', 'bn'], inplace=True)
 
+    def _init_ort_session(self, args):
+        if self.postprocess_name != 'CTCLabelDecode' or str(self.device) != 'cpu':
+            logger.warning(f"ONNX backend is only supported for CTC recognizers on cpu, using torch for {self.rec_algorithm} on {self.device}")
+            return None
+        imgC, imgH, imgW = self.rec_image_shape
+        dynamic_axes = {
+            'x': {0: 'batch', 3: 'width'},
+            'y': {0: 'batch', 1: 'seq'},
+        }
+        return load_ort_session(
+            self.net, self.weights_path, torch.zeros(1, imgC, imgH, imgW), dynamic_axes,
+            args.ort_intra_op_num_threads, args.ort_inter_op_num_threads,
+        )
+
+    def get_rec_batches(self, width_list, indices):
+        """
+        将按宽高比排序后的下标切分为批次，返回 [(批内下标列表, 填充宽度), ...]。
+        变宽输入的识别模型按填充宽度分桶，每桶的批大小由像素预算 rec_batch_pixels 决定，
+        短文本行不再被同批的长文本行拉宽；固定输入尺寸的算法沿用 rec_batch_num，填充宽度为 None。
+        """
+        indices = [int(i) for i in indices]
+        if self.rec_algorithm in ["SAR", "SVTR", "SRN", "CAN", "NRTR", "ViTSTR", "RFL"]:
+            return [(indices[i:i + self.rec_batch_num], None)
+                    for i in range(0, len(indices), self.rec_batch_num)]
+
+        imgC, imgH, imgW = self.rec_image_shape
+        buckets = {}
+        for idx in indices:
+            width = max(math.ceil(imgH * width_list[idx]), imgW)
+            width = math.ceil(width / REC_BUCKET_WIDTH_STRIDE) * REC_BUCKET_WIDTH_STRIDE
+            width = max(min(width, self.limited_max_width), self.limited_min_width)
+            buckets.setdefault(width, []).append(idx)
+
+        batches = []
+        for width, bucket in buckets.items():
+            batch_size = max(1, min(self.rec_max_batch_size, self.rec_batch_pixels // (imgH * width)))
+            for i in range(0, len(bucket), batch_size):
+                batches.append((bucket[i:i + batch_size], width))
+        return batches
+
+    def _get_rec_input_buffer(self, batch_size, shape):
+        # 每个线程只保留一块扁平缓冲区，按用到的最大批张量扩容，各宽度桶取其前缀 reshape 使用，
+        # 内存占用以最大批次为上限，不随出现过的宽度数量增长；按线程保存，识别模型被多个线程共用时互不覆盖
+        size = batch_size * int(np.prod(shape))
+        buffer = getattr(self._rec_input_buffers, 'buffer', None)
+        if buffer is None or buffer.size < size:
+            buffer = self._rec_input_buffers.buffer = np.empty(size, dtype=np.float32)
+        return buffer[:size].reshape(batch_size, *shape)
+
     def resize_norm_img(self, img, max_wh_ratio):
         imgC, imgH, imgW = self.rec_image_shape
         if self.rec_algorithm == 'NRTR' or self.rec_algorithm == 'ViTSTR':
@@ -143,6 +232,24 @@ class TextRecognizer(BaseOCRV20):
         padding_im[:, :, 0:resized_w] = resized_image.transpose((2, 0, 1))
         return padding_im
 
+    def resize_norm_img_into(self, img, out):
+        """
+        resize_norm_img 的融合版本: 文本行缩放到识别高度后，归一化结果直接写入预分配批张量中的一行
+        out (C, H, W)，不再生成 float64 中间结果、转置副本和单独的 padding 数组。
+        """
+        imgC, imgH, imgW = out.shape
+        assert imgC == img.shape[2]
+        h, w = img.shape[:2]
+        ratio = w / float(h)
+        ratio_imgH = max(math.ceil(imgH * ratio), self.limited_min_width)
+        resized_w = min(imgW, int(ratio_imgH))
+        resized_image = cv2.resize(img, (resized_w, imgH))
+        # HWC uint8 -> CHW float32: x / 127.5 - 1
+        valid = out[:, :, :resized_w]
+        np.multiply(resized_image.transpose((2, 0, 1)), np.float32(1 / 127.5), out=valid)
+        valid -= 1
+        out[:, :, resized_w:] = 0
+
     def resize_norm_img_svtr(self, img, image_shape):
 
         imgC, imgH, imgW = image_shape
@@ -298,19 +405,20 @@ class TextRecognizer(BaseOCRV20):
 
         # rec_res = []
         rec_res = [['', 0.0]] * img_num
-        batch_num = self.rec_batch_num
         elapse = 0
-        # for beg_img_no in range(0, img_num, batch_num):
         with tqdm(total=img_num, desc=tqdm_desc, disable=not tqdm_enable) as pbar:
-            index = 0
-            for beg_img_no in range(0, img_num, batch_num):
-                end_img_no = min(img_num, beg_img_no + batch_num)
+            for batch_indices, pad_width in self.get_rec_batches(width_list, indices):
                 norm_img_batch = []
-                max_wh_ratio = width_list[indices[end_img_no - 1]]
-                for ino in range(beg_img_no, end_img_no):
+                max_wh_ratio = width_list[batch_indices[-1]]
+                batch_buffer = None
+                if pad_width is not None:
+                    # 同一宽度桶复用预分配的 float32 批张量，各文本行直接缩放归一化写入其中
+                    imgC, imgH, _ = self.rec_image_shape
+                    batch_buffer = self._get_rec_input_buffer(len(batch_indices), (imgC, imgH, pad_width))
+                for bno, ino in enumerate(batch_indices):
                     if self.rec_algorithm == "SAR":
                         norm_img, _, _, valid_ratio = self.resize_norm_img_sar(
-                            img_list[indices[ino]], self.rec_image_shape)
+                            img_list[ino], self.rec_image_shape)
                         norm_img = norm_img[np.newaxis, :]
                         valid_ratio = np.expand_dims(valid_ratio, axis=0)
                         valid_ratios = []
@@ -318,12 +426,12 @@ class TextRecognizer(BaseOCRV20):
                         norm_img_batch.append(norm_img)
 
                     elif self.rec_algorithm == "SVTR":
-                        norm_img = self.resize_norm_img_svtr(img_list[indices[ino]],
+                        norm_img = self.resize_norm_img_svtr(img_list[ino],
                                                              self.rec_image_shape)
                         norm_img = norm_img[np.newaxis, :]
                         norm_img_batch.append(norm_img)
                     elif self.rec_algorithm == "SRN":
-                        norm_img = self.process_image_srn(img_list[indices[ino]],
+                        norm_img = self.process_image_srn(img_list[ino],
                                                           self.rec_image_shape, 8,
                                                           self.max_text_length)
                         encoder_word_pos_list = []
@@ -336,7 +444,7 @@ class TextRecognizer(BaseOCRV20):
                         gsrm_slf_attn_bias2_list.append(norm_img[4])
                         norm_img_batch.append(norm_img[0])
                     elif self.rec_algorithm == "CAN":
-                        norm_img = self.norm_img_can(img_list[indices[ino]],
+                        norm_img = self.norm_img_can(img_list[ino],
                                                      max_wh_ratio)
                         norm_img = norm_img[np.newaxis, :]
                         norm_img_batch.append(norm_img)
@@ -346,87 +454,95 @@ class TextRecognizer(BaseOCRV20):
                         word_label_list = []
                         norm_img_mask_batch.append(norm_image_mask)
                         word_label_list.append(word_label)
+                    elif batch_buffer is not None:
+                        self.resize_norm_img_into(img_list[ino], batch_buffer[bno])
                     else:
-                        norm_img = self.resize_norm_img(img_list[indices[ino]],
+                        norm_img = self.resize_norm_img(img_list[ino],
                                                         max_wh_ratio)
                         norm_img = norm_img[np.newaxis, :]
                         norm_img_batch.append(norm_img)
-                norm_img_batch = np.concatenate(norm_img_batch)
-                norm_img_batch = norm_img_batch.copy()
-
-                if self.rec_algorithm == "SRN":
-                    starttime = time.time()
-                    encoder_word_pos_list = np.concatenate(encoder_word_pos_list)
-                    gsrm_word_pos_list = np.concatenate(gsrm_word_pos_list)
-                    gsrm_slf_attn_bias1_list = np.concatenate(
-                        gsrm_slf_attn_bias1_list)
-                    gsrm_slf_attn_bias2_list = np.concatenate(
-                        gsrm_slf_attn_bias2_list)
-
-                    with torch.no_grad():
-                        inp = torch.from_numpy(norm_img_batch)
-                        encoder_word_pos_inp = torch.from_numpy(encoder_word_pos_list)
-                        gsrm_word_pos_inp = torch.from_numpy(gsrm_word_pos_list)
-                        gsrm_slf_attn_bias1_inp = torch.from_numpy(gsrm_slf_attn_bias1_list)
-                        gsrm_slf_attn_bias2_inp = torch.from_numpy(gsrm_slf_attn_bias2_list)
-
-                        inp = inp.to(self.device)
-                        encoder_word_pos_inp = encoder_word_pos_inp.to(self.device)
-                        gsrm_word_pos_inp = gsrm_word_pos_inp.to(self.device)
-                        gsrm_slf_attn_bias1_inp = gsrm_slf_attn_bias1_inp.to(self.device)
-                        gsrm_slf_attn_bias2_inp = gsrm_slf_attn_bias2_inp.to(self.device)
-
-                        backbone_out = self.net.backbone(inp) # backbone_feat
-                        prob_out = self.net.head(backbone_out, [encoder_word_pos_inp, gsrm_word_pos_inp, gsrm_slf_attn_bias1_inp, gsrm_slf_attn_bias2_inp])
-                    # preds = {"predict": prob_out[2]}
-                    preds = {"predict": prob_out["predict"]}
-
-                elif self.rec_algorithm == "SAR":
-                    starttime = time.time()
-                    # valid_ratios = np.concatenate(valid_ratios)
-                    # inputs = [
-                    #     norm_img_batch,
-                    #     valid_ratios,
-                    # ]
-
-                    with torch.no_grad():
-                        inp = torch.from_numpy(norm_img_batch)
-                        inp = inp.to(self.device)
-                        preds = self.net(inp)
-
-                elif self.rec_algorithm == "CAN":
-                    starttime = time.time()
-                    norm_img_mask_batch = np.concatenate(norm_img_mask_batch)
-                    word_label_list = np.concatenate(word_label_list)
-                    inputs = [norm_img_batch, norm_img_mask_batch, word_label_list]
-
-                    inp = [torch.from_numpy(e_i) for e_i in inputs]
-                    inp = [e_i.to(self.device) for e_i in inp]
-                    with torch.no_grad():
-                        outputs = self.net(inp)
-                        outputs = [v.cpu().numpy() for k, v in enumerate(outputs)]
-
-                    preds = outputs
-
+                if batch_buffer is not None:
+                    norm_img_batch = batch_buffer
                 else:
-                    starttime = time.time()
+                    norm_img_batch = np.concatenate(norm_img_batch)
+                    norm_img_batch = norm_img_batch.copy()
+
+                # 网络在共用同一权重的实例间共享，推理时持有共享的推理锁，避免多个线程同时调用同一网络
+                with self._inference_lock:
+                    if self.rec_algorithm == "SRN":
+                        starttime = time.time()
+                        encoder_word_pos_list = np.concatenate(encoder_word_pos_list)
+                        gsrm_word_pos_list = np.concatenate(gsrm_word_pos_list)
+                        gsrm_slf_attn_bias1_list = np.concatenate(
+                            gsrm_slf_attn_bias1_list)
+                        gsrm_slf_attn_bias2_list = np.concatenate(
+                            gsrm_slf_attn_bias2_list)
+
+                        with torch.no_grad():
+                            inp = torch.from_numpy(norm_img_batch)
+                            encoder_word_pos_inp = torch.from_numpy(encoder_word_pos_list)
+                            gsrm_word_pos_inp = torch.from_numpy(gsrm_word_pos_list)
+                            gsrm_slf_attn_bias1_inp = torch.from_numpy(gsrm_slf_attn_bias1_list)
+                            gsrm_slf_attn_bias2_inp = torch.from_numpy(gsrm_slf_attn_bias2_list)
+
+                            inp = inp.to(self.device)
+                            encoder_word_pos_inp = encoder_word_pos_inp.to(self.device)
+                            gsrm_word_pos_inp = gsrm_word_pos_inp.to(self.device)
+                            gsrm_slf_attn_bias1_inp = gsrm_slf_attn_bias1_inp.to(self.device)
+                            gsrm_slf_attn_bias2_inp = gsrm_slf_attn_bias2_inp.to(self.device)
+
+                            backbone_out = self.net.backbone(inp) # backbone_feat
+                            prob_out = self.net.head(backbone_out, [encoder_word_pos_inp, gsrm_word_pos_inp, gsrm_slf_attn_bias1_inp, gsrm_slf_attn_bias2_inp])
+                        # preds = {"predict": prob_out[2]}
+                        preds = {"predict": prob_out["predict"]}
+
+                    elif self.rec_algorithm == "SAR":
+                        starttime = time.time()
+                        # valid_ratios = np.concatenate(valid_ratios)
+                        # inputs = [
+                        #     norm_img_batch,
+                        #     valid_ratios,
+                        # ]
+
+                        with torch.no_grad():
+                            inp = torch.from_numpy(norm_img_batch)
+                            inp = inp.to(self.device)
+                            preds = self.net(inp)
+
+                    elif self.rec_algorithm == "CAN":
+                        starttime = time.time()
+                        norm_img_mask_batch = np.concatenate(norm_img_mask_batch)
+                        word_label_list = np.concatenate(word_label_list)
+                        inputs = [norm_img_batch, norm_img_mask_batch, word_label_list]
+
+                        inp = [torch.from_numpy(e_i) for e_i in inputs]
+                        inp = [e_i.to(self.device) for e_i in inp]
+                        with torch.no_grad():
+                            outputs = self.net(inp)
+                            outputs = [v.cpu().numpy() for k, v in enumerate(outputs)]
+
+                        preds = outputs
+
+                    elif self.ort_session is not None:
+                        starttime = time.time()
+                        preds = torch.from_numpy(self.ort_session([norm_img_batch])[0])
+
+                    else:
+                        starttime = time.time()
 
-                    with torch.no_grad():
-                        inp = torch.from_numpy(norm_img_batch)
-                        inp = inp.to(self.device)
-                        preds = self.net(inp)
+                        with torch.no_grad():
+                            inp = torch.from_numpy(norm_img_batch)
+                            inp = inp.to(self.device)
+                            preds = self.net(inp)
 
                 with torch.no_grad():
                     rec_result = self.postprocess_op(preds)
 
                 for rno in range(len(rec_result)):
-                    rec_res[indices[beg_img_no + rno]] = rec_result[rno]
+                    rec_res[batch_indices[rno]] = rec_result[rno]
                 elapse += time.time() - starttime
 
-                # 更新进度条，每次增加batch_size，但要注意最后一个batch可能不足batch_size
-                current_batch_size = min(batch_num, img_num - index * batch_num)
-                index += 1
-                pbar.update(current_batch_size)
+                pbar.update(len(batch_indices))
 
         # Fix NaN values in recognition results
         for i in range(len(rec_res)):
@@ -26,6 +26,11 @@ def init_args():
     parser.add_argument("--gpu_mem", type=int, default=500)
     parser.add_argument("--warmup", type=str2bool, default=False)
 
+    # params for inference backend, torch or onnx
+    parser.add_argument("--ocr_backend", type=str, default='torch')
+    parser.add_argument("--ort_intra_op_num_threads", type=int, default=-1)
+    parser.add_argument("--ort_inter_op_num_threads", type=int, default=-1)
+
     # params for text detector
     parser.add_argument("--image_dir", type=str)
     parser.add_argument("--det_algorithm", type=str, default='DB')
@@ -72,7 +77,12 @@ def init_args():
     parser.add_argument("--rec_image_shape", type=str, default="3, 48, 320")
     parser.add_argument("--rec_char_type", type=str, default='ch')
     parser.add_argument("--rec_batch_num", type=int, default=6)
+    # 变宽识别模型每批的像素预算，默认与 6 条最长(1280px)文本行相同
+    parser.add_argument("--rec_batch_pixels", type=int, default=48 * 1280 * 6)
+    parser.add_argument("--rec_max_batch_size", type=int, default=64)
     parser.add_argument("--max_text_length", type=int, default=25)
+    parser.add_argument("--rec_quantize", type=str2bool, default=False)
+    parser.add_argument("--rec_quantize_sample_dir", type=str, default=None)
 
     parser.add_argument("--use_space_char", type=str2bool, default=True)
     parser.add_argument("--drop_score", type=float, default=0.5)
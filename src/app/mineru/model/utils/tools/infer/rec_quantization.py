@@ -0,0 +1,156 @@
+import os
+import string
+import warnings
+
+import cv2
+import numpy as np
+import torch
+from loguru import logger
+
+from mineru.utils.hash_utils import file_sha256
+
+# INT8 识别结果与 fp32 一致的比例低于该阈值时放弃量化
+REC_QUANT_ACCURACY_THRESHOLD = 0.95
+REC_QUANT_FIXTURE_NUM = 64
+REC_QUANT_CHARSET = string.digits + string.ascii_uppercase + '-'
+IMAGE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.bmp')
+# 随包提供的固定校准集(calib/)与验证集(val/)，由 make_fixture_crops 生成
+REC_QUANT_FIXTURE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'pytorchocr', 'utils', 'resources', 'rec_quant',
+)
+
+
+def get_quantized_cache_path(weights_path):
+    # 量化后的 state dict 缓存在权重文件旁边，按量化后端、权重内容和 torch 版本区分，任一变化都会重新校准
+    engine = torch.backends.quantized.engine
+    torch_version = torch.__version__.replace('+', '_')
+    digest = file_sha256(weights_path)[:16]
+    return os.path.splitext(weights_path)[0] + f'_int8_{engine}.{digest}.torch{torch_version}.pth'
+
+
+def read_crops(crop_dir, num=None):
+    """按文件名顺序读取目录下的切图"""
+    crops = []
+    if crop_dir and os.path.isdir(crop_dir):
+        for name in sorted(os.listdir(crop_dir)):
+            if name.lower().endswith(IMAGE_SUFFIXES):
+                img = cv2.imread(os.path.join(crop_dir, name))
+                if img is not None:
+                    crops.append(img)
+            if num is not None and len(crops) >= num:
+                break
+    return crops
+
+
+def load_calibration_crops(sample_dir=None):
+    """
+    返回 (校准切图, 验证切图)。
+    sample_dir 下有图片时使用这些真实切图，奇偶交替拆分为校准集和验证集；
+    否则使用随包的固定切图，固定切图缺失时生成合成文本行。
+    """
+    if sample_dir:
+        crops = read_crops(sample_dir, REC_QUANT_FIXTURE_NUM)
+        if len(crops) >= 2:
+            return crops[0::2], crops[1::2]
+        logger.warning(f"Not enough sample crops in {sample_dir}, using the bundled crops")
+
+    calib_crops = read_crops(os.path.join(REC_QUANT_FIXTURE_DIR, 'calib'))
+    check_crops = read_crops(os.path.join(REC_QUANT_FIXTURE_DIR, 'val'))
+    if calib_crops and check_crops:
+        return calib_crops, check_crops
+
+    crops = make_fixture_crops()
+    return crops[0::2], crops[1::2]
+
+
+def make_fixture_crops(num=REC_QUANT_FIXTURE_NUM, seed=0):
+    """生成类似运单号的合成文本行，用于生成随包的固定切图"""
+    rng = np.random.default_rng(seed)
+    crops = []
+    for _ in range(num):
+        text = ''.join(rng.choice(list(REC_QUANT_CHARSET), size=rng.integers(6, 20)))
+        font_scale = float(rng.uniform(0.8, 1.4))
+        thickness = int(rng.integers(1, 3))
+        (w, h), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        background = int(rng.integers(200, 256))
+        img = np.full((h + baseline + 16, w + 16, 3), background, dtype=np.uint8)
+        color = int(rng.integers(0, 80))
+        cv2.putText(img, text, (8, h + 8), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (color, color, color), thickness)
+        noise = rng.normal(0, 6, img.shape)
+        crops.append(np.clip(img + noise, 0, 255).astype(np.uint8))
+    return crops
+
+
+def _prepare_backbone(backbone, example_input):
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx
+
+    qconfig_mapping = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    return prepare_fx(backbone, qconfig_mapping, (example_input,))
+
+
+def _convert_backbone(prepared_backbone):
+    from torch.ao.quantization.quantize_fx import convert_fx
+
+    return convert_fx(prepared_backbone)
+
+
+def quantize_recognizer(recognizer, sample_dir=None):
+    """
+    将识别模型的 backbone(卷积部分，占识别耗时的绝大部分)做 INT8 静态量化，head 保持 fp32。
+    有缓存时直接加载量化后的 state dict，缓存无法加载时删除并重新校准；
+    否则用校准集校准，并在验证集上与 fp32 结果比对，
+    一致率达到 REC_QUANT_ACCURACY_THRESHOLD 才替换模型并写入缓存。
+    返回是否启用了量化模型。
+    """
+    imgC, imgH, imgW = recognizer.rec_image_shape
+    example_input = torch.zeros(1, imgC, imgH, imgW)
+    fp32_backbone = recognizer.net.backbone
+    cache_path = get_quantized_cache_path(recognizer.weights_path)
+
+    with warnings.catch_warnings():
+        # torch.ao.quantization 的弃用提示
+        warnings.simplefilter("ignore")
+        if os.path.exists(cache_path):
+            try:
+                quantized_backbone = _convert_backbone(_prepare_backbone(fp32_backbone, example_input))
+                quantized_backbone.load_state_dict(torch.load(cache_path, weights_only=True))
+                recognizer.net.backbone = quantized_backbone
+                return True
+            except Exception as e:
+                logger.warning(f"Failed to load the cached INT8 recognizer {cache_path}, recalibrating: {e}")
+                recognizer.net.backbone = fp32_backbone
+                try:
+                    os.remove(cache_path)
+                except OSError:
+                    pass
+
+        try:
+            calib_crops, check_crops = load_calibration_crops(sample_dir)
+            fp32_res, _ = recognizer(check_crops)
+
+            recognizer.net.backbone = _prepare_backbone(fp32_backbone, example_input)
+            recognizer(calib_crops)
+            recognizer.net.backbone = _convert_backbone(recognizer.net.backbone)
+            int8_res, _ = recognizer(check_crops)
+        except Exception as e:
+            logger.warning(f"Failed to quantize the text recognizer, using fp32: {e}")
+            recognizer.net.backbone = fp32_backbone
+            return False
+
+    matched = sum(1 for a, b in zip(fp32_res, int8_res) if a[0] == b[0])
+    accuracy = matched / len(check_crops)
+    if accuracy < REC_QUANT_ACCURACY_THRESHOLD:
+        logger.warning(f"INT8 recognizer agrees with fp32 on {accuracy:.1%} of the sample crops, using fp32")
+        recognizer.net.backbone = fp32_backbone
+        return False
+
+    logger.info(f"INT8 recognizer agrees with fp32 on {accuracy:.1%} of the sample crops, saved to {cache_path}")
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        torch.save(recognizer.net.backbone.state_dict(), tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Failed to cache the quantized recognizer: {e}")
+    return True
@@ -86,4 +86,5 @@ class SplitFlag:
 
 class ImageType:
     PIL = 'pil_img'
-    BASE64 = 'base64_img'
\ No newline at end of file
+    BASE64 = 'base64_img'
+    NUMPY = 'numpy_img'
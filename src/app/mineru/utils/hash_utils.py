@@ -1,6 +1,8 @@
 # Copyright (c) Opendatalab. All rights reserved.
 import hashlib
 import json
+import os
+import threading
 
 
 def bytes_md5(file_bytes):
@@ -27,4 +29,48 @@ def str_sha256(input_string):
 
 def dict_md5(d):
     json_str = json.dumps(d, sort_keys=True, ensure_ascii=False)
-    return hashlib.md5(json_str.encode('utf-8')).hexdigest()
\ No newline at end of file
+    return hashlib.md5(json_str.encode('utf-8')).hexdigest()
+
+
+_file_sha256_cache = {}
+_file_sha256_lock = threading.Lock()
+
+
+def file_sha256(file_path):
+    """
+    计算文件内容的 sha256。
+    结果按 (大小, 修改时间) 记录在内存和文件旁的 .sha256 文件中，文件未变化时再次启动无需重新读取整个文件；
+    目录不可写时只缓存在内存中
+    """
+    stat = os.stat(file_path)
+    stamp = f"{stat.st_size} {stat.st_mtime_ns}"
+    cache_key = os.path.abspath(file_path)
+    with _file_sha256_lock:
+        cached = _file_sha256_cache.get(cache_key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        record_path = f"{file_path}.sha256"
+        digest = None
+        try:
+            with open(record_path, 'r', encoding='utf-8') as f:
+                recorded_stamp, _, recorded_digest = f.read().strip().rpartition(' ')
+            if recorded_stamp == stamp and len(recorded_digest) == 64:
+                digest = recorded_digest
+        except (OSError, ValueError):
+            pass
+
+        if digest is None:
+            hasher = hashlib.sha256()
+            with open(file_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+            try:
+                with open(record_path, 'w', encoding='utf-8') as f:
+                    f.write(f"{stamp} {digest}")
+            except OSError:
+                pass
+
+        _file_sha256_cache[cache_key] = (stamp, digest)
+        return digest
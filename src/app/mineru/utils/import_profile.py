@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+
+def run_importtime(modules, cwd=None, baseline=()):
+    """
+    在新的解释器中以 -X importtime 导入 modules，返回 [(模块名, 自身耗时us, 累计耗时us, 层级)]。
+    使用子进程是为了不受当前进程已导入模块的影响，测得的是冷启动耗时。
+    baseline 中的模块先于 modules 导入且不计入结果，用于统计在其基础上新增的导入耗时。
+    """
+    code = "\n".join(f"import {module}" for module in list(baseline) + list(modules))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [cwd or os.getcwd(), env.get("PYTHONPATH")]))
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Failed to import {', '.join(modules)}:\n{proc.stderr[-2000:]}")
+
+    records = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        records.append((name.strip(), int(self_us), int(cumulative_us), level))
+
+    # 子模块先于父模块输出，最后一个顶层 baseline 模块之前的记录都属于 baseline
+    start = 0
+    for index, (name, _, _, level) in enumerate(records):
+        if level == 0 and name in baseline:
+            start = index + 1
+    return records[start:]
+
+
+def summarize_by_subsystem(records, depth=1):
+    """
+    按顶层包(depth=2 时为前两级，如 mineru.model)汇总自身耗时，返回 [(子系统, 耗时us, 模块数)]，按耗时降序。
+    只统计自身耗时，累计耗时在嵌套导入间会重复计算。
+    """
+    totals = defaultdict(lambda: [0, 0])
+    for name, self_us, _, _ in records:
+        subsystem = ".".join(name.split(".")[:depth])
+        totals[subsystem][0] += self_us
+        totals[subsystem][1] += 1
+    return sorted(((name, us, count) for name, (us, count) in totals.items()), key=lambda item: -item[1])
+
+
+def format_import_profile(modules, records, top=20, depth=1):
+    """生成导入耗时报告: 各入口模块的累计耗时，以及按子系统汇总的自身耗时"""
+    top_level = {name: cumulative_us for name, _, cumulative_us, level in records if level == 0}
+    total_us = sum(self_us for _, self_us, _, _ in records)
+    lines = [f"Import profile: {len(records)} modules, {total_us / 1e6:.2f}s total"]
+    lines.append("Entry modules (cumulative):")
+    for module in modules:
+        if module in top_level:
+            lines.append(f"  {module:<40} {top_level[module] / 1e3:>9.1f} ms")
+        else:
+            lines.append(f"  {module:<40} {'(already imported)':>12}")
+    lines.append(f"Subsystems (self time, top {top}):")
+    for subsystem, self_us, count in summarize_by_subsystem(records, depth)[:top]:
+        share = self_us / total_us * 100 if total_us else 0
+        lines.append(f"  {subsystem:<40} {self_us / 1e3:>9.1f} ms {share:>5.1f}%  ({count} modules)")
+    return "\n".join(lines)
+
+
+def profile_imports(modules, cwd=None, top=20, depth=1, baseline=()):
+    """导入 modules 并返回按子系统汇总的耗时报告"""
+    return format_import_profile(modules, run_importtime(modules, cwd, baseline), top, depth)
+
+
+if __name__ == '__main__':
+    # python -m mineru.utils.import_profile mineru.utils.pdf_image_tools mineru.model.ocr.pytorch_paddle
+    print(profile_imports(sys.argv[1:] or ["mineru.model.ocr.pytorch_paddle"]))
@@ -426,6 +426,18 @@ def clean_memory(device='cuda'):
     gc.collect()
 
 
+def prepare_models_for_fork(*model_loaders):
+    """
+    在父进程中加载(并完成 rep/fuse 等融合)模型后再 fork 工作进程，子进程以写时复制方式共享权重。
+    调用各 loader 后回收并冻结当前所有对象，子进程中的 gc 不再遍历这些对象，
+    避免修改对象头而触发整页复制。仅适用于 fork 启动方式，且父进程在 fork 前不应在 GPU 上运行模型。
+    """
+    models = [loader() for loader in model_loaders]
+    gc.collect()
+    gc.freeze()
+    return models
+
+
 def clean_vram(device, vram_threshold=8):
     total_memory = get_vram(device)
     if total_memory is not None:
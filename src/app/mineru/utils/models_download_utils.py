@@ -1,9 +1,124 @@
+import json
 import os
+import threading
+
 from huggingface_hub import snapshot_download as hf_snapshot_download
+from loguru import logger
 from modelscope import snapshot_download as ms_snapshot_download
 
 from mineru.utils.config_reader import get_local_models_dir
 from mineru.utils.enum_class import ModelPath
+from mineru.utils.os_env_config import get_model_manifest_path
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def _normalize_relative_path(relative_path):
+    # 写入与失效使用同一形式，"models/x"、"/models/x/" 视为同一路径，整个仓库("/")记为空字符串
+    return relative_path.strip('/')
+
+
+def _manifest_key(model_source, repo_mode, relative_path):
+    return f"{model_source}|{repo_mode}|{_normalize_relative_path(relative_path)}"
+
+
+def _load_manifest():
+    global _manifest
+    if _manifest is None:
+        _manifest = {}
+        manifest_path = get_model_manifest_path()
+        if manifest_path and os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    _manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to read model manifest {manifest_path}, ignoring it: {e}")
+    return _manifest
+
+
+def _save_manifest():
+    manifest_path = get_model_manifest_path()
+    if not manifest_path:
+        return
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(_manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+    except OSError as e:
+        logger.warning(f"Failed to save model manifest {manifest_path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _file_stamp(file_path):
+    # 文件大小与修改时间，只需一次 stat，不读取文件内容
+    st = os.stat(file_path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def _collect_model_files(cache_dir, relative_path):
+    """relative_path 对应的文件及其大小与修改时间，目录则递归收集"""
+    target = os.path.join(cache_dir, _normalize_relative_path(relative_path))
+    if os.path.isfile(target):
+        paths = [target]
+    else:
+        paths = [os.path.join(root, name) for root, _, names in os.walk(target) for name in names]
+    return {os.path.relpath(path, cache_dir): _file_stamp(path) for path in sorted(paths)}
+
+
+def _is_entry_valid(entry):
+    """清单记录的文件都存在且大小与修改时间未变"""
+    if not entry.get('files'):
+        return False
+    for path, stamp in entry['files'].items():
+        try:
+            if _file_stamp(os.path.join(entry['cache_dir'], path)) != stamp:
+                return False
+        except OSError:
+            return False
+    return True
+
+
+def _lookup_manifest(key):
+    entry = _load_manifest().get(key)
+    if entry is None:
+        return None
+    # 只 stat 记录的文件，不读取文件内容，保证命中时的开销很小
+    if _is_entry_valid(entry):
+        return entry['cache_dir']
+    return None
+
+
+def invalidate_model_manifest(relative_path=None):
+    """
+    显式失效清单。relative_path 为 None 时清空全部记录，否则只移除该路径的记录。
+    之后的 auto_download_and_get_model_root_path 调用会重新经过 snapshot_download 解析。
+    """
+    with _manifest_lock:
+        manifest = _load_manifest()
+        if relative_path is None:
+            manifest.clear()
+        else:
+            relative_path = _normalize_relative_path(relative_path)
+            for key in [k for k, v in manifest.items()
+                        if _normalize_relative_path(v['relative_path']) == relative_path]:
+                del manifest[key]
+        _save_manifest()
+
+
+def verify_model_manifest():
+    """检查清单中各文件的大小与修改时间，移除与记录不一致的条目，返回被移除的 key 列表"""
+    with _manifest_lock:
+        manifest = _load_manifest()
+        invalid_keys = [key for key, entry in manifest.items() if not _is_entry_valid(entry)]
+        for key in invalid_keys:
+            del manifest[key]
+        if invalid_keys:
+            _save_manifest()
+        return invalid_keys
 
 def auto_download_and_get_model_root_path(relative_path: str, repo_mode='pipeline') -> str:
     """
@@ -40,6 +155,14 @@ def auto_download_and_get_model_root_path(relative_path: str, repo_mode='pipelin
     if repo_mode not in repo_mapping:
         raise ValueError(f"Unsupported repo_mode: {repo_mode}, must be 'pipeline' or 'vlm'")
 
+    # 清单中已有解析结果时直接返回，不再访问网络或遍历下载缓存
+    manifest_key = _manifest_key(model_source, repo_mode, relative_path)
+    if get_model_manifest_path():
+        with _manifest_lock:
+            cache_dir = _lookup_manifest(manifest_key)
+        if cache_dir:
+            return cache_dir
+
     # 如果没有指定model_source或值不是'modelscope'，则使用默认值
     repo = repo_mapping[repo_mode].get(model_source, repo_mapping[repo_mode]['default'])
 
@@ -66,6 +189,20 @@ def auto_download_and_get_model_root_path(relative_path: str, repo_mode='pipelin
 
     if not cache_dir:
         raise FileNotFoundError(f"Failed to download model: {relative_path} from {repo}")
+
+    if get_model_manifest_path():
+        files = _collect_model_files(cache_dir, relative_path)
+        if files:
+            with _manifest_lock:
+                _load_manifest()[manifest_key] = {
+                    'relative_path': _normalize_relative_path(relative_path),
+                    'cache_dir': cache_dir,
+                    'files': files,
+                }
+                _save_manifest()
+        else:
+            # 没有匹配到任何文件时不记录，否则之后会一直命中一个空的结果
+            logger.warning(f"No model files found for {relative_path} in {cache_dir}, not recording it in the manifest")
     return cache_dir
 
 
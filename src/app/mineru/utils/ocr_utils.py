@@ -119,6 +119,29 @@ def sorted_boxes(dt_boxes):
     return _boxes
 
 
+def group_boxes_into_lines(dt_boxes, threshold=0.5):
+    """
+    将按 sorted_boxes 排序后的检测框按 y 方向重叠分组为文本行
+    args:
+        dt_boxes(list): detected text boxes with shape [4, 2]
+    return:
+        list of lines, each line is a list of box indices sorted from left to right
+    """
+    lines = []
+    last_bbox = None
+    for index, box in enumerate(dt_boxes):
+        bbox = [np.min(box[:, 0]), np.min(box[:, 1]), np.max(box[:, 0]), np.max(box[:, 1])]
+        if last_bbox is not None and _is_overlaps_y_exceeds_threshold(bbox, last_bbox, threshold):
+            lines[-1].append(index)
+        else:
+            lines.append([index])
+        last_bbox = bbox
+
+    for line in lines:
+        line.sort(key=lambda i: np.min(dt_boxes[i][:, 0]))
+    return lines
+
+
 def bbox_to_points(bbox):
     """ 将bbox格式转换为四个顶点的数组 """
     x0, y0, x1, y1 = bbox
@@ -413,7 +436,7 @@ def is_bbox_aligned_rect(points):
     unique_y = np.unique(y_coords)
     return len(unique_x) == 2 and len(unique_y) == 2
 
-def get_rotate_crop_image(img, points):
+def get_rotate_crop_image(img, points, copy_crop=True):
     '''
     img_height, img_width = img.shape[0:2]
     left = int(np.min(points[:, 0]))
@@ -431,7 +454,10 @@ def get_rotate_crop_image(img, points):
         xmax = int(np.max(points[:, 0]))
         ymin = int(np.min(points[:, 1]))
         ymax = int(np.max(points[:, 1]))
-        new_img = img[ymin:ymax, xmin:xmax].copy()
+        # copy_crop=False 时返回原图上的视图，供立即送入识别的调用方省去一次拷贝
+        new_img = img[ymin:ymax, xmin:xmax]
+        if copy_crop:
+            new_img = new_img.copy()
         if new_img.shape[0] > 0 and new_img.shape[1] > 0:
             return new_img
 
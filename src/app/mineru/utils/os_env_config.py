@@ -11,6 +11,65 @@ def get_load_images_timeout() -> int:
     return get_value_from_string(env_value, 300)
 
 
+def get_render_in_process_max_pages() -> int:
+    env_value = os.getenv('MINERU_PDF_RENDER_IN_PROCESS_MAX_PAGES', None)
+    return get_value_from_string(env_value, 2)
+
+
+def get_render_pool_size() -> int:
+    env_value = os.getenv('MINERU_PDF_RENDER_POOL_SIZE', None)
+    return get_value_from_string(env_value, 4)
+
+
+def is_stage_pipeline_enabled() -> bool:
+    return os.getenv('MINERU_STAGE_PIPELINE', 'false').lower() in ['true', '1', 'yes']
+
+
+def get_stage_pipeline_chunk_size() -> int:
+    env_value = os.getenv('MINERU_STAGE_PIPELINE_CHUNK_SIZE', None)
+    return get_value_from_string(env_value, 8)
+
+
+def get_stage_pipeline_queue_size() -> int:
+    env_value = os.getenv('MINERU_STAGE_PIPELINE_QUEUE_SIZE', None)
+    return get_value_from_string(env_value, 2)
+
+
+def get_ocr_backend() -> str:
+    return os.getenv('MINERU_OCR_BACKEND', 'torch').lower()
+
+
+def is_rec_quantize_enabled() -> bool:
+    return os.getenv('MINERU_REC_QUANTIZE', 'false').lower() in ['true', '1', 'yes']
+
+
+def get_rec_quantize_sample_dir() -> str:
+    return os.getenv('MINERU_REC_QUANTIZE_SAMPLE_DIR', None)
+
+
+def get_rec_batch_pixels() -> int:
+    env_value = os.getenv('MINERU_REC_BATCH_PIXELS', None)
+    return get_value_from_string(env_value, -1)
+
+
+def is_model_mmap_enabled() -> bool:
+    return os.getenv('MINERU_MODEL_MMAP', 'true').lower() in ['true', '1', 'yes']
+
+
+def is_model_snapshot_enabled() -> bool:
+    return os.getenv('MINERU_MODEL_SNAPSHOT', 'true').lower() in ['true', '1', 'yes']
+
+
+def get_model_manifest_path() -> str:
+    """模型路径清单文件，MINERU_MODEL_MANIFEST 设为 false 时关闭清单，返回空字符串"""
+    env_value = os.getenv('MINERU_MODEL_MANIFEST', None)
+    if env_value is not None and env_value.lower() in ['false', '0', 'no']:
+        return ''
+    if env_value:
+        return env_value
+    return os.path.join(os.path.expanduser('~'), '.cache', 'mineru', 'model_manifest.json')
+
+
 def get_value_from_string(env_value: str, default_value: int) -> int:
     if env_value is not None:
         try:
@@ -27,4 +86,6 @@ if __name__ == '__main__':
     print(get_value_from_string('0', -1))
     print(get_value_from_string('-1', -1))
     print(get_value_from_string('abc', -1))
-    print(get_load_images_timeout())
\ No newline at end of file
+    print(get_load_images_timeout())
+    print(get_render_in_process_max_pages())
+    print(get_render_pool_size())
\ No newline at end of file
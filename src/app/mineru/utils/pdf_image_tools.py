@@ -1,6 +1,11 @@
 # Copyright (c) Opendatalab. All rights reserved.
+import atexit
 import os
+import threading
+import time
+import weakref
 from io import BytesIO
+from multiprocessing import resource_tracker, shared_memory
 
 import numpy as np
 import pypdfium2 as pdfium
@@ -9,13 +14,18 @@ from PIL import Image
 
 from mineru.data.data_reader_writer import FileBasedDataWriter
 from mineru.utils.check_sys_env import is_windows_environment
-from mineru.utils.os_env_config import get_load_images_timeout
-from mineru.utils.pdf_reader import image_to_b64str, image_to_bytes, page_to_image
+from mineru.utils.os_env_config import get_load_images_timeout, get_render_in_process_max_pages, get_render_pool_size
+from mineru.utils.pdf_reader import image_to_b64str, image_to_bytes, page_to_image, page_region_to_image
 from mineru.utils.enum_class import ImageType
 from mineru.utils.hash_utils import str_sha256
 from mineru.utils.pdf_page_id import get_end_page_id
 
-from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# 常驻的渲染进程池，跨调用复用，避免每次调用都重新创建进程
+_render_pool = None
+_render_pool_lock = threading.Lock()
 
 
 def pdf_page_to_image(page: pdfium.PdfPage, dpi=200, image_type=ImageType.PIL) -> dict:
@@ -27,7 +37,7 @@ def pdf_page_to_image(page: pdfium.PdfPage, dpi=200, image_type=ImageType.PIL) -
         image_type (ImageType, optional): The type of image to return. Defaults to ImageType.PIL.
 
     Returns:
-        dict:  {'img_base64': str, 'img_pil': pil_img, 'scale': float }
+        dict:  {'img_base64': str, 'img_pil': pil_img, 'img_np': np.ndarray, 'scale': float }
     """
     pil_img, scale = page_to_image(page, dpi=dpi)
     image_dict = {
@@ -35,12 +45,174 @@ def pdf_page_to_image(page: pdfium.PdfPage, dpi=200, image_type=ImageType.PIL) -
     }
     if image_type == ImageType.BASE64:
         image_dict["img_base64"] = image_to_b64str(pil_img)
+    elif image_type == ImageType.NUMPY:
+        image_dict["img_np"] = np.asarray(pil_img if pil_img.mode == "RGB" else pil_img.convert("RGB"))
     else:
         image_dict["img_pil"] = pil_img
 
     return image_dict
 
 
+def get_page_pil_img(image_dict: dict) -> Image.Image:
+    """返回页面的 PIL 图像，ImageType.NUMPY 渲染的页面由 img_np 转换得到"""
+    if "img_pil" in image_dict:
+        return image_dict["img_pil"]
+    return Image.fromarray(image_dict["img_np"])
+
+
+def get_page_size(image_dict: dict) -> tuple:
+    """返回页面图像的 (宽, 高)"""
+    if "img_pil" in image_dict:
+        return image_dict["img_pil"].size
+    height, width = image_dict["img_np"].shape[:2]
+    return width, height
+
+
+def pdf_page_region_to_image(page: pdfium.PdfPage, clip_box: tuple, dpi=200, image_type=ImageType.PIL,
+                             clip_in_points=False) -> dict:
+    """只渲染页面的指定区域
+
+    Args:
+        page (_type_): pdfium.PdfPage
+        clip_box (tuple): (x0, y0, x1, y1)，整页按 dpi 渲染后的像素坐标，或 clip_in_points 为 True 时的 PDF 坐标
+        dpi (int, optional): reset the dpi of dpi. Defaults to 200.
+        image_type (ImageType, optional): The type of image to return. Defaults to ImageType.PIL.
+        clip_in_points (bool, optional): clip_box 是否为 PDF 坐标. Defaults to False.
+
+    Returns:
+        dict:  {'img_base64': str, 'img_pil': pil_img, 'scale': float }
+    """
+    pil_img, scale = page_region_to_image(page, clip_box, dpi=dpi, clip_in_points=clip_in_points)
+    image_dict = {
+        "scale": scale,
+    }
+    if image_type == ImageType.BASE64:
+        image_dict["img_base64"] = image_to_b64str(pil_img)
+    else:
+        image_dict["img_pil"] = pil_img
+
+    return image_dict
+
+
+def load_region_image_from_pdf(
+        pdf_bytes: bytes,
+        clip_box: tuple,
+        dpi=200,
+        page_id=0,
+        image_type=ImageType.PIL,
+        clip_in_points=False,
+):
+    """在当前进程中渲染 PDF 某一页的指定区域，页码超出范围时返回 None"""
+    pdf_doc = pdfium.PdfDocument(pdf_bytes)
+    try:
+        if page_id >= len(pdf_doc):
+            return None
+        page = pdf_doc[page_id]
+        return pdf_page_region_to_image(page, clip_box, dpi=dpi, image_type=image_type, clip_in_points=clip_in_points)
+    finally:
+        pdf_doc.close()
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """获取常驻渲染进程池，不存在时创建"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            # 先启动资源跟踪进程，使工作进程与主进程共用同一个跟踪进程，未释放的共享内存在退出时统一回收
+            resource_tracker.ensure_running()
+            max_workers = min(os.cpu_count() or 1, get_render_pool_size())
+            _render_pool = ProcessPoolExecutor(max_workers=max_workers)
+            logger.debug(f"PDF render pool started with {max_workers} processes")
+        return _render_pool
+
+
+def shutdown_render_pool(wait=True, pool=None, cancel_futures=True):
+    """
+    关闭常驻渲染进程池，下次调用时重新创建；指定 pool 时仅当它仍是当前进程池才关闭
+    cancel_futures 为 False 时只停用该进程池，其他调用已提交的任务继续执行完毕后进程再退出
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if pool is not None and pool is not _render_pool:
+            return
+        pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+atexit.register(shutdown_render_pool)
+
+
+# 关闭时仍被数组引用的共享内存，在之后的释放调用中重试关闭
+_pending_close_shm = []
+_pending_close_shm_lock = threading.Lock()
+
+
+def _release_shared_memory(shm: shared_memory.SharedMemory):
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+    with _pending_close_shm_lock:
+        for pending_shm in [shm] + _pending_close_shm:
+            try:
+                pending_shm.close()
+            except BufferError:
+                # 仍有数组引用该内存，数组释放前不能解除映射
+                if pending_shm not in _pending_close_shm:
+                    _pending_close_shm.append(pending_shm)
+            else:
+                if pending_shm in _pending_close_shm:
+                    _pending_close_shm.remove(pending_shm)
+
+
+class SharedPageImage:
+    """工作进程渲染到共享内存中的页面图像，array 为零拷贝的 NumPy 视图"""
+
+    def __init__(self, shm_name: str, shape: tuple):
+        self._shm = shared_memory.SharedMemory(name=shm_name)
+        # np.frombuffer 会持有内存映射的引用，数组存活期间映射不会被解除
+        self.array = np.frombuffer(self._shm.buf, dtype=np.uint8, count=int(np.prod(shape))).reshape(shape)
+        # 使用方忘记释放时，对象回收时兜底释放
+        self._finalizer = weakref.finalize(self, _release_shared_memory, self._shm)
+
+    def release(self):
+        """释放共享内存；已取出的数组仍可读取，映射在数组回收后解除"""
+        self.array = None
+        self._finalizer()
+
+
+def release_images(images_list):
+    """释放 load_images_from_pdf 以 ImageType.NUMPY 返回的页面所占用的共享内存，其他类型的页面不受影响"""
+    for image_dict in images_list:
+        shared_image = image_dict.pop("shm", None)
+        if shared_image is not None:
+            image_dict.pop("img_np", None)
+            shared_image.release()
+
+
+def _load_images_to_shared_memory_worker(pdf_bytes, dpi, start_page_id, end_page_id):
+    """在工作进程中渲染页面并写入共享内存，只返回内存块名称与数组形状"""
+    images_list = load_images_from_pdf_core(pdf_bytes, dpi, start_page_id, end_page_id, ImageType.NUMPY)
+    results = []
+    for image_dict in images_list:
+        np_img = image_dict["img_np"]
+        shm = shared_memory.SharedMemory(create=True, size=max(np_img.nbytes, 1))
+        np.ndarray(np_img.shape, dtype=np.uint8, buffer=shm.buf)[:] = np_img
+        results.append({"scale": image_dict["scale"], "shm_name": shm.name, "shape": np_img.shape})
+        shm.close()
+    return results
+
+
+def _attach_shared_images(results):
+    """在主进程中把工作进程返回的共享内存包装为页面图像"""
+    images_list = []
+    for result in results:
+        shared_image = SharedPageImage(result["shm_name"], result["shape"])
+        images_list.append({"scale": result["scale"], "img_np": shared_image.array, "shm": shared_image})
+    return images_list
+
+
 def _load_images_from_pdf_worker(pdf_bytes, dpi, start_page_id, end_page_id, image_type):
     """用于进程池的包装函数"""
     return load_images_from_pdf_core(pdf_bytes, dpi, start_page_id, end_page_id, image_type)
@@ -56,6 +228,7 @@ def load_images_from_pdf(
         threads=4,
 ):
     """带超时控制的 PDF 转图片函数,支持多进程加速
+    页数不超过 MINERU_PDF_RENDER_IN_PROCESS_MAX_PAGES 时直接在当前进程渲染，否则使用常驻渲染进程池
 
     Args:
         pdf_bytes (bytes): PDF 文件的 bytes
@@ -66,6 +239,9 @@ def load_images_from_pdf(
         timeout (int | None, optional): 超时时间(秒)。如果为 None，则从环境变量 MINERU_PDF_LOAD_IMAGES_TIMEOUT 读取，若未设置则默认为 300 秒。
         threads (int): 进程数,默认 4
 
+    image_type 为 ImageType.NUMPY 时返回 RGB 的 img_np；使用进程池时工作进程将页面渲染到共享内存，
+    img_np 为共享内存上的零拷贝视图，不再经由进程间管道序列化，使用完毕后需调用 release_images 释放
+
     Raises:
         TimeoutError: 当转换超时时抛出
     """
@@ -87,6 +263,13 @@ def load_images_from_pdf(
         # 计算总页数
         total_pages = end_page_id - start_page_id + 1
 
+        deadline = time.monotonic() + timeout
+
+        # 页数较少时进程间传输的开销大于并行收益，直接在当前进程渲染
+        if total_pages <= get_render_in_process_max_pages():
+            return _load_images_in_process(
+                pdf_doc, pdf_bytes, dpi, start_page_id, end_page_id, image_type, timeout, deadline), pdf_doc
+
         # 实际使用的进程数不超过总页数
         actual_threads = min(os.cpu_count() or 1, threads, total_pages)
 
@@ -106,38 +289,78 @@ def load_images_from_pdf(
 
         # logger.debug(f"PDF to images using {actual_threads} processes, page ranges: {page_ranges}")
 
-        with ProcessPoolExecutor(max_workers=actual_threads) as executor:
-            # 提交所有任务
-            futures = []
+        executor = get_render_pool()
+        # 提交所有任务
+        futures = []
+        all_results = []
+        try:
             for range_start, range_end in page_ranges:
-                future = executor.submit(
-                    _load_images_from_pdf_worker,
-                    pdf_bytes,
-                    dpi,
-                    range_start,
-                    range_end,
-                    image_type
-                )
+                if image_type == ImageType.NUMPY:
+                    future = executor.submit(
+                        _load_images_to_shared_memory_worker,
+                        pdf_bytes,
+                        dpi,
+                        range_start,
+                        range_end,
+                    )
+                else:
+                    future = executor.submit(
+                        _load_images_from_pdf_worker,
+                        pdf_bytes,
+                        dpi,
+                        range_start,
+                        range_end,
+                        image_type
+                    )
                 futures.append((range_start, future))
 
-            try:
-                # 收集结果并按页码排序
-                all_results = []
-                for range_start, future in futures:
-                    images_list = future.result(timeout=timeout)
-                    all_results.append((range_start, images_list))
-
-                # 按起始页码排序并合并结果
-                all_results.sort(key=lambda x: x[0])
-                images_list = []
-                for _, imgs in all_results:
-                    images_list.extend(imgs)
-
-                return images_list, pdf_doc
-            except FuturesTimeoutError:
-                pdf_doc.close()
-                executor.shutdown(wait=False, cancel_futures=True)
-                raise TimeoutError(f"PDF to images conversion timeout after {timeout}s")
+            # 收集结果并按页码排序，所有分组共用同一个截止时间
+            for range_start, future in futures:
+                images_list = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                if image_type == ImageType.NUMPY:
+                    images_list = _attach_shared_images(images_list)
+                all_results.append((range_start, images_list))
+
+            # 按起始页码排序并合并结果
+            all_results.sort(key=lambda x: x[0])
+            images_list = []
+            for _, imgs in all_results:
+                images_list.extend(imgs)
+
+            return images_list, pdf_doc
+        except FuturesTimeoutError:
+            pdf_doc.close()
+            for _, imgs in all_results:
+                release_images(imgs)
+            # 只取消本次调用的任务；超时的进程可能仍在运行，停用该进程池，后续调用使用新的进程池，
+            # 其他调用已提交到旧进程池的任务不受影响
+            for _, future in futures:
+                future.cancel()
+            shutdown_render_pool(wait=False, pool=executor, cancel_futures=False)
+            raise TimeoutError(f"PDF to images conversion timeout after {timeout}s")
+        except CancelledError:
+            # 进程池被关闭(如程序退出)时本次调用的任务被取消，改为在当前进程渲染
+            logger.warning("PDF render tasks were cancelled, rendering in the current process")
+            for _, imgs in all_results:
+                release_images(imgs)
+            return _load_images_in_process(
+                pdf_doc, pdf_bytes, dpi, start_page_id, end_page_id, image_type, timeout, deadline), pdf_doc
+        except BrokenProcessPool:
+            # 工作进程异常退出，重建进程池后交由调用方处理
+            pdf_doc.close()
+            for _, imgs in all_results:
+                release_images(imgs)
+            shutdown_render_pool(wait=False, pool=executor)
+            raise
+
+
+def _load_images_in_process(pdf_doc, pdf_bytes, dpi, start_page_id, end_page_id, image_type, timeout, deadline):
+    """在当前进程渲染，超过截止时间时关闭 pdf_doc 并抛出 TimeoutError"""
+    try:
+        return load_images_from_pdf_core(pdf_bytes, dpi, start_page_id, end_page_id, image_type, deadline)
+    except TimeoutError:
+        pdf_doc.close()
+        raise TimeoutError(f"PDF to images conversion timeout after {timeout}s")
 
 
 def load_images_from_pdf_core(
@@ -145,14 +368,22 @@ def load_images_from_pdf_core(
     dpi=200,
     start_page_id=0,
     end_page_id=None,
-    image_type=ImageType.PIL,  # PIL or BASE64
+    image_type=ImageType.PIL,  # PIL, BASE64 or NUMPY
+    deadline=None,
 ):
+    """
+    逐页渲染。deadline(time.monotonic() 时间)不为 None 时，每页渲染前检查是否已超时，超时抛出 TimeoutError；
+    当前进程无法中断正在渲染的单页，因此单页的渲染耗时不受该限制
+    """
     images_list = []
     pdf_doc = pdfium.PdfDocument(pdf_bytes)
     pdf_page_num = len(pdf_doc)
     end_page_id = get_end_page_id(end_page_id, pdf_page_num)
 
     for index in range(start_page_id, end_page_id + 1):
+        if deadline is not None and time.monotonic() > deadline:
+            pdf_doc.close()
+            raise TimeoutError(f"PDF to images conversion exceeded the deadline at page {index}")
         # logger.debug(f"Converting page {index}/{pdf_page_num} to image")
         page = pdf_doc[index]
         image_dict = pdf_page_to_image(page, dpi=dpi, image_type=image_type)
@@ -28,6 +28,119 @@ def page_to_image(
     return image, scale
 
 
+def _get_page_clip_rect(
+    page: PdfPage,
+    clip_box: tuple,
+    dpi: int,
+    max_width_or_height: int,
+    clip_in_points: bool,
+) -> (tuple, float):
+    """将 clip_box 转换为裁剪到页面范围内的 PDF 坐标(左上角为原点)，并返回与 page_to_image 一致的缩放比例"""
+    scale = dpi / 72
+
+    page_width, page_height = page.get_size()
+    long_side_length = max(page_width, page_height)
+    if (long_side_length*scale) > max_width_or_height:
+        scale = max_width_or_height / long_side_length
+
+    x0, y0, x1, y1 = clip_box
+    if not clip_in_points:
+        x0, y0, x1, y1 = x0 / scale, y0 / scale, x1 / scale, y1 / scale
+
+    x0 = min(max(x0, 0), page_width)
+    x1 = min(max(x1, x0), page_width)
+    y0 = min(max(y0, 0), page_height)
+    y1 = min(max(y1, y0), page_height)
+    return (x0, y0, x1, y1), scale
+
+
+def _display_rect_to_page_rect(page: PdfPage, rect: tuple) -> tuple:
+    """将显示坐标(已按 /Rotate 旋转、以 CropBox 左上角为原点)的矩形转换为 PDF 用户空间坐标，
+    返回 (left, bottom, right, top)，用于 get_text_bounded 等使用用户空间坐标的接口"""
+    left, bottom, right, top = page.get_bbox()
+    x0, y0, x1, y1 = rect
+    rotation = page.get_rotation()
+    if rotation == 90:
+        return left + y0, bottom + x0, left + y1, bottom + x1
+    if rotation == 180:
+        return right - x1, bottom + y0, right - x0, bottom + y1
+    if rotation == 270:
+        return right - y1, top - x1, right - y0, top - x0
+    return left + x0, top - y1, left + x1, top - y0
+
+
+def page_region_to_image(
+    page: PdfPage,
+    clip_box: tuple,
+    dpi: int = 200,
+    max_width_or_height: int = 3500,
+    clip_in_points: bool = False,
+) -> (Image.Image, float):
+    """只渲染页面中 clip_box 指定的区域，避免渲染整页后再裁剪。
+
+    Args:
+        page (PdfPage): pdfium page
+        clip_box (tuple): (x0, y0, x1, y1)，左上角为原点。默认是整页按 dpi 渲染后图片的像素坐标，
+            clip_in_points 为 True 时表示 PDF 坐标(points)。两者都是显示坐标，即已按页面 /Rotate 旋转、
+            以 CropBox 左上角为原点，与 page_to_image 渲染出的整页图片一致
+        dpi (int): 渲染 dpi，与 page_to_image 的缩放规则一致
+        max_width_or_height (int): 整页渲染时长边的像素上限
+        clip_in_points (bool): clip_box 是否为 PDF 坐标
+
+    Returns:
+        (Image.Image, float): 区域图片和缩放比例
+    """
+    (x0, y0, x1, y1), scale = _get_page_clip_rect(page, clip_box, dpi, max_width_or_height, clip_in_points)
+    page_width, page_height = page.get_size()
+
+    # pdfium 的 crop 参数为 (left, bottom, right, top) 四个方向各自裁掉的长度，
+    # 作用于已旋转、以 CropBox 为范围的渲染结果，因此直接使用显示坐标
+    crop = (x0, page_height - y1, page_width - x1, y0)
+    bitmap: PdfBitmap = page.render(scale=scale, crop=crop)  # type: ignore
+
+    image = bitmap.to_pil()
+    try:
+        bitmap.close()
+    except Exception as e:
+        logger.error(f"Failed to close bitmap: {e}")
+    return image, scale
+
+
+def page_region_to_text(
+    page: PdfPage,
+    clip_box: tuple,
+    dpi: int = 200,
+    max_width_or_height: int = 3500,
+    clip_in_points: bool = False,
+) -> str:
+    """从页面文本层中提取 clip_box 区域内的文字，clip_box 的含义与 page_region_to_image 相同。
+    扫描件等没有文本层的页面返回空字符串。"""
+    rect, _ = _get_page_clip_rect(page, clip_box, dpi, max_width_or_height, clip_in_points)
+    # get_text_bounded 使用 PDF 用户空间坐标，需要还原页面旋转和 CropBox 偏移
+    left, bottom, right, top = _display_rect_to_page_rect(page, rect)
+
+    text_page = page.get_textpage()
+    try:
+        return text_page.get_text_bounded(left=left, bottom=bottom, right=right, top=top)
+    finally:
+        text_page.close()
+
+
+def pdf_region_to_text(
+    pdf: str | bytes | PdfDocument,
+    clip_box: tuple,
+    dpi: int = 200,
+    page_id: int = 0,
+    clip_in_points: bool = False,
+) -> str:
+    doc = pdf if isinstance(pdf, PdfDocument) else PdfDocument(pdf)
+    try:
+        if page_id >= len(doc):
+            return ""
+        return page_region_to_text(doc[page_id], clip_box, dpi, clip_in_points=clip_in_points)
+    finally:
+        if not isinstance(pdf, PdfDocument):
+            doc.close()
 
 
 def image_to_bytes(
@@ -0,0 +1,127 @@
+import threading
+import time
+from queue import Queue
+from typing import Any, Callable, Iterable, Iterator, List, Tuple
+
+from loguru import logger
+
+_END = object()
+
+
+class _StageError:
+    def __init__(self, stage_name: str, exc: BaseException):
+        self.stage_name = stage_name
+        self.exc = exc
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self.queue_depth_sum = 0
+        self.max_queue_depth = 0
+
+    def record_queue_depth(self, depth: int):
+        self.queue_depth_sum += depth
+        self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def summary(self, wall_time: float) -> str:
+        avg_depth = self.queue_depth_sum / self.items if self.items else 0
+        utilization = self.busy_time / wall_time * 100 if wall_time > 0 else 0
+        return (
+            f"{self.name}: items={self.items}, busy={self.busy_time:.2f}s, wait={self.wait_time:.2f}s, "
+            f"utilization={utilization:.0f}%, queue_depth avg={avg_depth:.1f} max={self.max_queue_depth}"
+        )
+
+
+class StagePipeline:
+    """
+    线程流水线: 每个阶段一个线程，阶段之间用有界队列连接，
+    前一项进入下一阶段时，后一项即可开始当前阶段，各阶段并行执行。
+    torch 推理时会释放 GIL，用线程即可让各阶段重叠。
+    结果按输入顺序产出；任一阶段出错时，在主线程中重新抛出该异常。
+    """
+
+    def __init__(self, stages: List[Tuple[str, Callable[[Any], Any]]], queue_size: int = 2):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = [StageStats(name) for name, _ in stages]
+        self.wall_time = 0.0
+
+    def _run_stage(self, stage_fn, stats: StageStats, in_queue: Queue, out_queue: Queue):
+        failed = False
+        while True:
+            wait_start = time.perf_counter()
+            item = in_queue.get()
+            stats.wait_time += time.perf_counter() - wait_start
+            if item is _END:
+                out_queue.put(_END)
+                return
+            if failed or isinstance(item, _StageError):
+                # 出错后继续取出剩余项，避免上游阻塞在已满的队列上
+                if not failed:
+                    out_queue.put(item)
+                    failed = True
+                continue
+            stats.record_queue_depth(in_queue.qsize())
+            busy_start = time.perf_counter()
+            try:
+                result = stage_fn(item)
+            except Exception as e:
+                out_queue.put(_StageError(stats.name, e))
+                failed = True
+                continue
+            finally:
+                stats.busy_time += time.perf_counter() - busy_start
+            stats.items += 1
+            out_queue.put(result)
+
+    def _feed(self, items: Iterable[Any], out_queue: Queue):
+        try:
+            for item in items:
+                out_queue.put(item)
+        except Exception as e:
+            out_queue.put(_StageError("input", e))
+        out_queue.put(_END)
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        start_time = time.perf_counter()
+        queues = [Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]), daemon=True)]
+        for index, (name, stage_fn) in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._run_stage,
+                args=(stage_fn, self.stats[index], queues[index], queues[index + 1]),
+                name=f"stage-{name}",
+                daemon=True,
+            ))
+        for thread in threads:
+            thread.start()
+
+        finished = False
+        try:
+            while True:
+                item = queues[-1].get()
+                if item is _END:
+                    finished = True
+                    break
+                if isinstance(item, _StageError):
+                    raise RuntimeError(f"Pipeline stage '{item.stage_name}' failed: {item.exc}") from item.exc
+                yield item
+        finally:
+            self.wall_time = time.perf_counter() - start_time
+            if not finished:
+                # 提前退出时继续取出剩余结果，让各阶段线程正常结束
+                threading.Thread(target=self._drain, args=(queues[-1],), daemon=True).start()
+
+    @staticmethod
+    def _drain(queue: Queue):
+        while queue.get() is not _END:
+            pass
+
+    def log_stats(self, title: str = "Stage pipeline"):
+        logger.info(f"{title} finished in {self.wall_time:.2f}s")
+        for stats in self.stats:
+            logger.info(f"  {stats.summary(self.wall_time)}")
@@ -0,0 +1,47 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# 与 app.py 一致，以 src/app 作为导入根目录
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def build_pdf(rotate=0, media_box=(0, 0, 600, 800), crop_box=None, text="SHIP123", text_pos=(100, 600), rect=None):
+    """生成单页 PDF: 一段 Helvetica 文本，以及可选的黑色矩形 (x, y, w, h)，坐标均为 PDF 用户空间"""
+    content = f"BT /F1 24 Tf {text_pos[0]} {text_pos[1]} Td ({text}) Tj ET"
+    if rect:
+        content = f"0 0 0 rg {rect[0]} {rect[1]} {rect[2]} {rect[3]} re f " + content
+    content = content.encode()
+
+    def pdf_box(box):
+        return "[" + " ".join(str(v) for v in box) + "]"
+
+    page = f"<< /Type /Page /Parent 2 0 R /MediaBox {pdf_box(media_box)} "
+    if crop_box:
+        page += f"/CropBox {pdf_box(crop_box)} "
+    page += f"/Rotate {rotate} /Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        page.encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+    ]
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for index, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % index + obj + b"\nendobj\n"
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
+
+
+@pytest.fixture
+def make_pdf():
+    return build_pdf
@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pandas")
+app = pytest.importorskip("app")
+
+
+def make_spec(text, color):
+    image = np.full((60, 200, 3), color, dtype=np.uint8)
+    results = [[[[[10, 10], [190, 10], [190, 50], [10, 50]], (text, 0.99)]]]
+    return image, results
+
+
+def test_new_spec_replaces_rendered_annotation(tmp_path):
+    thumbnail_path = tmp_path / "label_thumb.png"
+    paths = app.get_annotation_paths(thumbnail_path)
+
+    image, results = make_spec("SHIP001", 255)
+    app.save_annotation_spec(thumbnail_path, image, results, "SHIP001")
+    assert app.ensure_annotation_image(thumbnail_path) == str(paths["image"])
+    first = np.asarray(app.Image.open(paths["image"]).convert("RGB"))
+
+    # 同名的另一个文件: 旧的标注图片不能再被返回
+    image, results = make_spec("SHIP002", 0)
+    app.save_annotation_spec(thumbnail_path, image, results, None)
+    assert not paths["image"].exists()
+    assert json.loads(paths["spec"].read_text(encoding="utf-8"))["results"][0][1][0] == "SHIP002"
+
+    assert app.ensure_annotation_image(thumbnail_path) == str(paths["image"])
+    second = np.asarray(app.Image.open(paths["image"]).convert("RGB"))
+    assert not np.array_equal(first, second)
+    assert second[5, 5].tolist() == [0, 0, 0]
+    assert not paths["spec"].exists()
+    assert not paths["raw"].exists()
+
+
+def test_thumbnail_path_depends_on_content(tmp_path):
+    first = app.get_annotation_thumbnail_path(tmp_path / "label.pdf", b"%PDF-1 first")
+    second = app.get_annotation_thumbnail_path(tmp_path / "label.pdf", b"%PDF-1 second")
+    assert first != second
+    assert first.name.startswith("label_") and first.name.endswith("_thumb.png")
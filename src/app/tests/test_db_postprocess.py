@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+import pytest
+
+from mineru.model.utils.pytorchocr.postprocess.db_postprocess import DBPostProcess
+
+
+def _random_map(rng, height, width):
+    """模糊后的随机噪声，产生大量不规则和贴边的轮廓"""
+    noise = rng.random((height, width)).astype(np.float32)
+    return cv2.GaussianBlur(noise, (0, 0), float(rng.uniform(1.0, 4.0)))
+
+
+def _text_line_map(rng, height, width, num_lines=15):
+    """模拟检测网络输出的概率图: 不同角度的文本行，部分超出图像边界，边缘平滑过渡"""
+    pred = (rng.random((height, width)) * 0.2).astype(np.float32)
+    for _ in range(num_lines):
+        center = (float(rng.uniform(-20, width + 20)), float(rng.uniform(-20, height + 20)))
+        size = (float(rng.uniform(10, width * 0.6)), float(rng.uniform(4, 30)))
+        angle = float(rng.choice([0.0, 90.0, rng.uniform(-45, 45)]))
+        points = cv2.boxPoints((center, size, angle))
+        cv2.fillPoly(pred, [np.round(points).astype(np.int32)], float(rng.uniform(0.7, 1.0)))
+    return np.clip(cv2.GaussianBlur(pred, (5, 5), 1.5), 0, 1)
+
+
+def _assert_same_boxes(pred, thresh=0.3, use_dilation=False, **kwargs):
+    fast = DBPostProcess(thresh=thresh, use_dilation=use_dilation, fast_postprocess=True, **kwargs)
+    slow = DBPostProcess(thresh=thresh, use_dilation=use_dilation, fast_postprocess=False, **kwargs)
+    bitmap = pred > thresh
+    if use_dilation:
+        bitmap = cv2.dilate(bitmap.astype(np.uint8), np.array([[1, 1], [1, 1]]))
+    dest_height, dest_width = pred.shape[0] * 2 + 3, pred.shape[1] * 2 - 5
+
+    fast_boxes, fast_scores = fast.boxes_from_bitmap(pred, bitmap, dest_width, dest_height)
+    slow_boxes, slow_scores = slow.boxes_from_bitmap(pred, bitmap, dest_width, dest_height)
+    assert fast_boxes.dtype == slow_boxes.dtype
+    np.testing.assert_array_equal(fast_boxes, slow_boxes)
+    np.testing.assert_allclose(fast_scores, slow_scores, rtol=1e-6, atol=1e-6)
+    return len(slow_boxes)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fast_path_matches_on_random_maps(seed):
+    rng = np.random.default_rng(seed)
+    pred = _random_map(rng, int(rng.integers(32, 200)), int(rng.integers(32, 200)))
+    _assert_same_boxes(pred, thresh=float(rng.uniform(0.45, 0.55)), box_thresh=float(rng.uniform(0.4, 0.6)))
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("use_dilation", [False, True])
+def test_fast_path_matches_on_text_line_maps(seed, use_dilation):
+    rng = np.random.default_rng(seed)
+    pred = _text_line_map(rng, 320, 480)
+    _assert_same_boxes(pred, use_dilation=use_dilation, box_thresh=0.5, unclip_ratio=1.5)
+
+
+def test_text_line_maps_produce_boxes():
+    # 确保上面的比较覆盖了足够多的实际输出框，而不是在空结果上比较
+    num_boxes = [_assert_same_boxes(_text_line_map(np.random.default_rng(seed), 320, 480), box_thresh=0.5, unclip_ratio=1.5)
+                 for seed in range(20)]
+    assert sum(num_boxes) > 50
+
+
+def test_fast_path_matches_on_edge_clipped_rotated_boxes():
+    pred = np.zeros((120, 160), dtype=np.float32)
+    for center, size, angle in [((0, 60), (60, 12), 30), ((159, 0), (80, 14), -20),
+                                ((80, 119), (100, 10), 5), ((80, 60), (90, 16), 45)]:
+        points = cv2.boxPoints((center, size, angle))
+        cv2.fillPoly(pred, [np.round(points).astype(np.int32)], 0.9)
+    assert _assert_same_boxes(pred, box_thresh=0.5) == 4
+
+
+def test_closed_form_unclip_matches_pyclipper():
+    post = DBPostProcess(unclip_ratio=1.5)
+    rng = np.random.default_rng(0)
+    num_closed_form = 0
+    for _ in range(2000):
+        x0, y0 = rng.uniform(-5, 900, size=2)
+        width, height = rng.uniform(3, 600), rng.uniform(3, 60)
+        points = np.array([[x0, y0], [x0 + width, y0], [x0 + width, y0 + height], [x0, y0 + height]], dtype=np.float32)
+        distance = post._unclip_distance(points)
+        unclipped = post._unclip_rect(points, distance, 0.5, 0.75)
+        if unclipped is None:
+            continue
+        num_closed_form += 1
+        expected_box, expected_sside = post.get_mini_boxes(post._offset_polygon(points, distance).reshape(-1, 1, 2))
+        # 两者只差 minAreaRect 的 float32 误差
+        np.testing.assert_allclose(unclipped[0], np.array(expected_box), atol=1e-3)
+        assert abs(unclipped[1] - expected_sside) < 1e-3
+    assert num_closed_form > 1500
@@ -0,0 +1,90 @@
+import argparse
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from mineru.model.utils.pytorchocr import base_ocr_v20
+from mineru.model.utils.pytorchocr.base_ocr_v20 import get_snapshot_path
+from mineru.model.utils.pytorchocr.modeling.architectures.base_model import BaseModel
+from mineru.model.utils.tools.infer import pytorchocr_utility as utility
+from mineru.model.utils.tools.infer.predict_det import TextDetector
+from mineru.model.utils.tools.infer.predict_rec import TextRecognizer
+from mineru.model.utils.tools.infer.rec_quantization import REC_QUANT_FIXTURE_DIR
+
+REC_DICT_PATH = os.path.join(os.path.dirname(REC_QUANT_FIXTURE_DIR), 'dict', 'ppocrv5_dict.txt')
+
+CONFIG = {'model_type': 'det', 'algorithm': 'DB', 'Backbone': {'name': 'PPLCNetV3', 'scale': 0.75}}
+
+
+@pytest.fixture
+def weights_path(tmp_path):
+    path = tmp_path / 'det.pth'
+    path.write_bytes(b'weights')
+    return str(path)
+
+
+def test_snapshot_path_tracks_config_and_version(weights_path, monkeypatch):
+    path = get_snapshot_path(weights_path, CONFIG)
+    assert path == get_snapshot_path(weights_path, dict(CONFIG))
+
+    changed = dict(CONFIG, Backbone={'name': 'PPLCNetV3', 'scale': 1.0})
+    assert get_snapshot_path(weights_path, changed) != path
+    assert get_snapshot_path(weights_path, CONFIG, out_channels=97) != path
+
+    monkeypatch.setattr(base_ocr_v20, 'MODEL_SNAPSHOT_VERSION', base_ocr_v20.MODEL_SNAPSHOT_VERSION + 1)
+    assert get_snapshot_path(weights_path, CONFIG) != path
+
+
+def test_snapshot_path_tracks_weights(weights_path):
+    path = get_snapshot_path(weights_path, CONFIG)
+    with open(weights_path, 'wb') as f:
+        f.write(b'WEIGHTS')
+    os.utime(weights_path, ns=(1, 1))
+    assert get_snapshot_path(weights_path, CONFIG) != path
+
+
+def build_ocr_model(model_cls, **kwargs):
+    args = vars(utility.init_args().parse_args([]))
+    args.update(device='cpu', **kwargs)
+    return model_cls(argparse.Namespace(**args))
+
+
+def count_dict_chars():
+    with open(REC_DICT_PATH, encoding='utf-8') as f:
+        return sum(1 for _ in f)
+
+
+@pytest.mark.parametrize('model_cls, weights_name', [
+    (TextDetector, 'ch_PP-OCRv5_det_infer.pth'),
+    (TextRecognizer, 'ch_PP-OCRv5_rec_infer.pth'),
+])
+def test_snapshot_round_trip(tmp_path, monkeypatch, model_cls, weights_name):
+    monkeypatch.setenv('MINERU_MODEL_SNAPSHOT', 'true')
+    weights_path = str(tmp_path / weights_name)
+    if model_cls is TextDetector:
+        model_kwargs, args = {}, {'det_model_path': weights_path}
+    else:
+        model_kwargs = {'out_channels': count_dict_chars() + 2}
+        args = {'rec_model_path': weights_path, 'rec_char_dict_path': REC_DICT_PATH}
+    torch.manual_seed(0)
+    torch.save(BaseModel(utility.get_arch_config(weights_path), **model_kwargs).state_dict(), weights_path)
+
+    built = build_ocr_model(model_cls, **args)
+    snapshot_path, = tmp_path.glob('*.snapshot.pt')
+    # 快照只包含张量与整数，可以用 weights_only=True 读取
+    snapshot = torch.load(snapshot_path, weights_only=True)
+    assert set(snapshot) == {'state_dict', 'net_kwargs'}
+
+    # 第二次构建不再读取原始权重，而是重建网络后载入快照中的参数
+    monkeypatch.setattr(base_ocr_v20, '_shared_models', {})
+    monkeypatch.setattr(base_ocr_v20, 'load_weights_file', lambda path: pytest.fail('original weights were read'))
+    loaded = build_ocr_model(model_cls, **args)
+    assert loaded.net is not built.net
+
+    inputs = torch.rand(1, 3, 48, 320) if model_cls is TextRecognizer else torch.rand(1, 3, 96, 96)
+    expected, actual = built.inference(inputs), loaded.inference(inputs)
+    if isinstance(expected, dict):
+        expected, actual = expected['maps'], actual['maps']
+    assert torch.equal(expected, actual)
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from mineru.utils import models_download_utils
+from mineru.utils.models_download_utils import (
+    auto_download_and_get_model_root_path,
+    invalidate_model_manifest,
+    verify_model_manifest,
+)
+
+
+@pytest.fixture
+def fake_hub(tmp_path, monkeypatch):
+    """用本地目录代替 snapshot_download，记录调用次数"""
+    cache_dir = tmp_path / 'hub'
+    (cache_dir / 'models' / 'OCR').mkdir(parents=True)
+    (cache_dir / 'models' / 'OCR' / 'det.pth').write_bytes(b'det')
+    calls = []
+
+    def snapshot_download(repo, allow_patterns=None):
+        calls.append(allow_patterns)
+        return str(cache_dir)
+
+    monkeypatch.setenv('MINERU_MODEL_SOURCE', 'huggingface')
+    monkeypatch.setenv('MINERU_MODEL_MANIFEST', str(tmp_path / 'manifest.json'))
+    monkeypatch.setattr(models_download_utils, 'hf_snapshot_download', snapshot_download)
+    monkeypatch.setattr(models_download_utils, '_manifest', None)
+    return cache_dir, calls
+
+
+def test_manifest_hit_skips_download(fake_hub):
+    cache_dir, calls = fake_hub
+    assert auto_download_and_get_model_root_path('models/OCR') == str(cache_dir)
+    assert auto_download_and_get_model_root_path('/models/OCR/') == str(cache_dir)
+    assert len(calls) == 1
+
+
+def test_changed_file_misses_manifest(fake_hub):
+    cache_dir, calls = fake_hub
+    auto_download_and_get_model_root_path('models/OCR')
+    (cache_dir / 'models' / 'OCR' / 'det.pth').write_bytes(b'det-v2')
+    assert verify_model_manifest() == ['huggingface|pipeline|models/OCR']
+    auto_download_and_get_model_root_path('models/OCR')
+    assert len(calls) == 2
+
+
+def test_empty_file_set_is_not_recorded(fake_hub):
+    _, calls = fake_hub
+    auto_download_and_get_model_root_path('models/missing')
+    auto_download_and_get_model_root_path('models/missing')
+    assert len(calls) == 2
+
+
+def test_invalidate_normalizes_path(fake_hub):
+    _, calls = fake_hub
+    auto_download_and_get_model_root_path('models/OCR')
+    invalidate_model_manifest('/models/OCR/')
+    auto_download_and_get_model_root_path('models/OCR')
+    assert len(calls) == 2
+    assert os.path.exists(os.environ['MINERU_MODEL_MANIFEST'])
@@ -0,0 +1,151 @@
+import io
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pypdfium2 as pdfium
+import pytest
+
+from mineru.utils import pdf_image_tools
+from mineru.utils.pdf_image_tools import load_images_from_pdf
+
+SLOW_DPI = 1
+
+
+def build_multipage_pdf(num_pages):
+    pdf_doc = pdfium.PdfDocument.new()
+    for _ in range(num_pages):
+        pdf_doc.new_page(200, 300)
+    buffer = io.BytesIO()
+    pdf_doc.save(buffer)
+    pdf_doc.close()
+    return buffer.getvalue()
+
+
+def fake_worker(pdf_bytes, dpi, start_page_id, end_page_id, image_type):
+    # dpi 为 SLOW_DPI 的调用模拟卡住的渲染
+    if dpi == SLOW_DPI:
+        time.sleep(1.5)
+    return [{"page": index} for index in range(start_page_id, end_page_id + 1)]
+
+
+@pytest.fixture
+def thread_render_pool(monkeypatch):
+    """用单线程的线程池代替渲染进程池，所有调用的任务在同一个队列中排队"""
+    monkeypatch.setenv("MINERU_PDF_RENDER_IN_PROCESS_MAX_PAGES", "0")
+    monkeypatch.setattr(pdf_image_tools, "is_windows_environment", lambda: False)
+    monkeypatch.setattr(pdf_image_tools, "_load_images_from_pdf_worker", fake_worker)
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(pdf_image_tools, "_render_pool", pool)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def test_timeout_does_not_cancel_other_callers(thread_render_pool):
+    pdf_bytes = build_multipage_pdf(4)
+    other_result = {}
+
+    def other_caller():
+        # 等慢调用先提交，使本调用的任务排在其后
+        time.sleep(0.1)
+        images_list, pdf_doc = load_images_from_pdf(pdf_bytes, dpi=72, timeout=10, threads=2)
+        pdf_doc.close()
+        other_result["pages"] = [image["page"] for image in images_list]
+
+    thread = threading.Thread(target=other_caller)
+    thread.start()
+    with pytest.raises(TimeoutError):
+        load_images_from_pdf(pdf_bytes, dpi=SLOW_DPI, timeout=0.5, threads=2)
+    thread.join()
+
+    assert other_result["pages"] == [0, 1, 2, 3]
+    # 超时后停用旧进程池，之后的调用使用新的进程池
+    assert pdf_image_tools._render_pool is not thread_render_pool
+
+
+def test_cancelled_tasks_fall_back_to_in_process(monkeypatch):
+    class CancelledPool:
+        def submit(self, *args, **kwargs):
+            future = Future()
+            future.cancel()
+            return future
+
+    monkeypatch.setenv("MINERU_PDF_RENDER_IN_PROCESS_MAX_PAGES", "0")
+    monkeypatch.setattr(pdf_image_tools, "is_windows_environment", lambda: False)
+    monkeypatch.setattr(pdf_image_tools, "get_render_pool", lambda: CancelledPool())
+
+    images_list, pdf_doc = load_images_from_pdf(build_multipage_pdf(3), dpi=36, timeout=10)
+    pdf_doc.close()
+    assert len(images_list) == 3
+    assert all("img_pil" in image for image in images_list)
+
+
+def test_in_process_render_honors_timeout(monkeypatch):
+    render_page = pdf_image_tools.pdf_page_to_image
+
+    def slow_render_page(*args, **kwargs):
+        time.sleep(0.2)
+        return render_page(*args, **kwargs)
+
+    monkeypatch.setenv("MINERU_PDF_RENDER_IN_PROCESS_MAX_PAGES", "100")
+    monkeypatch.setattr(pdf_image_tools, "is_windows_environment", lambda: False)
+    monkeypatch.setattr(pdf_image_tools, "pdf_page_to_image", slow_render_page)
+
+    with pytest.raises(TimeoutError):
+        load_images_from_pdf(build_multipage_pdf(10), dpi=36, timeout=0.3)
+
+
+def build_drawn_pdf(num_pages):
+    """每页绘制位置不同的矩形，便于逐页比对渲染结果"""
+    pdf_doc = pdfium.PdfDocument.new()
+    for index in range(num_pages):
+        page = pdf_doc.new_page(200, 300)
+        path = pdfium.raw.FPDFPageObj_CreateNewRect(20 + index * 10, 40, 60, 80)
+        pdfium.raw.FPDFPageObj_SetFillColor(path, 200, 30, 30, 255)
+        pdfium.raw.FPDFPath_SetDrawMode(path, pdfium.raw.FPDF_FILLMODE_ALTERNATE, 0)
+        pdfium.raw.FPDFPage_InsertObject(page.raw, path)
+        pdfium.raw.FPDFPage_GenerateContent(page.raw)
+    buffer = io.BytesIO()
+    pdf_doc.save(buffer)
+    pdf_doc.close()
+    return buffer.getvalue()
+
+
+def test_numpy_pages_are_shared_memory_views(monkeypatch):
+    monkeypatch.setenv("MINERU_PDF_RENDER_IN_PROCESS_MAX_PAGES", "0")
+    pdf_bytes = build_drawn_pdf(4)
+    expected = [
+        np.asarray(image["img_pil"].convert("RGB"))
+        for image in pdf_image_tools.load_images_from_pdf_core(pdf_bytes, dpi=72)
+    ]
+    try:
+        images_list, pdf_doc = load_images_from_pdf(pdf_bytes, dpi=72, image_type=pdf_image_tools.ImageType.NUMPY, threads=2)
+        pdf_doc.close()
+        assert len(images_list) == 4
+        shm_names = []
+        for image, expected_img in zip(images_list, expected):
+            assert image["img_np"].base is not None
+            assert np.array_equal(image["img_np"], expected_img)
+            assert pdf_image_tools.get_page_size(image) == (expected_img.shape[1], expected_img.shape[0])
+            assert np.array_equal(np.asarray(pdf_image_tools.get_page_pil_img(image)), expected_img)
+            shm_names.append(image["shm"]._shm.name)
+
+        # 已取出的数组在释放后仍可读取
+        first_page = images_list[0]["img_np"]
+        pdf_image_tools.release_images(images_list)
+        assert all("img_np" not in image and "shm" not in image for image in images_list)
+        assert np.array_equal(first_page, expected[0])
+        for name in shm_names:
+            with pytest.raises(FileNotFoundError):
+                shared_memory.SharedMemory(name=name)
+    finally:
+        pdf_image_tools.shutdown_render_pool()
+
+
+def test_release_images_ignores_in_process_pages():
+    images_list = pdf_image_tools.load_images_from_pdf_core(
+        build_drawn_pdf(1), dpi=72, image_type=pdf_image_tools.ImageType.NUMPY)
+    pdf_image_tools.release_images(images_list)
+    assert isinstance(images_list[0]["img_np"], np.ndarray)
@@ -0,0 +1,59 @@
+import numpy as np
+import pypdfium2 as pdfium
+import pytest
+
+from mineru.utils.pdf_reader import page_region_to_image, page_region_to_text, page_to_image, pdf_region_to_text
+
+ROTATIONS = [0, 90, 180, 270]
+CROP_BOXES = [None, (50, 100, 550, 700)]
+
+
+def _dark_bbox(gray):
+    ys, xs = np.where(gray < 128)
+    return xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+
+
+@pytest.mark.parametrize("rotate", ROTATIONS)
+@pytest.mark.parametrize("crop_box", CROP_BOXES)
+def test_region_render_matches_full_page_crop(make_pdf, rotate, crop_box):
+    doc = pdfium.PdfDocument(make_pdf(rotate=rotate, crop_box=crop_box, rect=(300, 200, 80, 40)))
+    page = doc[0]
+    full_image, _ = page_to_image(page, dpi=144)
+    full = np.asarray(full_image.convert("L")).astype(int)
+    height, width = full.shape
+    x0, y0, x1, y1 = _dark_bbox(full)
+
+    # 内容周围的区域，以及超出页面右下边界、需要裁剪的区域
+    for box in [(x0 - 7, y0 - 5, x1 + 9, y1 + 3), (x0 + 13, y0 + 11, width + 50, height + 50)]:
+        region_image, _ = page_region_to_image(page, box, dpi=144)
+        region = np.asarray(region_image.convert("L")).astype(int)
+        left, top = max(box[0], 0), max(box[1], 0)
+        right, bottom = min(box[2], width), min(box[3], height)
+        expected = full[top:bottom, left:right]
+        assert region.shape == expected.shape
+        assert (expected < 128).any()
+        assert np.abs(region - expected).mean() < 1
+    doc.close()
+
+
+@pytest.mark.parametrize("rotate", ROTATIONS)
+@pytest.mark.parametrize("crop_box", CROP_BOXES)
+def test_region_text_uses_display_coordinates(make_pdf, rotate, crop_box):
+    pdf_bytes = make_pdf(rotate=rotate, crop_box=crop_box)
+    doc = pdfium.PdfDocument(pdf_bytes)
+    page = doc[0]
+    width, height = page.get_size()
+    # 文本在整页渲染图中的位置即为其显示坐标
+    full_image, _ = page_to_image(page, dpi=72)
+    x0, y0, x1, y1 = _dark_bbox(np.asarray(full_image.convert("L")))
+
+    assert page_region_to_text(page, (x0 - 3, y0 - 3, x1 + 3, y1 + 3), dpi=72) == "SHIP123"
+    assert page_region_to_text(page, (0, 0, width, height), clip_in_points=True) == "SHIP123"
+    # 与文本不相交的区域
+    if x0 > 10:
+        assert page_region_to_text(page, (0, 0, x0 - 5, height), dpi=72) == ""
+    else:
+        assert page_region_to_text(page, (x1 + 5, 0, width, height), dpi=72) == ""
+    doc.close()
+
+    assert pdf_region_to_text(pdf_bytes, (x0 - 3, y0 - 3, x1 + 3, y1 + 3), clip_in_points=True) == "SHIP123"
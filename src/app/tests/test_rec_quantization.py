@@ -0,0 +1,97 @@
+import argparse
+import os
+
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from mineru.model.utils.pytorchocr.modeling.architectures.base_model import BaseModel
+from mineru.model.utils.tools.infer import pytorchocr_utility as utility
+from mineru.model.utils.tools.infer import rec_quantization
+from mineru.model.utils.tools.infer.predict_rec import TextRecognizer
+from mineru.model.utils.tools.infer.rec_quantization import (
+    REC_QUANT_ACCURACY_THRESHOLD,
+    REC_QUANT_FIXTURE_DIR,
+    get_quantized_cache_path,
+    load_calibration_crops,
+    quantize_recognizer,
+)
+
+DICT_DIR = os.path.join(os.path.dirname(REC_QUANT_FIXTURE_DIR), 'dict')
+REC_MODEL_NAME = 'ch_PP-OCRv5_rec_infer'
+REC_DICT_PATH = os.path.join(DICT_DIR, 'ppocrv5_dict.txt')
+# 真实权重路径，未设置时跳过 INT8 与 fp32 的一致率测试
+REAL_REC_MODEL_PATH = os.getenv('MINERU_TEST_REC_MODEL_PATH', '')
+REAL_REC_DICT_PATH = os.getenv('MINERU_TEST_REC_DICT_PATH', REC_DICT_PATH)
+
+
+def make_recognizer(weights_path, dict_path=REC_DICT_PATH, quantize=False):
+    args = vars(utility.init_args().parse_args([]))
+    args.update(rec_model_path=weights_path, rec_char_dict_path=dict_path, device='cpu', rec_quantize=quantize)
+    return TextRecognizer(argparse.Namespace(**args))
+
+
+@pytest.fixture
+def random_weights(tmp_path):
+    """随机初始化的识别模型权重，文件名决定网络结构"""
+    torch.manual_seed(0)
+    with open(REC_DICT_PATH, encoding='utf-8') as f:
+        out_channels = sum(1 for _ in f) + 2
+    weights_path = str(tmp_path / f'{REC_MODEL_NAME}.pth')
+    net = BaseModel(utility.get_arch_config(weights_path), out_channels=out_channels)
+    net.eval()
+    torch.save(net.state_dict(), weights_path)
+    return weights_path
+
+
+def test_bundled_fixture_crops():
+    calib_crops, check_crops = load_calibration_crops()
+    assert len(calib_crops) == 24
+    assert len(check_crops) == 24
+    assert all(crop.ndim == 3 and crop.shape[2] == 3 for crop in calib_crops + check_crops)
+
+
+def test_cache_path_tracks_weights_and_torch_version(tmp_path, monkeypatch):
+    weights_path = tmp_path / 'rec.pth'
+    weights_path.write_bytes(b'weights-v1')
+    path_v1 = get_quantized_cache_path(str(weights_path))
+    assert torch.__version__.replace('+', '_') in path_v1
+
+    weights_path.write_bytes(b'weights-v2')
+    os.utime(weights_path, ns=(1, 1))
+    path_v2 = get_quantized_cache_path(str(weights_path))
+    assert path_v2 != path_v1
+
+    monkeypatch.setattr(torch, '__version__', '0.0.0')
+    assert get_quantized_cache_path(str(weights_path)) != path_v2
+
+
+def test_recalibrates_when_cache_cannot_be_loaded(random_weights, monkeypatch):
+    # 随机权重的识别结果没有意义，不检查一致率
+    monkeypatch.setattr(rec_quantization, 'REC_QUANT_ACCURACY_THRESHOLD', 0.0)
+    recognizer = make_recognizer(random_weights)
+    fp32_backbone = recognizer.net.backbone
+
+    cache_path = get_quantized_cache_path(random_weights)
+    with open(cache_path, 'wb') as f:
+        f.write(b'not a state dict')
+
+    assert quantize_recognizer(recognizer)
+    assert recognizer.net.backbone is not fp32_backbone
+    state_dict = torch.load(cache_path, weights_only=True)
+    assert set(state_dict) == set(recognizer.net.backbone.state_dict())
+
+
+@pytest.mark.skipif(not os.path.isfile(REAL_REC_MODEL_PATH), reason='MINERU_TEST_REC_MODEL_PATH is not set')
+def test_int8_agrees_with_fp32_on_bundled_val_crops(tmp_path):
+    weights_path = str(tmp_path / os.path.basename(REAL_REC_MODEL_PATH))
+    os.symlink(REAL_REC_MODEL_PATH, weights_path)
+    _, check_crops = load_calibration_crops()
+
+    fp32_res, _ = make_recognizer(weights_path, REAL_REC_DICT_PATH)(check_crops)
+    int8_recognizer = make_recognizer(weights_path, REAL_REC_DICT_PATH, quantize=True)
+    int8_res, _ = int8_recognizer(check_crops)
+
+    assert os.path.exists(get_quantized_cache_path(weights_path))
+    matched = sum(1 for a, b in zip(fp32_res, int8_res) if a[0] == b[0])
+    assert matched / len(check_crops) >= REC_QUANT_ACCURACY_THRESHOLD
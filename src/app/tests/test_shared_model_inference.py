@@ -0,0 +1,118 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from mineru.model.utils.pytorchocr.modeling.architectures.base_model import BaseModel
+from mineru.model.utils.tools.infer import pytorchocr_utility as utility
+from mineru.model.utils.tools.infer.predict_det import TextDetector
+from mineru.model.utils.tools.infer.predict_rec import TextRecognizer
+from mineru.model.utils.tools.infer.rec_quantization import REC_QUANT_FIXTURE_DIR, make_fixture_crops
+
+REC_DICT_PATH = os.path.join(os.path.dirname(REC_QUANT_FIXTURE_DIR), 'dict', 'ppocrv5_dict.txt')
+
+
+def save_random_weights(weights_path, **kwargs):
+    torch.manual_seed(0)
+    net = BaseModel(utility.get_arch_config(weights_path), **kwargs)
+    net.eval()
+    torch.save(net.state_dict(), weights_path)
+
+
+def make_args(**kwargs):
+    args = vars(utility.init_args().parse_args([]))
+    args.update(device='cpu', **kwargs)
+    return argparse.Namespace(**args)
+
+
+class ConcurrencyProbe:
+    """在网络 forward 前后计数，记录同时进入 forward 的最大线程数"""
+
+    def __init__(self, net):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        net.register_forward_pre_hook(self.enter)
+        net.register_forward_hook(self.exit)
+
+    def enter(self, module, inputs):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        # 拉长 forward 的时间窗口，未加锁时两个线程几乎必然重叠
+        time.sleep(0.05)
+
+    def exit(self, module, inputs, outputs):
+        with self.lock:
+            self.active -= 1
+
+
+def run_concurrently(*targets):
+    errors = []
+
+    def run(target):
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors
+
+
+def test_table_and_page_detection_share_the_network_safely(tmp_path):
+    weights_path = str(tmp_path / 'ch_PP-OCRv5_det_infer.pth')
+    save_random_weights(weights_path)
+    # 表格 OCR 与正文 OCR 只有后处理阈值不同，共用同一个检测网络
+    table_detector = TextDetector(make_args(det_model_path=weights_path, det_db_box_thresh=0.3))
+    page_detector = TextDetector(make_args(det_model_path=weights_path, det_db_box_thresh=0.6))
+    assert table_detector.net is page_detector.net
+    probe = ConcurrencyProbe(page_detector.net)
+
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 255, (320, 320, 3), dtype=np.uint8) for _ in range(3)]
+    expected_table = [table_detector(image)[0] for image in images]
+    expected_page = page_detector.batch_predict(images, 3)
+
+    table_results, page_results = [], []
+    run_concurrently(
+        lambda: table_results.extend(table_detector(image)[0] for image in images),
+        lambda: page_results.extend(page_detector.batch_predict(images, 1)),
+    )
+
+    assert probe.max_active == 1
+    for result, expected in zip(table_results, expected_table):
+        assert np.array_equal(result, expected)
+    for (result, _), (expected, _) in zip(page_results, expected_page):
+        assert np.array_equal(result, expected)
+
+
+def test_recognizers_sharing_the_network_do_not_overlap(tmp_path):
+    weights_path = str(tmp_path / 'ch_PP-OCRv5_rec_infer.pth')
+    with open(REC_DICT_PATH, encoding='utf-8') as f:
+        save_random_weights(weights_path, out_channels=sum(1 for _ in f) + 2)
+    args = make_args(rec_model_path=weights_path, rec_char_dict_path=REC_DICT_PATH)
+    table_recognizer, page_recognizer = TextRecognizer(args), TextRecognizer(args)
+    assert table_recognizer.net is page_recognizer.net
+    probe = ConcurrencyProbe(page_recognizer.net)
+
+    crops = make_fixture_crops(num=8, seed=1)
+    expected = page_recognizer(crops)[0]
+    results = [[], []]
+    run_concurrently(
+        lambda: results[0].extend(table_recognizer(crops)[0]),
+        lambda: results[1].extend(page_recognizer(crops)[0]),
+    )
+
+    assert probe.max_active == 1
+    assert [text for text, _ in results[0]] == [text for text, _ in expected]
+    assert [text for text, _ in results[1]] == [text for text, _ in expected]